@@ -13,8 +13,20 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sys
+
 import pbr.version
 
 
-__version__ = pbr.version.VersionInfo(
-    'networking_mlnx_baremetal').version_string()
+version_info = pbr.version.VersionInfo('networking_mlnx_baremetal')
+
+if sys.version_info >= (3, 7):
+    # NOTE: resolving the version loads package metadata which is slow,
+    #  so it is done on first access instead of on import (PEP 562).
+    def __getattr__(name):
+        if name == '__version__':
+            return version_info.version_string()
+        raise AttributeError('module %r has no attribute %r'
+                             % (__name__, name))
+else:
+    __version__ = version_info.version_string()
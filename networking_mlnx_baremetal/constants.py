@@ -39,3 +39,6 @@ then we will set the PKey for IB ports in this instance.
 
 PHYSICAL_NETWORK_ANY = '*'
 """* matches any physical network include none"""
+
+MLNX_IB_BAREMETAL_ENTITY = 'MLNX-IB-Baremetal'
+"""provisioning block entity of ports bound by this driver"""
@@ -0,0 +1,296 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import os
+import threading
+
+import cachetools
+from oslo_log import log as logging
+import six
+
+from networking_mlnx_baremetal.ufmclient import guid as ib_guid
+from networking_mlnx_baremetal.ufmclient import utils
+
+LOG = logging.getLogger(__name__)
+
+_RETRY_INTERVAL = 60
+
+
+class NodeGuidCache(object):
+    """Bounded TTL/LRU cache of infiniband guids keyed by Ironic node uuid.
+
+    The cache is disabled when either size or ttl is not positive, every
+    lookup then goes to the loader.
+    """
+
+    def __init__(self, maxsize, ttl):
+        """Initial a node guid cache
+
+        :param maxsize: maximum count of nodes to keep in cache
+        :param ttl: seconds a cached entry stays valid
+        """
+        self._lock = threading.Lock()
+        self._cache = None
+        if maxsize > 0 and ttl > 0:
+            self._cache = cachetools.TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, node, loader):
+        """Return the guids of a node, load them on cache miss.
+
+        :param node: the uuid of Ironic node
+        :param loader: callable which loads the guid list of a node
+        :return: infiniband guid list of the node
+        """
+        if self._cache is None:
+            return loader(node)
+
+        with self._lock:
+            guids = self._cache.get(node)
+            if guids is not None:
+                self.hits += 1
+                return list(guids)
+            self.misses += 1
+
+        guids = loader(node)
+        with self._lock:
+            self._cache[node] = tuple(guids)
+        return guids
+
+    def invalidate(self, node):
+        """Drop the cached guids of a node.
+
+        :param node: the uuid of Ironic node
+        """
+        if self._cache is not None:
+            with self._lock:
+                self._cache.pop(node, None)
+
+    def clear(self):
+        """Drop all cached entries."""
+        if self._cache is not None:
+            with self._lock:
+                self._cache.clear()
+
+    def stats(self):
+        """Return cache counters, used to size the cache.
+
+        :return: a dict contains hits, misses, size and maxsize
+        """
+        if self._cache is None:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': 0, 'maxsize': 0}
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._cache),
+                    'maxsize': self._cache.maxsize}
+
+
+class NoIbNodeCache(object):
+    """Bounded TTL/LRU set of Ironic nodes known to have no infiniband port.
+
+    Baremetal ports of those nodes are skipped without querying Ironic
+    again. Entries are kept apart from :class:`NodeGuidCache`, so nodes
+    without infiniband ports do not evict the guids of the others. The
+    cache is disabled when either size or ttl is not positive.
+    """
+
+    def __init__(self, maxsize, ttl):
+        """Initial a cache of nodes without infiniband port
+
+        :param maxsize: maximum count of nodes to keep in cache
+        :param ttl: seconds a node stays cached
+        """
+        self._lock = threading.Lock()
+        self._cache = None
+        if maxsize > 0 and ttl > 0:
+            self._cache = cachetools.TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+
+    def __contains__(self, node):
+        if self._cache is None or not node:
+            return False
+        with self._lock:
+            if node in self._cache:
+                self.hits += 1
+                return True
+        return False
+
+    def add(self, node):
+        """Remember a node has no infiniband port.
+
+        :param node: the uuid of Ironic node
+        """
+        if self._cache is not None and node:
+            with self._lock:
+                self._cache[node] = True
+
+    def invalidate(self, node):
+        """Forget a node, its ports may have been re-enrolled.
+
+        :param node: the uuid of Ironic node
+        """
+        if self._cache is not None:
+            with self._lock:
+                self._cache.pop(node, None)
+
+    def clear(self):
+        """Drop all cached nodes."""
+        if self._cache is not None:
+            with self._lock:
+                self._cache.clear()
+
+    def stats(self):
+        """Return cache counters, used to size the cache.
+
+        :return: a dict contains hits, size and maxsize
+        """
+        if self._cache is None:
+            return {'hits': self.hits, 'size': 0, 'maxsize': 0}
+        with self._lock:
+            return {'hits': self.hits, 'size': len(self._cache),
+                    'maxsize': self._cache.maxsize}
+
+
+class FleetGuidIndex(object):
+    """In-memory index of infiniband guids of all Ironic nodes.
+
+    The index is built from one listing of all Ironic ports and refreshed
+    in background. Node uuids are interned and guids are kept as integers
+    to keep the index compact for a large fleet.
+
+    The index is loaded by a thread of the process which uses it, started
+    on first lookup. A forked child process, e.g. an API worker, starts
+    its own thread instead of relying on the thread of its parent which
+    does not exist in the child.
+    """
+
+    def __init__(self, ironic_client, interval=0):
+        """Initial a fleet guid index
+
+        :param ironic_client: the Ironic client used to list ports
+        :param interval: seconds between two refreshes, the index is
+            loaded only once if it is not positive.
+        """
+        self._ironic_client = ironic_client
+        self._interval = interval
+        self._lock = threading.Lock()
+        # NOTE: the index and the pid of the process which loaded it.
+        self._index = None
+        self._index_pid = None
+        self._stopped = None
+        self._thread = None
+        self._pid = None
+
+    @property
+    def loaded(self):
+        """Whether the index has been loaded in this process"""
+        return self._index is not None and self._index_pid == os.getpid()
+
+    def start(self):
+        """Load the index and keep refreshing it in a background thread.
+
+        Nothing is done if the thread of this process is already started.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._stopped = threading.Event()
+            self._thread = threading.Thread(target=self._run,
+                                            args=(self._stopped,),
+                                            name='ib-guid-index')
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = pid
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def get(self, node):
+        """Return the guids of a node.
+
+        :param node: the uuid of Ironic node
+        :return: infiniband guid list of the node, or None if the node is
+            not indexed.
+        """
+        self.start()
+        if not self.loaded:
+            return None
+        guids = self._index.get(node)
+        if guids is None:
+            return None
+        return [self._format(guid) for guid in guids]
+
+    def items(self):
+        """Iterate over indexed nodes and their guids.
+
+        :return: an iterator of (node uuid, guid list) tuples
+        """
+        index = self._index if self.loaded else {}
+        for node, guids in list(index.items()):
+            yield node, [self._format(guid) for guid in guids]
+
+    def invalidate(self, node):
+        """Drop a node from the index until next refresh.
+
+        :param node: the uuid of Ironic node
+        """
+        if self.loaded:
+            self._index.pop(node, None)
+
+    def refresh(self):
+        """Rebuild the index from one listing of all Ironic ports."""
+        index = {}
+        ports = self._ironic_client.port.list(
+            limit=0, fields=['node_uuid', 'extra'])
+        for port in ports:
+            client_id = (port.extra or {}).get('client-id')
+            if not client_id or not port.node_uuid:
+                continue
+            node = six.moves.intern(str(port.node_uuid))
+            index[node] = index.get(node, ()) + (self._parse(client_id),)
+        self._index, self._index_pid = index, os.getpid()
+        LOG.info('Infiniband guid index loaded, %(count)d Ironic nodes have '
+                 'infiniband ports.', {'count': len(index)})
+
+    def _run(self, stopped):
+        while not stopped.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                LOG.exception('Failed to load infiniband guid index from '
+                              'Ironic ports.')
+            if self._interval <= 0 and self.loaded:
+                return
+            # NOTE: retry a failed one-off load after a while.
+            stopped.wait(self._interval if self._interval > 0
+                         else _RETRY_INTERVAL)
+
+    @staticmethod
+    def _parse(client_id):
+        try:
+            return ib_guid.parse(client_id)
+        except (ValueError, TypeError):
+            guid = utils.mlnx_ib_client_id_to_guid(client_id)
+            return six.moves.intern(str(guid))
+
+    @staticmethod
+    def _format(guid):
+        if isinstance(guid, six.integer_types):
+            return '%0*x' % (ib_guid.GUID_LEN, guid)
+        return guid
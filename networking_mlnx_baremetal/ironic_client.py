@@ -12,15 +12,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from ironicclient import client
-from keystoneauth1 import loading
 from networking_mlnx_baremetal import constants
 from networking_mlnx_baremetal._i18n import _
+from networking_mlnx_baremetal import registry
 from oslo_config import cfg
 
 
 CONF = cfg.CONF
-KEYSTONE_SESSION = None
+
+KEYSTONE_SESSION_KEY = 'ironic_keystone_session'
+IRONIC_CLIENT_KEY = 'ironic'
 
 
 IRONIC_OPTS = [
@@ -49,6 +50,7 @@ CONF.register_opts(IRONIC_OPTS, group=constants.IRONIC_GROUP_NAME)
 
 
 def list_opts():
+    from keystoneauth1 import loading
     return [(constants.IRONIC_GROUP_NAME, IRONIC_OPTS +
              loading.get_session_conf_options() +
              loading.get_auth_plugin_conf_options('v3password'))]
@@ -60,6 +62,9 @@ def create_keystone_session(group):
     :param group: the conf group name
     :return: keystone session
     """
+    # NOTE: keystoneauth and ironicclient are imported on first use, they
+    #  are not needed to load the driver.
+    from keystoneauth1 import loading
     loading.register_session_conf_options(CONF, group)
     loading.register_auth_conf_options(CONF, group)
     auth = loading.load_auth_from_conf_options(CONF, group)
@@ -69,22 +74,27 @@ def create_keystone_session(group):
 
 
 def get_client(api_version=constants.DEFAULT_IRONIC_API_VERSION):
-    """Create an Ironic client instance.
+    """Get the Ironic client instance of this process.
 
     :param api_version: ironic api version, default latest.
     :return: an Ironic Client instance
     """
+    return registry.REGISTRY.get((IRONIC_CLIENT_KEY, api_version),
+                                 lambda: _create_client(api_version))
+
+
+def _create_client(api_version):
+    from ironicclient import client
     if CONF.ironic.auth_strategy == 'noauth':
         # To support standalone ironic without keystone
         args = {'token': 'noauth',
                 'endpoint': CONF.ironic.endpoint}
     else:
         # To support keystone authentication
-        global KEYSTONE_SESSION
-        if not KEYSTONE_SESSION:
-            KEYSTONE_SESSION = create_keystone_session(
-                constants.IRONIC_GROUP_NAME)
-        args = {'session': KEYSTONE_SESSION,
+        session = registry.REGISTRY.get(
+            KEYSTONE_SESSION_KEY,
+            lambda: create_keystone_session(constants.IRONIC_GROUP_NAME))
+        args = {'session': session,
                 'region_name': CONF.ironic.os_region}
 
     args['os_ironic_api_version'] = api_version
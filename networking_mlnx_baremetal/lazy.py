@@ -0,0 +1,77 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import os
+import threading
+
+_UNSET = object()
+
+
+class LazyProxy(object):
+    """Proxy of an object which is created on first use.
+
+    The factory is called once, under a lock, by the first caller which
+    accesses an attribute of the proxy. Concurrent callers wait for it and
+    share the result. If the factory raises, nothing is kept and the next
+    access calls it again, so a service which is unreachable at startup
+    does not break the proxy for good. A forked child process calls the
+    factory again instead of using the object of its parent.
+
+    Methods of the proxy itself are prefixed with ``_lazy_``, so they do
+    not hide attributes of the proxied object.
+    """
+
+    __slots__ = ('_factory', '_lock', '_target', '_pid')
+
+    def __init__(self, factory):
+        """Initial a lazy proxy
+
+        :param factory: callable which creates the proxied object
+        """
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._target = _UNSET
+        self._pid = None
+
+    def _lazy_loaded(self):
+        """Whether the proxied object has been created in this process"""
+        return self._target is not _UNSET and self._pid == os.getpid()
+
+    def _lazy_target(self):
+        """Return the proxied object, create it if needed."""
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    target = self._factory()
+                    self._target, self._pid = target, pid
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._lazy_target(), name)
+
+
+def resolve(proxy):
+    """Return the object of a lazy proxy, create it if needed.
+
+    :param proxy: a :class:`LazyProxy`
+    """
+    return proxy._lazy_target()
+
+
+def is_loaded(proxy):
+    """Return whether the object of a lazy proxy exists in this process.
+
+    :param proxy: a :class:`LazyProxy`
+    """
+    return proxy._lazy_loaded()
@@ -0,0 +1,432 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import abc
+import errno
+import functools
+import os
+import re
+import socket
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+import six
+
+from networking_mlnx_baremetal import constants
+from networking_mlnx_baremetal.plugins.ml2 import config
+from networking_mlnx_baremetal.ufmclient import breaker as cb
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+config.register_opts(CONF)
+
+SINK_NONE = 'none'
+SINK_LOG = 'log'
+SINK_STATSD = 'statsd'
+SINK_PROMETHEUS = 'prometheus'
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+           10.0, 30.0, 60.0)
+"""upper bounds (seconds) of histogram buckets"""
+
+METRICS_SINK = None
+_METRICS_SINK_LOCK = threading.Lock()
+
+
+class Histogram(object):
+    """Cumulative histogram of durations in seconds"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = 0
+        for bound in BUCKETS:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Return (upper bound, cumulative count) pairs, last bound is inf"""
+        total = 0
+        result = []
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricsSink(object):
+    """Base metrics sink, drops everything"""
+
+    enabled = False
+
+    def timing(self, name, seconds):
+        pass
+
+    def incr(self, name, value=1):
+        pass
+
+    def gauge(self, name, value):
+        pass
+
+
+@six.add_metaclass(abc.ABCMeta)
+class _AggregatingSink(MetricsSink):
+    """Keep histograms and counters in memory and flush them periodically
+
+    Metrics are flushed by a background thread of every process, which is
+    started by the first metric recorded in the process, so an idle
+    process keeps reporting. A forked process starts with no metrics, the
+    ones inherited from its parent are reported by the parent.
+    """
+
+    enabled = True
+
+    def __init__(self, prefix, interval):
+        self.prefix = prefix
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stopped = None
+        self._reset()
+
+    def _reset(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def timing(self, name, seconds):
+        self._start()
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def incr(self, name, value=1):
+        self._start()
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        self._start()
+        with self._lock:
+            self._gauges[name] = value
+
+    def _start(self):
+        """Start the flusher of this process if it is not running"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                # NOTE: metrics recorded before fork belong to the parent.
+                self._reset()
+            self._pid = pid
+            self._stopped = threading.Event()
+            thread = threading.Thread(target=self._run,
+                                      args=(self._stopped,),
+                                      name='mlnx-ib-bm-metrics')
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        """Stop the flusher of this process after a last flush"""
+        stopped = self._stopped
+        if stopped is not None and self._pid == os.getpid():
+            stopped.set()
+            self._flush()
+
+    def _run(self, stopped):
+        while not stopped.wait(self.interval):
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            histograms = dict((name, (h.cumulative(), h.count, h.sum))
+                              for name, h in self._histograms.items())
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        try:
+            self.flush(histograms, counters, gauges)
+        except Exception:
+            LOG.exception('Failed to flush driver metrics.')
+
+    @abc.abstractmethod
+    def flush(self, histograms, counters, gauges):
+        """Report aggregated metrics
+
+        :param histograms: name -> (cumulative buckets, count, sum)
+        :param counters: name -> value
+        :param gauges: name -> value
+        """
+
+
+class LogSink(_AggregatingSink):
+    """Periodically log a summary of histograms and counters"""
+
+    def flush(self, histograms, counters, gauges):
+        for name, (buckets, count, total) in sorted(histograms.items()):
+            LOG.info('Metric %(name)s: count=%(count)d, avg=%(avg).4fs, '
+                     'buckets=%(buckets)s',
+                     {'name': self.prefix + name, 'count': count,
+                      'avg': total / count if count else 0.0,
+                      'buckets': buckets})
+        for name, value in sorted(list(counters.items()) +
+                                  list(gauges.items())):
+            LOG.info('Metric %(name)s: %(value)s',
+                     {'name': self.prefix + name, 'value': value})
+
+
+class PrometheusFileSink(_AggregatingSink):
+    """Periodically write histograms and counters to a file in Prometheus
+    text exposition format, for the node exporter textfile collector.
+
+    Every neutron-server process writes its own file (the pid is appended
+    to the file name) and labels its metrics with its pid. Files of
+    processes which have exited are removed on every flush, so series of
+    dead workers do not pile up.
+    """
+
+    def __init__(self, prefix, interval, path):
+        super(PrometheusFileSink, self).__init__(prefix, interval)
+        self.path = path
+
+    @property
+    def process_path(self):
+        root, ext = os.path.splitext(self.path)
+        return '%s-%d%s' % (root, os.getpid(), ext)
+
+    def _remove_dead_files(self):
+        """Remove metric files of processes which have exited"""
+        directory, name = os.path.split(self.path)
+        root, ext = os.path.splitext(name)
+        pattern = re.compile(
+            r'%s-(\d+)%s$' % (re.escape(root), re.escape(ext)))
+        for name in os.listdir(directory or os.curdir):
+            match = pattern.match(name)
+            if match is None or _pid_alive(int(match.group(1))):
+                continue
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                # NOTE: removed by another process meanwhile.
+                pass
+
+    def _metric_name(self, name):
+        return (self.prefix + name).replace('.', '_').replace('-', '_')
+
+    def flush(self, histograms, counters, gauges):
+        pid = os.getpid()
+        lines = []
+        for name, (buckets, count, total) in sorted(histograms.items()):
+            metric = self._metric_name(name) + '_seconds'
+            lines.append('# TYPE %s histogram' % metric)
+            for bound, cumulative in buckets:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('%s_bucket{le="%s",pid="%d"} %d'
+                             % (metric, le, pid, cumulative))
+            lines.append('%s_sum{pid="%d"} %f' % (metric, pid, total))
+            lines.append('%s_count{pid="%d"} %d' % (metric, pid, count))
+        for name, value in sorted(counters.items()):
+            metric = self._metric_name(name) + '_total'
+            lines.append('# TYPE %s counter' % metric)
+            lines.append('%s{pid="%d"} %s' % (metric, pid, value))
+        for name, value in sorted(gauges.items()):
+            metric = self._metric_name(name)
+            lines.append('# TYPE %s gauge' % metric)
+            lines.append('%s{pid="%d"} %s' % (metric, pid, value))
+
+        # NOTE: write to a temporary file then rename it, so the collector
+        # never reads a partial file.
+        path = self.process_path
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.rename(tmp_path, path)
+        self._remove_dead_files()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # NOTE: the process exists but belongs to another user.
+        return e.errno == errno.EPERM
+    return True
+
+
+class StatsdSink(MetricsSink):
+    """Send timings and counters to statsd over UDP, statsd aggregates
+    timings into histograms.
+    """
+
+    enabled = True
+
+    def __init__(self, prefix, host, port):
+        self.prefix = prefix
+        self._address = (host, port)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, data):
+        try:
+            self._socket.sendto(data.encode('utf-8'), self._address)
+        except (socket.error, socket.gaierror):
+            # NOTE: metrics are best effort, never fail the caller.
+            pass
+
+    def timing(self, name, seconds):
+        self._send('%s%s:%f|ms' % (self.prefix, name, seconds * 1000))
+
+    def incr(self, name, value=1):
+        self._send('%s%s:%d|c' % (self.prefix, name, value))
+
+    def gauge(self, name, value):
+        self._send('%s%s:%s|g' % (self.prefix, name, value))
+
+
+def get_sink():
+    """Create the metrics sink configured for this driver.
+
+    :return: a metrics sink instance
+    """
+    global METRICS_SINK
+    if METRICS_SINK is not None:
+        return METRICS_SINK
+    with _METRICS_SINK_LOCK:
+        if METRICS_SINK is not None:
+            return METRICS_SINK
+        conf = CONF[constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
+        prefix = conf.metrics_prefix
+        if prefix and not prefix.endswith('.'):
+            prefix += '.'
+        if conf.metrics_sink == SINK_LOG:
+            sink = LogSink(prefix, conf.metrics_flush_interval)
+        elif conf.metrics_sink == SINK_PROMETHEUS:
+            sink = PrometheusFileSink(prefix, conf.metrics_flush_interval,
+                                      conf.metrics_prometheus_file)
+        elif conf.metrics_sink == SINK_STATSD:
+            sink = StatsdSink(prefix, conf.metrics_statsd_host,
+                              conf.metrics_statsd_port)
+        else:
+            sink = MetricsSink()
+        METRICS_SINK = sink
+    return METRICS_SINK
+
+
+class _NoopTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _Timer(object):
+
+    def __init__(self, sink, name):
+        self._sink = sink
+        self._name = name
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._sink.timing(self._name, time.time() - self._started)
+        return False
+
+
+def timer(name):
+    """Return a context manager which records the duration of its block
+
+    :param name: metric name, like ``bind_port.ironic_guids``
+    """
+    sink = get_sink()
+    if not sink.enabled:
+        return _NOOP_TIMER
+    return _Timer(sink, name)
+
+
+def timed(name):
+    """Decorator which records the duration of each call of a function
+
+    :param name: metric name
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def incr(name, value=1):
+    """Increase a counter
+
+    :param name: metric name
+    :param value: the increment
+    """
+    sink = get_sink()
+    if sink.enabled:
+        sink.incr(name, value)
+
+
+def gauge(name, value):
+    """Set a gauge
+
+    :param name: metric name
+    :param value: the current value
+    """
+    sink = get_sink()
+    if sink.enabled:
+        sink.gauge(name, value)
+
+
+def timing(name, seconds):
+    """Record a duration measured by the caller
+
+    :param name: metric name
+    :param seconds: the duration in seconds
+    """
+    sink = get_sink()
+    if sink.enabled:
+        sink.timing(name, seconds)
+
+
+def circuit_breaker_listener(breaker, event):
+    """Record state transitions and rejected calls of a circuit breaker
+
+    It is passed as listener of
+    :class:`~networking_mlnx_baremetal.ufmclient.breaker.CircuitBreaker`.
+    """
+    incr('circuit_breaker.%s.%s' % (breaker.name, event))
+    if event in cb.STATE_VALUES:
+        gauge('circuit_breaker.%s.state' % breaker.name,
+              cb.STATE_VALUES[event])
@@ -0,0 +1,263 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import collections
+import os
+import threading
+
+import futurist
+from oslo_log import log as logging
+
+from networking_mlnx_baremetal.ufmclient import exceptions as ufm_exec
+from networking_mlnx_baremetal.ufmclient import guid as ib_guid
+
+LOG = logging.getLogger(__name__)
+
+_ADD = 'add'
+_REMOVE = 'remove'
+
+
+class _Waiter(object):
+    """Tracks the guids of one caller request until all of them are done."""
+
+    def __init__(self, guids):
+        self.future = futurist.Future()
+        self._lock = threading.Lock()
+        self._remaining = len(guids)
+        self._error = None
+        if not guids:
+            self.future.set_result(None)
+
+    def done(self, error=None):
+        with self._lock:
+            if error is not None and self._error is None:
+                self._error = error
+            self._remaining -= 1
+            if self._remaining != 0:
+                return
+        if self._error is not None:
+            self.future.set_exception(self._error)
+        else:
+            self.future.set_result(None)
+
+
+class _Change(object):
+    """The last queued change of a guid on a PKey and its waiters"""
+
+    __slots__ = ('op', 'options', 'waiters')
+
+    def __init__(self, op, options, waiter):
+        self.op = op
+        self.options = options
+        self.waiters = [waiter]
+
+
+class PKeyMembershipQueue(object):
+    """Write-behind queue which coalesces UFM PKey membership changes.
+
+    Guids added to or removed from a PKey are held for a short window, then
+    all pending changes of the same PKey are sent to UFM as one
+    ``add_guids`` and one ``remove_guids`` request. Only the last change of
+    a guid on a PKey is sent: a later add or remove replaces the pending
+    one, so the guid ends up as the last caller asked whatever it was
+    before.
+
+    Every PKey with pending changes has its own background flusher which
+    sends them one batch after the other, so changes of the same guid
+    reach UFM in the order they were queued, while changes of different
+    PKeys are sent concurrently.
+
+    Every call returns a future which is resolved when the last change of
+    its guids has been applied to UFM, callers which need the result of
+    the UFM request should wait on it. A batch is sent with the timeout of
+    the queue whoever is waiting for it, callers enforce their own
+    deadline when waiting on their future.
+    """
+
+    def __init__(self, pkey_client, window=0, timeout=None):
+        """Initial a PKey membership queue
+
+        :param pkey_client: the UFM PKey resource client
+        :param window: seconds to hold pending changes before flushing them
+            to UFM, changes are flushed immediately if it is not positive.
+        :param timeout: timeout in seconds of sending a batch to UFM, the
+            timeout of the PKey client is used if not set.
+        """
+        self._pkey_client = pkey_client
+        self._window = window
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._timer = None
+        # NOTE: pkeys which have a running flusher.
+        self._flushing = set()
+        self._flusher_pid = None
+        # pkey -> {guid: _Change}
+        self._pending = collections.OrderedDict()
+
+    def add_guids(self, pkey, guids, index0=True, ip_over_ib=True,
+                  full_membership=True):
+        """Queue guids to be added to a PKey.
+
+        :param pkey: the identify of pkey, hexadecimal string
+        :param guids: the guid (or client-id) list to be added
+        :return: a future resolved when the guids have been added
+        """
+        return self._queue(_ADD, (index0, ip_over_ib, full_membership),
+                           pkey, guids)
+
+    def remove_guids(self, pkey, guids):
+        """Queue guids to be removed from a PKey.
+
+        :param pkey: the identify of pkey, hexadecimal string
+        :param guids: the guid (or client-id) list to be removed
+        :return: a future resolved when the guids have been removed
+        """
+        return self._queue(_REMOVE, None, pkey, guids)
+
+    def flush(self):
+        """Send all pending changes to UFM now and wait until they are
+        sent."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._start_flushers()
+            while self._flushing:
+                self._idle.wait()
+
+    def _queue(self, op, options, pkey, guids):
+        guids = self._normalize(guids)
+        waiter = _Waiter(guids)
+        with self._lock:
+            changes = self._pending.setdefault(pkey,
+                                               collections.OrderedDict())
+            for guid in guids:
+                change = changes.get(guid)
+                if change is None:
+                    changes[guid] = _Change(op, options, waiter)
+                else:
+                    # NOTE: last change wins, earlier callers are resolved
+                    #  together with it.
+                    change.op = op
+                    change.options = options
+                    change.waiters.append(waiter)
+            self._schedule(pkey)
+        return waiter.future
+
+    def _schedule(self, pkey):
+        if self._window <= 0:
+            self._start_flusher(pkey)
+        elif self._timer is None:
+            self._timer = threading.Timer(self._window, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._start_flushers()
+
+    def _start_flushers(self):
+        """Start flushers of all pending PKeys, called with lock held"""
+        self._check_fork()
+        for pkey in list(self._pending):
+            self._start_flusher(pkey)
+
+    def _check_fork(self):
+        pid = os.getpid()
+        if self._flusher_pid != pid:
+            # NOTE: flushers of the parent process do not exist in a
+            #  forked child.
+            self._flushing.clear()
+            self._flusher_pid = pid
+
+    def _start_flusher(self, pkey):
+        """Start the flusher of a PKey if needed, called with lock held"""
+        self._check_fork()
+        if pkey in self._flushing or pkey not in self._pending:
+            return
+        self._flushing.add(pkey)
+        thread = threading.Thread(target=self._drain, args=(pkey,),
+                                  name='ufm-pkey-flush')
+        thread.daemon = True
+        thread.start()
+
+    def _drain(self, pkey):
+        """Send pending changes of a PKey batch after batch until none is
+        left"""
+        while True:
+            with self._lock:
+                changes = self._pending.pop(pkey, None)
+                if not changes:
+                    self._flushing.discard(pkey)
+                    self._idle.notify_all()
+                    return
+            try:
+                self._send(pkey, changes)
+            except Exception:
+                LOG.exception('Failed to flush changes of partition key %s.',
+                              pkey)
+
+    def _send(self, pkey, changes):
+        # (op, options) -> {guid: [waiter]}
+        batches = collections.OrderedDict()
+        for guid, change in changes.items():
+            batch = batches.setdefault((change.op, change.options),
+                                       collections.OrderedDict())
+            batch[guid] = change.waiters
+        for (op, options), batch in batches.items():
+            if op == _ADD:
+                index0, ip_over_ib, full_membership = options
+                self._apply(batch, self._pkey_client.add_guids, pkey,
+                            list(batch), index0=index0,
+                            ip_over_ib=ip_over_ib,
+                            full_membership=full_membership,
+                            timeout=self._timeout)
+            else:
+                self._apply(batch, self._pkey_client.remove_guids, pkey,
+                            list(batch), timeout=self._timeout)
+
+    def _apply(self, pending, func, pkey, guids, **kwargs):
+        LOG.debug('Flush %(count)d coalesced guid changes of partition key '
+                  '%(pkey)s to UFM.', {'count': len(guids), 'pkey': pkey})
+        error = None
+        failed = None
+        try:
+            func(pkey, guids, **kwargs)
+        except ufm_exec.PartialFailureError as e:
+            # NOTE: only callers of guids in failed chunks get the error.
+            error = e
+            failed = set(e.result.failed)
+        except Exception as e:
+            error = e
+        for guid, waiters in pending.items():
+            if failed is not None and guid not in failed:
+                self._complete(waiters)
+            else:
+                self._complete(waiters, error)
+
+    @staticmethod
+    def _complete(waiters, error=None):
+        for waiter in waiters:
+            waiter.done(error)
+
+    @staticmethod
+    def _normalize(guids):
+        normalized = []
+        seen = set()
+        for guid in ib_guid.normalize_all(guids):
+            if guid not in seen:
+                seen.add(guid)
+                normalized.append(guid)
+        return normalized
@@ -20,7 +20,35 @@ from networking_mlnx_baremetal._i18n import _
 DRIVER_OPTS = [
     cfg.StrOpt('endpoint',
                default='http://127.0.0.1',
-               help=_('UFM REST API endpoint.')),
+               help=_("UFM REST API endpoint. The primary and standby UFMs "
+                      "of a fabric are listed separated by '|', the "
+                      "primary first, e.g. https://ufm1|https://ufm2. "
+                      "Requests fail over to the next healthy UFM when "
+                      "one is unavailable.")),
+    cfg.DictOpt('fabric_endpoints',
+                default={},
+                help=_("Mapping of physical network to the REST API "
+                       "endpoint of the UFM which manages its infiniband "
+                       "fabric, e.g. physnet1:https://ufm1,"
+                       "physnet2:https://ufm2. Every UFM has its own "
+                       "session, connection pool and circuit breaker, so "
+                       "ports of different fabrics are bound in parallel. "
+                       "Segments of other physical networks use endpoint. "
+                       "Standby UFMs of a fabric are listed separated by "
+                       "'|' like in endpoint. All UFMs share the same "
+                       "credentials.")),
+    cfg.IntOpt('endpoint_probe_interval',
+               default=10,
+               min=0,
+               help=_("Seconds between two health probes of the UFMs of a "
+                      "fabric with standby UFMs, requests go to the "
+                      "healthy UFM with the lowest probe latency. 0 "
+                      "disables probes, an UFM is then only found "
+                      "unavailable by a failed request.")),
+    cfg.FloatOpt('endpoint_probe_timeout',
+                 default=2,
+                 min=0,
+                 help=_("Timeout in seconds of an UFM health probe.")),
     cfg.StrOpt('username',
                help=_('Username for UFM REST API authentication.')),
     cfg.StrOpt('password',
@@ -38,11 +66,253 @@ DRIVER_OPTS = [
     cfg.IntOpt('timeout',
                help=_("HTTP timeout in seconds."),
                default=10),
+    cfg.FloatOpt('connect_timeout',
+                 min=0,
+                 help=_("HTTP connect timeout in seconds, the same as "
+                        "timeout if not set.")),
+    cfg.DictOpt('operation_timeouts',
+                default={},
+                help=_("Timeout in seconds of each kind of UFM partition "
+                       "key request, in the form of operation:seconds "
+                       "pairs. Operations are list, get, update, add, "
+                       "remove and delete, e.g. "
+                       "\"list:60,add:10,remove:10\". Operations not "
+                       "listed use timeout.")),
+    cfg.IntOpt('guids_chunk_size',
+               default=128,
+               min=0,
+               help=_("Maximum count of guids added to or removed from a "
+                      "UFM partition key by one request. Larger guid lists "
+                      "are split into chunks, which keeps removal urls "
+                      "below url length limits and payloads below UFM "
+                      "request size limits. 0 means never split.")),
+    cfg.IntOpt('guids_chunk_concurrency',
+               default=4,
+               min=1,
+               help=_("Maximum count of chunks of one guid list sent to UFM "
+                      "concurrently.")),
+    cfg.IntOpt('retry_attempts',
+               default=1,
+               min=1,
+               help=_("Maximum count of attempts of an idempotent UFM "
+                      "request which fails with a connection error or a "
+                      "server side error, including the first attempt. 1 "
+                      "means no retry.")),
+    cfg.FloatOpt('retry_base_delay',
+                 default=0.5,
+                 min=0,
+                 help=_("Seconds to wait before the first retry of a UFM "
+                        "request at most. The wait doubles on every retry "
+                        "and is randomized between 0 and that value.")),
+    cfg.FloatOpt('retry_max_delay',
+                 default=5,
+                 min=0,
+                 help=_("Maximum seconds to wait between two attempts of a "
+                        "UFM request.")),
+    cfg.FloatOpt('retry_budget',
+                 default=30,
+                 min=0,
+                 help=_("Maximum seconds spent on a UFM request with its "
+                        "retries, no retry is started after it.")),
+    cfg.IntOpt('circuit_breaker_threshold',
+               default=0,
+               min=0,
+               help=_("Count of consecutive UFM (or Ironic) connection or "
+                      "server side failures which opens the circuit "
+                      "breaker of the service. While it is open, requests "
+                      "fail fast and ports fail to bind immediately instead "
+                      "of waiting for a timeout. 0 disables circuit "
+                      "breakers.")),
+    cfg.FloatOpt('circuit_breaker_reset_timeout',
+                 default=30,
+                 min=0,
+                 help=_("Seconds an open circuit breaker rejects requests "
+                        "before it lets probe requests through to check if "
+                        "the service has recovered.")),
+    cfg.IntOpt('circuit_breaker_half_open_requests',
+               default=1,
+               min=1,
+               help=_("Maximum count of concurrent probe requests while a "
+                      "circuit breaker is half open.")),
+    cfg.FloatOpt('bind_port_timeout',
+                 default=0,
+                 min=0,
+                 help=_("Overall deadline in seconds of binding a port, "
+                        "shared by the Ironic guid lookup and the UFM "
+                        "partition key update. The binding fails when the "
+                        "deadline is exceeded. 0 means no deadline.")),
+    cfg.IntOpt('pool_connections',
+               default=10,
+               min=1,
+               help=_("Count of HTTP connection pools (one per UFM host) "
+                      "cached by the UFM REST API session.")),
+    cfg.IntOpt('pool_maxsize',
+               default=10,
+               min=1,
+               help=_("Maximum count of keep-alive HTTP connections kept "
+                      "open to one UFM host. It should be no less than the "
+                      "count of concurrent UFM requests of a neutron-server "
+                      "worker, or new connections (and TLS handshakes) are "
+                      "opened and thrown away.")),
+    cfg.BoolOpt('pool_block',
+                default=False,
+                help=_("Wait for a free connection when all pooled "
+                       "connections to UFM are in use, instead of opening a "
+                       "connection which is closed after the request.")),
+    cfg.IntOpt('pool_idle_timeout',
+               default=0,
+               min=0,
+               help=_("Seconds a pooled connection to UFM may stay idle "
+                      "before it is re-established. Set it below the "
+                      "keep-alive timeout of UFM to avoid sending requests "
+                      "on connections closed by UFM. 0 means no limit.")),
+    cfg.IntOpt('response_cache_size',
+               default=0,
+               min=0,
+               help=_("Count of UFM partition key listings (and partition "
+                      "keys) kept with their ETag, Last-Modified and content "
+                      "digest. UFM is asked for changes only and unchanged "
+                      "responses are not decoded again, at the cost of "
+                      "keeping them in memory in every API worker: a "
+                      "listing with guids of a large fabric takes tens of "
+                      "MB. 0 disables the cache.")),
     cfg.ListOpt('physical_networks',
                 default=constants.PHYSICAL_NETWORK_ANY,
                 help=_("Comma-separated list of physical_network which this "
                        "driver should watch. * means any physical_networks "
                        "including None.")),
+    cfg.FloatOpt('pkey_batch_window',
+                 default=0,
+                 min=0,
+                 help=_("Seconds to hold pending partition key membership "
+                        "changes before sending them to UFM. Changes of the "
+                        "same partition key made within this window are "
+                        "merged into one UFM request. Only the last change "
+                        "of a guid is sent, an add followed by a remove of "
+                        "the same guid sends the remove only, and every "
+                        "caller whose change was merged into it gets the "
+                        "result of that last change. 0 means every change "
+                        "is sent to UFM immediately.")),
+    cfg.IntOpt('pkey_replica_ttl',
+               default=0,
+               min=0,
+               help=_("Keep a local replica of UFM partition key membership "
+                      "and skip UFM writes which would not change it, for "
+                      "example adding guids which are already members. The "
+                      "replica is reloaded from UFM after this many seconds "
+                      "and after any failed write. Every neutron-server "
+                      "process (API workers, the reconcile worker) has its "
+                      "own replica which does not see writes of the other "
+                      "processes, so the members of a partition key are "
+                      "read from UFM before any write is skipped. The "
+                      "replica saves UFM writes only, not requests. 0 "
+                      "disables the replica.")),
+    cfg.BoolOpt('async_binding',
+                default=False,
+                help=_("Add guids to the UFM partition key in a background "
+                       "worker instead of blocking bind_port. The port stays "
+                       "DOWN until the worker completes its provisioning "
+                       "block, and is set to ERROR if UFM fails.")),
+    cfg.IntOpt('async_binding_workers',
+               default=8,
+               min=1,
+               help=_("Count of background workers which update UFM "
+                      "partition keys when async_binding is enabled.")),
+    cfg.IntOpt('async_request_concurrency',
+               default=4,
+               min=1,
+               deprecated_name='pkey_delete_workers',
+               help=_("Maximum count of concurrent UFM requests of the "
+                      "background UFM client, which deletes the partition "
+                      "keys of a deleted network and applies reconcile "
+                      "changes.")),
+    cfg.IntOpt('pkey_delete_timeout',
+               default=30,
+               min=1,
+               help=_("Seconds delete_network_postcommit waits for UFM "
+                      "partition key deletions, unfinished deletions go on "
+                      "in background.")),
+    cfg.BoolOpt('deferred_pkey_delete',
+                default=False,
+                help=_("Return from network deletion right away and delete "
+                       "UFM partition keys in background. Failures are only "
+                       "logged.")),
+    cfg.IntOpt('guid_cache_size',
+               default=1024,
+               min=0,
+               help=_("Maximum count of Ironic nodes whose infiniband guids "
+                      "are cached. 0 disables the cache.")),
+    cfg.IntOpt('guid_cache_ttl',
+               default=300,
+               min=0,
+               help=_("Seconds the infiniband guids of an Ironic node stay "
+                      "cached. 0 disables the cache.")),
+    cfg.IntOpt('no_ib_node_cache_size',
+               default=8192,
+               min=0,
+               help=_("Maximum count of Ironic nodes remembered to have no "
+                      "infiniband port, their baremetal ports are skipped "
+                      "without querying Ironic. 0 disables the cache.")),
+    cfg.IntOpt('no_ib_node_cache_ttl',
+               default=600,
+               min=0,
+               help=_("Seconds an Ironic node is remembered to have no "
+                      "infiniband port. 0 disables the cache.")),
+    cfg.BoolOpt('guid_preload',
+                default=False,
+                help=_("Load infiniband guids of all Ironic nodes with one "
+                       "Ironic port listing when the driver is initialized, "
+                       "so binding ports does not query Ironic per node.")),
+    cfg.IntOpt('guid_preload_interval',
+               default=600,
+               min=0,
+               help=_("Seconds between two background refreshes of the "
+                      "preloaded infiniband guids. 0 means load only once. "
+                      "Only used when guid_preload is enabled.")),
+    cfg.IntOpt('reconcile_interval',
+               default=0,
+               min=0,
+               help=_("Seconds between two reconciles of UFM partition "
+                      "membership with port bindings of this driver. Guids "
+                      "missing from a partition are added and stale guids "
+                      "of Ironic nodes are removed. 0 disables the "
+                      "reconcile.")),
+    cfg.BoolOpt('reconcile_dry_run',
+                default=False,
+                help=_("Only log the difference found by the reconcile, do "
+                       "not change UFM partitions.")),
+    cfg.IntOpt('log_max_length',
+               default=1024,
+               min=0,
+               help=_("Maximum characters of a UFM response body, guid list "
+                      "or port binding detail written to logs, longer "
+                      "values are truncated. 0 means no limit.")),
+    cfg.StrOpt('metrics_sink',
+               default='none',
+               choices=('none', 'log', 'statsd', 'prometheus'),
+               help=_("Where timings of driver operations (Ironic port "
+                      "listing, provisioning blocks, UFM requests) are "
+                      "emitted: none, log (periodic summary in the "
+                      "neutron-server log), statsd, or prometheus (a text "
+                      "file for the node exporter textfile collector).")),
+    cfg.StrOpt('metrics_prefix',
+               default='mlnx_ib_bm',
+               help=_("Prefix of emitted metric names.")),
+    cfg.IntOpt('metrics_flush_interval',
+               default=60,
+               min=1,
+               help=_("Seconds between two flushes of aggregated metrics of "
+                      "the log and prometheus sinks.")),
+    cfg.HostAddressOpt('metrics_statsd_host',
+                       default='localhost',
+                       help=_("Host of the statsd daemon.")),
+    cfg.PortOpt('metrics_statsd_port',
+                default=8125,
+                help=_("UDP port of the statsd daemon.")),
+    cfg.StrOpt('metrics_prometheus_file',
+               default='/var/lib/node_exporter/textfile_collector/'
+                       'mlnx_ib_bm.prom',
+               help=_("File the prometheus sink writes metrics to.")),
 ]
 
 
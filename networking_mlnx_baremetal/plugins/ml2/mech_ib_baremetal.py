@@ -12,28 +12,63 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import copy
+import functools
+import threading
+import time
 
-from ironicclient.common.apiclient import exceptions as ironic_exc
+import futurist
+from futurist import waiters
 from neutron.db import provisioning_blocks
 from neutron_lib import constants as n_const
 from neutron_lib.api.definitions import portbindings
 from neutron_lib.callbacks import resources
+from neutron_lib import context as n_context
+from neutron_lib.plugins import directory
 from neutron_lib.plugins.ml2 import api
 from oslo_config import cfg
 from oslo_log import log as logging
 
 from networking_mlnx_baremetal import constants as const, exceptions
+from networking_mlnx_baremetal import guid_cache
 from networking_mlnx_baremetal import ironic_client
+from networking_mlnx_baremetal import lazy
+from networking_mlnx_baremetal import metrics
+from networking_mlnx_baremetal import pkey_queue
+from networking_mlnx_baremetal import reconciler
 from networking_mlnx_baremetal import ufm_client
 from networking_mlnx_baremetal._i18n import _
 from networking_mlnx_baremetal.plugins.ml2 import config
 from networking_mlnx_baremetal.ufmclient import exceptions as ufm_exec
+from networking_mlnx_baremetal.ufmclient import logutils
 
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 config.register_opts(CONF)
 
-MLNX_IB_BAREMETAL_ENTITY = 'MLNX-IB-Baremetal'
+MLNX_IB_BAREMETAL_ENTITY = const.MLNX_IB_BAREMETAL_ENTITY
+
+
+class _AsyncBind(object):
+    """Infiniband partition binding of a port done in background.
+
+    The provisioning block of the port is completed once both the UFM
+    change has been applied and ML2 has committed the binding.
+    """
+
+    __slots__ = ('port_id', 'pkey', 'guids', 'physical_network',
+                 'applied', 'committed')
+
+    def __init__(self, port_id, pkey, guids, physical_network):
+        self.port_id = port_id
+        self.pkey = pkey
+        self.guids = guids
+        self.physical_network = physical_network
+        self.applied = False
+        self.committed = False
+
+    def same_target(self, other):
+        return (self.pkey == other.pkey and self.guids == other.guids and
+                self.physical_network == other.physical_network)
 
 
 class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
@@ -48,11 +83,96 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         been initialized. No abstract methods defined below will be
         called prior to this method being called.
         """
-        self.ironic_client = ironic_client.get_client()
-        self.ufm_client = ufm_client.get_client()
+        # NOTE: clients are created on first use, so neutron-server starts
+        #  quickly and does not fail when Ironic or UFM is unreachable.
+        self.ironic_breaker = None
+        self.ironic_client = lazy.LazyProxy(self._create_ironic_client)
         self.conf = CONF[const.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
-        self.allowed_network_types = const.SUPPORTED_NETWORK_TYPES
-        self.allowed_physical_networks = self.conf.physical_networks
+        logutils.set_max_length(self.conf.log_max_length)
+        # NOTE: checks of port callbacks are compiled once into set
+        #  lookups, and their results are kept per network and segment.
+        self.allowed_network_types = frozenset(const.SUPPORTED_NETWORK_TYPES)
+        self.allowed_physical_networks = frozenset(
+            self.conf.physical_networks)
+        self._any_physical_network = (const.PHYSICAL_NETWORK_ANY in
+                                      self.allowed_physical_networks)
+        # (network type, physical network, has segmentation id) -> whether
+        #  segment is supported
+        self._segment_memo = {}
+        self.bind_port_timeout = self.conf.bind_port_timeout
+        # NOTE: every UFM fabric has its own membership queue, changes of
+        #  one fabric are never held by the latency of another one.
+        # UFM endpoint -> PKeyMembershipQueue
+        self._pkey_queues = {}
+        self._pkey_queues_lock = threading.Lock()
+        self.guid_cache = guid_cache.NodeGuidCache(self.conf.guid_cache_size,
+                                                   self.conf.guid_cache_ttl)
+        self.no_ib_nodes = guid_cache.NoIbNodeCache(
+            self.conf.no_ib_node_cache_size, self.conf.no_ib_node_cache_ttl)
+        self.binding_executor = None
+        # port id -> _AsyncBind not completed yet
+        self._async_binds = {}
+        self._async_binds_lock = threading.Lock()
+        if self.conf.async_binding:
+            self.binding_executor = futurist.ThreadPoolExecutor(
+                max_workers=self.conf.async_binding_workers)
+        self.guid_index = None
+        if self.conf.guid_preload:
+            self.guid_index = guid_cache.FleetGuidIndex(
+                self.ironic_client,
+                interval=self.conf.guid_preload_interval)
+
+    def _create_ironic_client(self):
+        from ironicclient.common.apiclient import exceptions as ironic_exc
+        self.ironic_breaker = ufm_client.get_breaker(
+            'ironic', (ironic_exc.ConnectionError,
+                       ironic_exc.HttpServerError))
+        return ironic_client.get_client()
+
+    def get_workers(self):
+        """Get workers which run in their own process.
+
+        A UFM partition reconcile worker per UFM fabric is returned when
+        reconcile is enabled.
+        """
+        if self.conf.reconcile_interval > 0:
+            return [reconciler.PKeyReconcileWorker(
+                functools.partial(self._create_reconciler, endpoint),
+                self.conf.reconcile_interval)
+                for endpoint in ufm_client.get_endpoints()]
+        return []
+
+    def _create_reconciler(self, endpoint):
+        return reconciler.PKeyReconciler(
+            lazy.LazyProxy(lambda: ufm_client.get_endpoint_client(endpoint)),
+            lazy.LazyProxy(
+                lambda: ufm_client.get_endpoint_async_client(endpoint)),
+            self.ironic_client,
+            self.allowed_network_types, self.allowed_physical_networks,
+            dry_run=self.conf.reconcile_dry_run,
+            physical_network_filter=(
+                lambda physnet: ufm_client.get_endpoint(physnet) == endpoint))
+
+    def _get_pkey_queue(self, physical_network):
+        """Return the PKey membership queue of the UFM which manages the
+        infiniband fabric of a physical network.
+
+        :param physical_network: the physical network of a segment
+        :return: a PKeyMembershipQueue instance
+        """
+        endpoint = ufm_client.get_endpoint(physical_network)
+        queue = self._pkey_queues.get(endpoint)
+        if queue is None:
+            with self._pkey_queues_lock:
+                queue = self._pkey_queues.get(endpoint)
+                if queue is None:
+                    queue = pkey_queue.PKeyMembershipQueue(
+                        lazy.LazyProxy(
+                            lambda: ufm_client.get_endpoint_client(
+                                endpoint).pkey),
+                        window=self.conf.pkey_batch_window)
+                    self._pkey_queues[endpoint] = queue
+        return queue
 
     def create_network_precommit(self, context):
         """Allocate resources for a new network.
@@ -130,6 +250,7 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         """
         pass
 
+    @metrics.timed('delete_network_postcommit')
     def delete_network_postcommit(self, context):
         """Delete a network.
 
@@ -145,23 +266,70 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         # TODO(qianbiao.ng): if an UFM partition has no guid, it will be auto
         #  deleted. So, if port unbound logic is stable (remove guid when
         #  unbound), we may ignore delete_network_postcommit callback?
-        for segment in context.network_segments:
-            if self._is_segment_supported(segment):
-                segmentation_id = segment.get(api.SEGMENTATION_ID)
-                pkey = hex(segmentation_id)
-                try:
-                    self.ufm_client.pkey.delete(pkey)
-                except ufm_exec.ResourceNotFoundError:
-                    # NOTE(turnbig): ignore 404 exception, because of that the
-                    #  UFM partition key may have not been setup at this point.
-                    LOG.info(_("UFM partition key %(pkey)s does not exists, "
-                               "could not be deleted."),
-                             {'pkey': pkey})
-                except ufm_exec.UfmClientError as e:
-                    LOG.error(_("Failed to delete UFM partition key %(pkey)s, "
-                                "reason is %(reason)s."),
-                              {'pkey': pkey, 'reason': e})
-                    raise
+        pkeys = [(hex(segment.get(api.SEGMENTATION_ID)),
+                  segment.get(api.PHYSICAL_NETWORK))
+                 for segment in context.network_segments
+                 if self._is_segment_supported(segment)]
+        if not pkeys:
+            return
+
+        futures = [self._delete_pkey(pkey, physical_network)
+                   for pkey, physical_network in pkeys]
+        if self.conf.deferred_pkey_delete:
+            LOG.info(_("UFM partition keys %(pkeys)s will be deleted in "
+                       "background."),
+                     {'pkeys': logutils.truncated(
+                         [pkey for pkey, _physnet in pkeys])})
+            return
+
+        done, not_done = waiters.wait_for_all(
+            futures, timeout=self.conf.pkey_delete_timeout)
+        if not_done:
+            LOG.warning(_("Deleting UFM partition keys did not finish in "
+                          "%(timeout)s seconds, %(count)d deletions continue "
+                          "in background."),
+                        {'timeout': self.conf.pkey_delete_timeout,
+                         'count': len(not_done)})
+        for future in futures:
+            if future not in done:
+                continue
+            error = future.exception()
+            if (error is not None and
+                    not isinstance(error, ufm_exec.ResourceNotFoundError)):
+                raise error
+
+    def _delete_pkey(self, pkey, physical_network=None):
+        """Delete an UFM partition key by the background UFM client.
+
+        A missing partition key is ignored.
+
+        :param pkey: the partition key, hexadecimal string
+        :param physical_network: the physical network of the segment, it
+            selects the UFM of the fabric
+        :return: a future of the deletion
+        """
+        started = time.time()
+        future = ufm_client.get_async_client(physical_network).pkey.delete(
+            pkey)
+        future.add_done_callback(
+            functools.partial(self._pkey_deleted, pkey, started))
+        return future
+
+    @staticmethod
+    def _pkey_deleted(pkey, started, future):
+        metrics.timing('delete_network_postcommit.ufm_delete',
+                       time.time() - started)
+        error = future.exception()
+        if isinstance(error, ufm_exec.ResourceNotFoundError):
+            # NOTE(turnbig): ignore 404 exception, because of that the
+            #  UFM partition key may have not been setup at this point.
+            LOG.info(_("UFM partition key %(pkey)s does not exists, "
+                       "could not be deleted."),
+                     {'pkey': pkey})
+        elif error is not None:
+            LOG.error(_("Failed to delete UFM partition key %(pkey)s, "
+                        "reason is %(reason)s."),
+                      {'pkey': pkey, 'reason': error})
 
     def create_subnet_precommit(self, context):
         """Allocate resources for a new subnet.
@@ -297,6 +465,7 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         """
         pass
 
+    @metrics.timed('update_port_postcommit')
     def update_port_postcommit(self, context):
         # type: (api.PortContext) -> None
         """Update a port.
@@ -318,70 +487,94 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         original_port = context.original
 
         if not self._is_baremetal_port(port):
-            LOG.info(_('Port is not a baremetal port, '
-                       'skip update_port_postcommit callback.'))
+            LOG.debug('Port is not a baremetal port, '
+                      'skip update_port_postcommit callback.')
             return
 
-        if not self._is_port_bound(context):
-            LOG.info(_('Port is not bound by current driver, '
-                       'skip update_port_postcommit callback.'))
+        self._invalidate_guid_cache(port, original_port)
+
+        current_vif_type = context.vif_type
+        original_vif_type = context.original_vif_type
+        unbound = (current_vif_type == portbindings.VIF_TYPE_UNBOUND
+                   and original_vif_type not in const.UNBOUND_VIF_TYPES)
+        binding_failed = (
+            current_vif_type == portbindings.VIF_TYPE_BINDING_FAILED
+            and port.get('status') == n_const.PORT_STATUS_ERROR)
+        bound = (current_vif_type not in const.UNBOUND_VIF_TYPES
+                 and original_vif_type in const.UNBOUND_VIF_TYPES
+                 and port['id'] in self._async_binds)
+        # NOTE: only these transitions need work below, most updates
+        #  (status, device owner, ...) are skipped before scanning the
+        #  binding levels. Unbound to bound only matters for a port bound
+        #  in background, the provisioning block added by bind_port is
+        #  completed once its binding is committed and its guids are
+        #  added to UFM.
+        if not unbound and not binding_failed and not bound:
+            LOG.debug('Port binding is not unbound, failed or committed '
+                      'after a background binding, skip '
+                      'update_port_postcommit callback.')
             return
 
         binding_level = self._get_binding_level(context)
-        LOG.info(_('Port is bound by current driver with binding '
-                   'level %(binding_level)s.'),
-                 {'binding_level': binding_level})
+        if not binding_level:
+            LOG.debug('Port is not bound by current driver, '
+                      'skip update_port_postcommit callback.')
+            return
 
-        current_vif_type = context.vif_type
-        original_vif_type = context.original_vif_type
+        LOG.debug('Port is bound by current driver with binding '
+                  'level %(binding_level)s.',
+                  {'binding_level': binding_level})
 
         # when port is unbound, unbind relevant guids from IB partition.
-        if (current_vif_type == portbindings.VIF_TYPE_UNBOUND
-                and original_vif_type not in const.UNBOUND_VIF_TYPES):
+        if unbound:
             LOG.info(_("Port's VIF type changed from bound to unbound"))
+            # NOTE: a background binding still in progress must not
+            #  complete provisioning of the unbound port, its guids are
+            #  removed below after it is applied.
+            with self._async_binds_lock:
+                self._async_binds.pop(port['id'], None)
             LOG.info(_("Remove infiniband guids from partition key now."))
 
             # binding:host_id has been clear in current port
             node_uuid = original_port.get(portbindings.HOST_ID)
-            node_ib_guids = self._get_ironic_ib_guids(node_uuid)
+            with metrics.timer('update_port_postcommit.ironic_guids'):
+                node_ib_guids = self._get_ironic_ib_guids(node_uuid)
             if len(node_ib_guids) == 0:
                 LOG.error(_(
                     'For current port(%(port)s), could not find any '
                     'infiniband port presents in the same ironic '
                     'node(%(node_uuid)s), could not remove guids from '
                     'partition key.'),
-                    {port: port, 'node_uuid': node_uuid})
+                    {'port': port.get('id'), 'node_uuid': node_uuid})
                 return
 
-            LOG.info(_('To be removed infiniband port guids: %s.')
-                     % node_ib_guids)
+            LOG.info(_('To be removed infiniband port guids: %s.'),
+                     logutils.truncated(node_ib_guids))
 
             segmentation_id = binding_level.get(api.SEGMENTATION_ID)
-            self.ufm_client.pkey.remove_guids(hex(segmentation_id),
-                                              node_ib_guids)
+            physical_network = binding_level.get(api.PHYSICAL_NETWORK)
+            with metrics.timer('update_port_postcommit.ufm_remove_guids'):
+                self._get_pkey_queue(physical_network).remove_guids(
+                    hex(segmentation_id), node_ib_guids).result()
             LOG.info(_('Infiniband port guids %(guids)s has been removed '
                        'from partition key %(pkey)s.'),
-                     {'guids': node_ib_guids,
+                     {'guids': logutils.truncated(node_ib_guids),
                       'pkey': hex(segmentation_id)})
 
-        # when port is bound, mark port as provision completed.
-        if (current_vif_type not in const.UNBOUND_VIF_TYPES
-                and original_vif_type in const.UNBOUND_VIF_TYPES):
+        # when a port bound in background is committed, complete its
+        # provisioning.
+        if bound:
             LOG.info(_("Port's VIF type changed from unbound to bound."))
-            # NOTE(qianbiao.ng): this provisioning_complete action maps to
-            #  provisioning_blocks.add_provisioning_component called in
-            #  bind_port process.
-            # provisioning_blocks.provisioning_complete(
-            #     context._plugin_context, port['id'], resources.PORT,
-            #     MLNX_IB_BAREMETAL_ENTITY)
-            pass
+            self._async_bind_committed(
+                context._plugin_context, port['id'],
+                hex(binding_level.get(api.SEGMENTATION_ID)),
+                binding_level.get(api.PHYSICAL_NETWORK))
 
         # when port binding fails, raise exception
-        if (port.get('status') == n_const.PORT_STATUS_ERROR
-                and current_vif_type == portbindings.VIF_TYPE_BINDING_FAILED):
+        if binding_failed:
             LOG.info(_("Port binding failed, Port's VIF details: "
                        "%(vif_details)s."),
-                     {'vif_details': context.vif_details})
+                     {'vif_details': logutils.truncated(context.vif_details)})
             if context.vif_details.get('driver') == const.DRIVE_NAME:
                 LOG.info(_("Port binding failure is caused by current driver. "
                            "Raise an exception to abort port update "
@@ -415,8 +608,14 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         # NOTE(turnbig): it's impossible to get relevant infiniband ports
         #  here, the relevant Ironic Node(binding:host_id) has been clear
         #  before deleted.
-        pass
-
+        # NOTE: guids of a background binding which was never committed
+        #  are removed once it is applied.
+        with self._async_binds_lock:
+            pending = self._async_binds.pop(context.current['id'], None)
+        if pending is not None and not pending.committed:
+            self._discard_async_bind(pending)
+
+    @metrics.timed('bind_port')
     def bind_port(self, context):
         """Attempt to bind a port.
 
@@ -462,7 +661,7 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         port = context.current
         is_baremetal_port = self._is_baremetal_port(port)
         if not is_baremetal_port:
-            LOG.info(_('Port is not a baremetal port, skip binding.'))
+            LOG.debug('Port is not a baremetal port, skip binding.')
             return
 
         # NOTE(turnbig): it seems ml2 driver will auto check whether a
@@ -472,39 +671,88 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         #     LOG.info(_('Port has been bound by this driver, skip binding.'))
         #     return
 
+        if port.get(portbindings.HOST_ID) in self.no_ib_nodes:
+            LOG.debug('Ironic node %s has no infiniband port, skip binding.',
+                      port.get(portbindings.HOST_ID))
+            return
+
         # try to bind segment now
         LOG.info(_('Port is supported, will try binding IB partition now.'))
+        deadline = None
+        if self.bind_port_timeout:
+            deadline = time.time() + self.bind_port_timeout
         for segment in context.segments_to_bind:
             if self._is_segment_supported(segment):
                 node_uuid = port.get(portbindings.HOST_ID)
-                node_ib_guids = self._get_ironic_ib_guids(node_uuid)
+                try:
+                    with metrics.timer('bind_port.ironic_guids'):
+                        node_ib_guids = self._get_ironic_ib_guids(node_uuid)
+                except ufm_exec.CircuitOpenError as e:
+                    LOG.error(_("Failed to load infiniband guids of ironic "
+                                "node %(node_uuid)s, reason is %(reason)s."),
+                              {'node_uuid': node_uuid, 'reason': str(e)})
+                    context.set_binding(segment[api.ID],
+                                        portbindings.VIF_TYPE_BINDING_FAILED,
+                                        {'driver': const.DRIVE_NAME,
+                                         'reason': str(e)},
+                                        status=n_const.PORT_STATUS_ERROR)
+                    return
                 if len(node_ib_guids) == 0:
                     LOG.warning(_(
                         'For current port(%(port)s), could not find any IB '
                         'port presents in the same ironic '
                         'node(%(node_uuid)s), break bind port process now.'),
-                        {port: port, 'node_uuid': node_uuid})
+                        {'port': port.get('id'), 'node_uuid': node_uuid})
                     return
 
-                LOG.info(_('Load infiniband ports guids: %s.')
-                         % node_ib_guids)
+                LOG.info(_('Load infiniband ports guids: %s.'),
+                         logutils.truncated(node_ib_guids))
 
-                LOG.debug(_('Try to bind IB ports using segment: %s'), segment)
+                LOG.debug('Try to bind IB ports using segment: %s',
+                          logutils.truncated(segment))
                 # update partition key for relevant guids
                 segment_id = segment[api.ID]
                 segmentation_id = segment[api.SEGMENTATION_ID]
 
                 try:
-                    provisioning_blocks.add_provisioning_component(
-                        context._plugin_context, port['id'], resources.PORT,
-                        MLNX_IB_BAREMETAL_ENTITY)
-
-                    self.ufm_client.pkey.add_guids(hex(segmentation_id),
-                                                   guids=node_ib_guids)
-                    LOG.info(_('Successfully bound IB ports %(ports)s to '
-                               'partition %(pkey)s.'),
-                             {'ports': node_ib_guids,
-                              'pkey': hex(segmentation_id)})
+                    remaining = self._remaining(deadline)
+                    with metrics.timer('bind_port.provisioning_block'):
+                        provisioning_blocks.add_provisioning_component(
+                            context._plugin_context, port['id'],
+                            resources.PORT, MLNX_IB_BAREMETAL_ENTITY)
+
+                    if self.binding_executor is not None:
+                        # NOTE: the port stays DOWN until the background
+                        #  worker completes the provisioning block.
+                        self._submit_async_bind(_AsyncBind(
+                            port['id'], hex(segmentation_id),
+                            node_ib_guids, segment[api.PHYSICAL_NETWORK]))
+                        LOG.info(_('Binding IB ports %(ports)s to '
+                                   'partition %(pkey)s in background.'),
+                                 {'ports': logutils.truncated(node_ib_guids),
+                                  'pkey': hex(segmentation_id)})
+                    else:
+                        with metrics.timer('bind_port.ufm_add_guids'):
+                            queue = self._get_pkey_queue(
+                                segment[api.PHYSICAL_NETWORK])
+                            future = queue.add_guids(
+                                hex(segmentation_id), node_ib_guids)
+                            try:
+                                future.result(timeout=remaining)
+                            except futurist.TimeoutError:
+                                # NOTE: the binding fails, so the add must
+                                #  not be applied later on. A pending add
+                                #  is replaced by the removal, one being
+                                #  sent is followed by it.
+                                queue.remove_guids(hex(segmentation_id),
+                                                   node_ib_guids)
+                                raise ufm_exec.UfmDeadlineExceeded(
+                                    operation='bind_port',
+                                    timeout=self.bind_port_timeout)
+                        LOG.info(_('Successfully bound IB ports %(ports)s '
+                                   'to partition %(pkey)s.'),
+                                 {'ports': logutils.truncated(node_ib_guids),
+                                  'pkey': hex(segmentation_id)})
 
                     # NOTE(turnbig): setting VIF details has no effect here.
                     # details = {
@@ -526,7 +774,7 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
                     LOG.error(_("Failed to add guids %(guids)s to UFM "
                                 "partition key %(pkey)s, "
                                 "reason is %(reason)s."),
-                              {'guids': node_ib_guids,
+                              {'guids': logutils.truncated(node_ib_guids),
                                'pkey': hex(segmentation_id),
                                'reason': str(e)})
 
@@ -541,6 +789,161 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
                                         vif_details,
                                         status=n_const.PORT_STATUS_ERROR)
 
+    def _remaining(self, deadline):
+        """Return seconds left before the bind_port deadline
+
+        :param deadline: the deadline timestamp, no deadline if None
+        :return: seconds left, or None if there is no deadline
+        :raises: UfmDeadlineExceeded if the deadline has passed
+        """
+        if deadline is None:
+            return None
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            metrics.incr('bind_port.deadline_exceeded')
+            raise ufm_exec.UfmDeadlineExceeded(
+                operation='bind_port', timeout=self.bind_port_timeout)
+        return remaining
+
+    def _submit_async_bind(self, bind):
+        """Add guids of a binding to UFM in background.
+
+        ML2 may call bind_port again for the same port when a binding
+        could not be committed, the binding it replaces is discarded.
+
+        :param bind: the :class:`_AsyncBind` of the port
+        """
+        with self._async_binds_lock:
+            previous = self._async_binds.get(bind.port_id)
+            if (previous is not None and not previous.committed
+                    and previous.same_target(bind)):
+                # NOTE: the same guids are being added already.
+                return
+            self._async_binds[bind.port_id] = bind
+        if previous is not None and not previous.committed:
+            self._discard_async_bind(previous)
+        # NOTE: the add is queued here so that a later removal of the
+        #  binding is queued after it.
+        future = self._get_pkey_queue(bind.physical_network).add_guids(
+            bind.pkey, bind.guids)
+        self.binding_executor.submit(self._bind_guids_async, bind, future)
+
+    def _discard_async_bind(self, bind):
+        """Remove guids of a background binding which was not committed.
+
+        The removal is queued after the add of the binding, so it is
+        applied after it.
+
+        :param bind: the discarded :class:`_AsyncBind`
+        """
+        LOG.info(_('Binding of port %(port_id)s to partition %(pkey)s was '
+                   'discarded, remove its infiniband guids %(guids)s.'),
+                 {'port_id': bind.port_id, 'pkey': bind.pkey,
+                  'guids': logutils.truncated(bind.guids)})
+        self._get_pkey_queue(bind.physical_network).remove_guids(
+            bind.pkey, bind.guids)
+
+    def _async_bind_committed(self, plugin_context, port_id, pkey,
+                              physical_network):
+        """Record that ML2 committed the binding of a port.
+
+        When the committed binding is not the one being added in
+        background, the guids of the stale binding are removed and the
+        guids are added to the committed partition key instead, its
+        provisioning is completed once they are applied.
+
+        :param plugin_context: the plugin context of the port update
+        :param port_id: the id of the bound port
+        :param pkey: the partition key of the committed binding
+        :param physical_network: the physical network of the committed
+            binding
+        """
+        with self._async_binds_lock:
+            bind = self._async_binds.get(port_id)
+            if bind is None:
+                return
+            stale = bind.pkey != pkey
+            if not stale:
+                bind.committed = True
+                if not bind.applied:
+                    return
+            del self._async_binds[port_id]
+        if not stale:
+            self._complete_provisioning(plugin_context, bind)
+            return
+
+        LOG.warning(_('Committed binding of port %(port_id)s to partition '
+                      '%(pkey)s does not match its background binding to '
+                      'partition %(stale)s.'),
+                    {'port_id': port_id, 'pkey': pkey, 'stale': bind.pkey})
+        self._discard_async_bind(bind)
+        committed = _AsyncBind(port_id, pkey, bind.guids, physical_network)
+        committed.committed = True
+        self._submit_async_bind(committed)
+
+    def _bind_guids_async(self, bind, future):
+        """Wait for guids to be added to a partition key, then complete the
+        provisioning block of the port if its binding has been committed,
+        or set the port status to ERROR on failure.
+
+        Runs in the background binding worker pool.
+
+        :param bind: the :class:`_AsyncBind` of the port
+        :param future: the future of the queued UFM change
+        """
+        port_id, pkey, guids = bind.port_id, bind.pkey, bind.guids
+        context = n_context.get_admin_context()
+        try:
+            with metrics.timer('bind_port.async_ufm_add_guids'):
+                future.result()
+        except ufm_exec.UfmClientError as e:
+            LOG.error(_("Failed to add guids %(guids)s to UFM partition key "
+                        "%(pkey)s for port %(port_id)s, reason is "
+                        "%(reason)s."),
+                      {'guids': logutils.truncated(guids), 'pkey': pkey,
+                       'port_id': port_id, 'reason': e})
+            with self._async_binds_lock:
+                if self._async_binds.get(port_id) is not bind:
+                    # NOTE: the binding was discarded or unbound meanwhile.
+                    return
+                del self._async_binds[port_id]
+            try:
+                directory.get_plugin().update_port_status(
+                    context, port_id, n_const.PORT_STATUS_ERROR)
+            except Exception:
+                LOG.exception("Failed to set status of port %s to ERROR.",
+                              port_id)
+            return
+
+        LOG.info(_('Successfully bound IB ports %(ports)s to partition '
+                   '%(pkey)s of port %(port_id)s.'),
+                 {'ports': logutils.truncated(guids), 'pkey': pkey,
+                  'port_id': port_id})
+        with self._async_binds_lock:
+            if self._async_binds.get(port_id) is not bind:
+                return
+            bind.applied = True
+            if not bind.committed:
+                # NOTE: provisioning is completed when ML2 commits the
+                #  binding, see update_port_postcommit.
+                return
+            del self._async_binds[port_id]
+        self._complete_provisioning(context, bind)
+
+    @staticmethod
+    def _complete_provisioning(context, bind):
+        LOG.info(_('Complete provisioning of port %(port_id)s bound to '
+                   'partition %(pkey)s.'),
+                 {'port_id': bind.port_id, 'pkey': bind.pkey})
+        try:
+            with metrics.timer('bind_port.provisioning_complete'):
+                provisioning_blocks.provisioning_complete(
+                    context, bind.port_id, resources.PORT,
+                    MLNX_IB_BAREMETAL_ENTITY)
+        except Exception:
+            LOG.exception("Failed to complete provisioning of port %s.",
+                          bind.port_id)
+
     @staticmethod
     def _is_baremetal_port(port):
         """Return whether a port's VNIC_TYPE is baremetal.
@@ -605,6 +1008,24 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         return True
 
     def _is_segment_supported(self, segment):
+        """Return whether a network segment is supported by this driver.
+
+        The result only depends on the network type, the physical network
+        and whether the segment has a segmentation id, so it is kept by
+        these attributes and never goes stale, see :meth:`_check_segment`.
+
+        :param segment: indicates the segment to check
+        :returns: true if segment is supported else false
+        """
+        key = (segment[api.NETWORK_TYPE], segment[api.PHYSICAL_NETWORK],
+               bool(segment[api.SEGMENTATION_ID]))
+        supported = self._segment_memo.get(key)
+        if supported is None:
+            supported = self._segment_memo[key] = self._check_segment(
+                segment)
+        return supported
+
+    def _check_segment(self, segment):
         """Return whether a network segment is supported by this driver. A
         segment dictionary looks like:
 
@@ -625,7 +1046,7 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         :returns: true if segment is supported else false
         """
         LOG.debug("Checking whether segment is supported: %(segment)s ",
-                  {'segment': segment})
+                  {'segment': logutils.truncated(segment)})
 
         segment_id = segment[api.ID]
         network_id = segment[api.NETWORK_ID]
@@ -674,10 +1095,8 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         :param physical_network: the physical network to check
         :return: true if match else false
         """
-        if (const.PHYSICAL_NETWORK_ANY in self.allowed_physical_networks
-                or physical_network in self.allowed_physical_networks):
-            return True
-        return False
+        return (self._any_physical_network
+                or physical_network in self.allowed_physical_networks)
 
     @staticmethod
     def _is_port_supported(port_context):
@@ -725,17 +1144,17 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         binding_level = this._get_binding_level(port_context)
         if binding_level:
             segmentation_id = binding_level.get(api.SEGMENTATION_ID)
-            LOG.info("Port %(port_id)s has been bound to segmentation "
-                     "%(segmentation_id)s by driver %(driver)s",
-                     {"port_id": port_id,
-                      "segmentation_id": segmentation_id,
-                      "driver": const.DRIVE_NAME})
+            LOG.debug("Port %(port_id)s has been bound to segmentation "
+                      "%(segmentation_id)s by driver %(driver)s",
+                      {"port_id": port_id,
+                       "segmentation_id": segmentation_id,
+                       "driver": const.DRIVE_NAME})
             return True
 
-        LOG.info("Port %(port_id)s is not bound to any known segmentation "
-                 "of its network by driver %(driver)s",
-                 {"port_id": port_id,
-                  "driver": const.DRIVE_NAME})
+        LOG.debug("Port %(port_id)s is not bound to any known segmentation "
+                  "of its network by driver %(driver)s",
+                  {"port_id": port_id,
+                   "driver": const.DRIVE_NAME})
         return False
 
     @staticmethod
@@ -755,10 +1174,6 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
         :param port_context: The PortContext to check
         :returns: binding level if port has been bound by this driver else None
         """
-        network_segments = port_context.network.network_segments
-        network_segment_id_list = {s.get(api.SEGMENTATION_ID)
-                                   for s in network_segments}
-
         # NOTE(qianbiao.ng): It's impossible to get binding_levels from
         # PortContext.binding_levels in this place (only in bind_port
         # callback). But, binding_levels is passed as a property in port
@@ -777,32 +1192,99 @@ class InfiniBandBaremetalMechanismDriver(api.MechanismDriver):
             ]
         """
         binding_levels = port_context.current.get('binding_levels', [])
-        LOG.info("Get binding_level of current driver from "
-                 "network segments: %(segments)s, "
-                 "binding levels: %(binding_levels)s.",
-                 {'segments': network_segments,
-                  'binding_levels': binding_levels})
-        for level in binding_levels:
-            bound_driver = level.get('driver')
-            segmentation_id = level.get(api.SEGMENTATION_ID)
-            if (bound_driver == const.DRIVE_NAME and
-                    segmentation_id in network_segment_id_list):
+        # NOTE: network segments are only looked at for levels of this
+        #  driver, ports bound by other drivers return right away.
+        levels = [level for level in binding_levels
+                  if level.get('driver') == const.DRIVE_NAME]
+        if not levels:
+            return None
+
+        network_segments = port_context.network.network_segments
+        LOG.debug("Get binding_level of current driver from "
+                  "network segments: %(segments)s, "
+                  "binding levels: %(binding_levels)s.",
+                  {'segments': logutils.truncated(network_segments),
+                   'binding_levels': logutils.truncated(binding_levels)})
+        segmentation_ids = frozenset(s.get(api.SEGMENTATION_ID)
+                                     for s in network_segments)
+        for level in levels:
+            if level.get(api.SEGMENTATION_ID) in segmentation_ids:
                 return level
 
         return None
 
+    def _invalidate_guid_cache(self, port, original_port):
+        """Drop cached guids of the nodes a port is attached to when the
+        port-level attributes set by Ironic changed, the ports of those
+        nodes may have been re-enrolled.
+
+        :param port: the current port dict
+        :param original_port: the original port dict
+        """
+        if not original_port:
+            return
+        if (port.get('mac_address') == original_port.get('mac_address') and
+                port.get(portbindings.PROFILE) ==
+                original_port.get(portbindings.PROFILE)):
+            return
+
+        for node in {port.get(portbindings.HOST_ID),
+                     original_port.get(portbindings.HOST_ID)}:
+            if node:
+                LOG.debug('Port %(port_id)s changed, invalidate cached '
+                          'infiniband guids of node %(node)s.',
+                          {'port_id': port.get('id'), 'node': node})
+                self.guid_cache.invalidate(node)
+                self.no_ib_nodes.invalidate(node)
+                if self.guid_index is not None:
+                    self.guid_index.invalidate(node)
+
     def _get_ironic_ib_guids(self, node):
         """Get all ib guid list of an Ironic node.
 
         :param node: indicates the uuid of ironic node
         :return: infiniband guid list for all present IB ports
         """
+        if node in self.no_ib_nodes:
+            return []
+
+        if self.guid_index is not None:
+            guids = self.guid_index.get(node)
+            if guids is not None:
+                return guids
+
+        guids = self.guid_cache.get(node, self._list_ironic_ib_guids)
+        if not guids:
+            self.no_ib_nodes.add(node)
+        # NOTE: stats() takes the cache lock, only pay for it when the
+        #  message is logged.
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug('Infiniband guid cache stats: %s.',
+                      self.guid_cache.stats())
+        return guids
+
+    def _list_ironic_ib_guids(self, node):
+        """List all ib guid of an Ironic node from Ironic API.
+
+        :param node: indicates the uuid of ironic node
+        :return: infiniband guid list for all present IB ports
+        """
+        from ironicclient.common.apiclient import exceptions as ironic_exc
+
         try:
-            node_ports = self.ironic_client.port.list(node=node, detail=True)
+            # NOTE: the breaker is created together with the client.
+            client = lazy.resolve(self.ironic_client)
+            if self.ironic_breaker is not None:
+                node_ports = self.ironic_breaker.call(
+                    client.port.list, node=node, fields=['extra'])
+            else:
+                node_ports = client.port.list(node=node, fields=['extra'])
             node_ib_guids = [node_port.extra.get('client-id')
                              for node_port in node_ports
                              if node_port.extra.get('client-id')]
             return node_ib_guids
+        except ufm_exec.CircuitOpenError:
+            raise
         except ironic_exc.UnsupportedVersion:
             LOG.exception(
                 "Failed to get ironic port list, Ironic Client is "
@@ -0,0 +1,333 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import array
+import threading
+import time
+
+from neutron.db.models import provisioning_block as pb_models
+from neutron.db.models import segment as segment_models
+from neutron.db import models_v2
+from neutron.plugins.ml2 import models as ml2_models
+from neutron_lib import context as n_context
+from neutron_lib.db import api as db_api
+from neutron_lib import worker
+from oslo_log import log as logging
+import six
+
+from networking_mlnx_baremetal import constants as const
+from networking_mlnx_baremetal import guid_cache
+from networking_mlnx_baremetal.ufmclient import exceptions as ufm_exec
+from networking_mlnx_baremetal.ufmclient import guid as ib_guid
+from networking_mlnx_baremetal.ufmclient import logutils
+
+LOG = logging.getLogger(__name__)
+
+
+def _pkey(value):
+    """Normalize a pkey (int or hexadecimal string) to an int"""
+    if isinstance(value, six.integer_types):
+        return value
+    return int(value, 16)
+
+
+_NO_GUIDS = ib_guid.GuidSet()
+
+
+class PKeyReconciler(object):
+    """Reconcile UFM partition membership with Neutron port bindings.
+
+    The desired state is the guids of every Ironic node which has a port
+    bound by this driver, grouped by the pkey of the bound segment. The
+    actual state is read from UFM with one pkey listing. Only pkeys of
+    segments this driver may bind and guids of Ironic nodes are managed,
+    any other UFM partition or member is left alone. When several UFMs
+    manage their own fabric, a reconciler only looks at the segments of
+    physical networks of its UFM.
+
+    UFM is read before Neutron, so a guid added by a binding which commits
+    meanwhile is seen as bound rather than stale. Guids of nodes whose
+    ports are still being provisioned are never removed, and any other
+    guid is only removed once it has been stale in two consecutive runs.
+    """
+
+    def __init__(self, ufm_client, async_ufm_client, ironic_client,
+                 allowed_network_types, allowed_physical_networks,
+                 dry_run=False, guid_index=None,
+                 physical_network_filter=None):
+        """Initial a PKey reconciler
+
+        :param ufm_client: the UFM REST API client
+        :param async_ufm_client: the background UFM REST API client of the
+            same UFM, changes are sent by it concurrently
+        :param ironic_client: the Ironic client used to list ports
+        :param allowed_network_types: network types supported by driver
+        :param allowed_physical_networks: physical networks watched by
+            driver
+        :param dry_run: only report the difference if true
+        :param guid_index: a preloaded
+            :class:`~networking_mlnx_baremetal.guid_cache.FleetGuidIndex`,
+            a private one is refreshed on every run if not set.
+        :param physical_network_filter: callable returns whether the
+            partitions of a physical network are managed by the UFM of
+            ufm_client, segments of all physical networks are if not set.
+        """
+        self.ufm_client = ufm_client
+        self.async_ufm_client = async_ufm_client
+        self.allowed_network_types = allowed_network_types
+        self.allowed_physical_networks = allowed_physical_networks
+        self.dry_run = dry_run
+        self.physical_network_filter = physical_network_filter
+        # NOTE: pkey -> GuidSet of guids found stale by the previous run.
+        self._stale = {}
+        self._refresh_index = guid_index is None
+        self.guid_index = guid_index or guid_cache.FleetGuidIndex(
+            ironic_client)
+
+    def reconcile(self):
+        """Compute the difference and apply it to UFM.
+
+        :return: a tuple of pkey -> guids to add and pkey -> guids to remove
+        """
+        started = time.time()
+        actual = self._load_actual()
+        if self._refresh_index or not self.guid_index.loaded:
+            self.guid_index.refresh()
+        node_guids = dict(self.guid_index.items())
+
+        bound, managed_pkeys, provisioning = self._load_bindings()
+        desired = {}
+        for node, segmentation_id in bound:
+            guids = node_guids.get(node)
+            if guids:
+                desired.setdefault(segmentation_id, []).extend(guids)
+        desired = dict((pkey, ib_guid.GuidSet(guids, strict=False))
+                       for pkey, guids in desired.items())
+
+        managed_guids = ib_guid.GuidSet(
+            (guid for node, guids in node_guids.items()
+             if node not in provisioning for guid in guids),
+            strict=False)
+        to_add, stale = self.diff(desired, actual, managed_pkeys,
+                                  managed_guids)
+        to_remove = self._confirm_stale(stale)
+
+        LOG.info('UFM partition reconcile computed in %(elapsed).3fs: '
+                 '%(add)d guids to add to %(add_pkeys)d pkeys, %(remove)d '
+                 'guids to remove from %(remove_pkeys)d pkeys%(dry_run)s.',
+                 {'elapsed': time.time() - started,
+                  'add': sum(len(g) for g in to_add.values()),
+                  'add_pkeys': len(to_add),
+                  'remove': sum(len(g) for g in to_remove.values()),
+                  'remove_pkeys': len(to_remove),
+                  'dry_run': ' (dry run)' if self.dry_run else ''})
+        if not self.dry_run:
+            self._apply(to_add, to_remove)
+        return to_add, to_remove
+
+    @staticmethod
+    def diff(desired, actual, managed_pkeys, managed_guids):
+        """Compute the minimal membership change from actual to desired.
+
+        :param desired: pkey -> GuidSet of guids which should be members
+        :param actual: pkey -> GuidSet of guids which are members in UFM
+        :param managed_pkeys: pkeys which may be changed
+        :param managed_guids: GuidSet of guids which may be removed from a
+            pkey
+        :return: a tuple of pkey -> GuidSet to add and pkey -> GuidSet to
+            remove
+        """
+        to_add = {}
+        for pkey, guids in desired.items():
+            missing = guids - actual.get(pkey, _NO_GUIDS)
+            if missing:
+                to_add[pkey] = missing
+
+        to_remove = {}
+        for pkey, guids in actual.items():
+            if pkey not in managed_pkeys:
+                continue
+            stale = (guids & managed_guids) - desired.get(pkey, _NO_GUIDS)
+            if stale:
+                to_remove[pkey] = stale
+        return to_add, to_remove
+
+    def _confirm_stale(self, stale):
+        """Return guids which were already stale in the previous run.
+
+        :param stale: pkey -> GuidSet of guids found stale by this run
+        :return: pkey -> GuidSet of guids to remove
+        """
+        previous, self._stale = self._stale, stale
+        confirmed = {}
+        for pkey, guids in stale.items():
+            guids = guids & previous.get(pkey, _NO_GUIDS)
+            if guids:
+                confirmed[pkey] = guids
+        return confirmed
+
+    def _load_bindings(self):
+        """Load port bindings of this driver from Neutron database.
+
+        :return: a tuple of (node uuid, segmentation id) list, the set
+            of segmentation ids this driver may bind and the set of nodes
+            which have a port waiting for this driver to provision it
+        """
+        context = n_context.get_admin_context()
+        segment = segment_models.NetworkSegment
+        level = ml2_models.PortBindingLevel
+        binding = ml2_models.PortBinding
+        port = models_v2.Port
+        block = pb_models.ProvisioningBlock
+        with db_api.CONTEXT_READER.using(context):
+            bound = (context.session.query(level.host,
+                                           segment.segmentation_id,
+                                           segment.physical_network)
+                     .join(segment, level.segment_id == segment.id)
+                     .filter(level.driver == const.DRIVE_NAME)
+                     .all())
+            segments = (context.session.query(segment.segmentation_id,
+                                              segment.physical_network)
+                        .filter(segment.network_type.in_(
+                            list(self.allowed_network_types)))
+                        .filter(segment.segmentation_id.isnot(None))
+                        .all())
+            provisioning = (context.session.query(binding.host)
+                            .join(port, binding.port_id == port.id)
+                            .join(block, block.standard_attr_id ==
+                                  port.standard_attr_id)
+                            .filter(block.entity ==
+                                    const.MLNX_IB_BAREMETAL_ENTITY)
+                            .all())
+
+        physnets = self.allowed_physical_networks
+        match_any = const.PHYSICAL_NETWORK_ANY in physnets
+        in_fabric = self.physical_network_filter or (lambda physnet: True)
+        managed_pkeys = set(
+            segmentation_id for segmentation_id, physnet in segments
+            if (match_any or physnet in physnets) and in_fabric(physnet))
+        return ([(host, segmentation_id)
+                 for host, segmentation_id, physnet in bound
+                 if host and in_fabric(physnet)], managed_pkeys,
+                set(host for host, in provisioning if host))
+
+    def _load_actual(self):
+        """Load partition membership from UFM with one pkey listing.
+
+        The listing is streamed, guids are collected as integers so the
+        whole document is never held in memory.
+
+        :return: pkey -> GuidSet of member guids
+        """
+        members = {}
+        for pkey, guid, _membership in self.ufm_client.pkey.iter_guids():
+            try:
+                guid = ib_guid.parse(guid)
+            except (ValueError, TypeError):
+                continue
+            guids = members.get(pkey)
+            if guids is None:
+                guids = members[pkey] = array.array('Q')
+            guids.append(guid)
+        return dict((_pkey(pkey), ib_guid.GuidSet.from_ints(guids))
+                    for pkey, guids in members.items())
+
+    def _apply(self, to_add, to_remove):
+        # NOTE: all changes are submitted first, the background client
+        #  bounds how many of them are sent to UFM at the same time.
+        pkey_client = self.async_ufm_client.pkey
+        adds = [(pkey, guids, pkey_client.add_guids(hex(pkey),
+                                                    guids.formatted()))
+                for pkey, guids in to_add.items()]
+        removes = [(pkey, guids, pkey_client.remove_guids(hex(pkey),
+                                                          guids.formatted()))
+                   for pkey, guids in to_remove.items()]
+
+        for pkey, guids, future in adds:
+            try:
+                future.result()
+            except ufm_exec.PartialFailureError as e:
+                LOG.warning('Failed to add guids %(guids)s to UFM partition '
+                            'key %(pkey)s when reconciling, reason is '
+                            '%(reason)s.',
+                            {'guids': logutils.truncated(e.result.failed),
+                             'pkey': hex(pkey), 'reason': e})
+            except Exception:
+                LOG.exception('Failed to add guids %(guids)s to UFM '
+                              'partition key %(pkey)s when reconciling.',
+                              {'guids': logutils.truncated(
+                                  guids.formatted()),
+                               'pkey': hex(pkey)})
+
+        for pkey, guids, future in removes:
+            try:
+                future.result()
+            except ufm_exec.PartialFailureError as e:
+                LOG.warning('Failed to remove guids %(guids)s from UFM '
+                            'partition key %(pkey)s when reconciling, reason '
+                            'is %(reason)s.',
+                            {'guids': logutils.truncated(e.result.failed),
+                             'pkey': hex(pkey), 'reason': e})
+            except Exception:
+                LOG.exception('Failed to remove guids %(guids)s from UFM '
+                              'partition key %(pkey)s when reconciling.',
+                              {'guids': logutils.truncated(
+                                  guids.formatted()),
+                               'pkey': hex(pkey)})
+
+
+class PKeyReconcileWorker(worker.BaseWorker):
+    """Neutron worker process which reconciles UFM partitions periodically.
+
+    It runs in its own process, so the reconcile is done once per
+    neutron-server instead of once per API worker.
+    """
+
+    def __init__(self, reconciler_factory, interval):
+        """Initial a PKey reconcile worker
+
+        :param reconciler_factory: callable returns a
+            :class:`PKeyReconciler`, called in the worker process
+        :param interval: seconds between two reconciles
+        """
+        super(PKeyReconcileWorker, self).__init__()
+        self._reconciler_factory = reconciler_factory
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        super(PKeyReconcileWorker, self).start()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='ufm-pkey-reconciler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def reset(self):
+        pass
+
+    def _run(self):
+        reconciler = self._reconciler_factory()
+        while not self._stopped.wait(self._interval):
+            try:
+                reconciler.reconcile()
+            except Exception:
+                LOG.exception('Failed to reconcile UFM partitions.')
@@ -0,0 +1,81 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import os
+import threading
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class ClientRegistry(object):
+    """Per-process registry of shared clients and sessions.
+
+    Every client is created once per process, under a lock, so concurrent
+    first users (green or real threads) share one client and one
+    connection pool. neutron-server forks its API and RPC workers after
+    the driver has been loaded: a worker never uses clients inherited from
+    its parent, whose pooled sockets are shared with the parent, it creates
+    its own ones on first use instead.
+    """
+
+    def __init__(self):
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+        self._clients = {}
+
+    def get(self, key, factory):
+        """Return the client registered with a key, create it if needed.
+
+        :param key: the hashable key of client
+        :param factory: callable which creates the client, it is called
+            with the registry lock held and may get other clients.
+        :return: the client
+        """
+        self._check_fork()
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = factory()
+                    self._clients[key] = client
+        return client
+
+    def reset(self, key=None):
+        """Drop a registered client, or all of them if key is not set.
+
+        :param key: the key of client
+        """
+        with self._lock:
+            if key is None:
+                self._clients.clear()
+            else:
+                self._clients.pop(key, None)
+
+    def _check_fork(self):
+        pid = os.getpid()
+        if pid != self._pid:
+            # NOTE: the lock may have been held by a thread of the parent
+            #  which does not exist in this process, replace it as well.
+            LOG.debug('Process forked from %(parent)s, drop %(count)d '
+                      'inherited clients.',
+                      {'parent': self._pid, 'count': len(self._clients)})
+            self._lock = threading.RLock()
+            self._clients = {}
+            self._pid = pid
+
+
+REGISTRY = ClientRegistry()
+"""clients shared by everything in the process"""
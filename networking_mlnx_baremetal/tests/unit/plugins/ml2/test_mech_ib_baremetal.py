@@ -0,0 +1,613 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import threading
+
+import fixtures
+import futurist
+from neutron_lib.api.definitions import portbindings
+from neutron_lib.plugins.ml2 import api
+from oslo_config import cfg
+from oslo_config import fixture as config_fixture
+
+from networking_mlnx_baremetal import constants
+from networking_mlnx_baremetal import guid_cache
+from networking_mlnx_baremetal import lazy
+from networking_mlnx_baremetal.plugins.ml2 import mech_ib_baremetal
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import exceptions
+from networking_mlnx_baremetal.ufmclient import logutils
+
+GUIDS = ['%016x' % (0x0002c90300000000 + i) for i in range(4)]
+PORT_ID = 'port-1'
+PHYSNET = 'ib'
+
+
+class FakePKeyQueue(object):
+    """PKey membership queue which records the queued changes"""
+
+    def __init__(self):
+        self.changes = []
+        self.futures = []
+        # NOTE: changes are applied as soon as they are queued.
+        self.resolved = False
+        # NOTE: changes fail with this error as soon as they are queued.
+        self.error = None
+
+    def add_guids(self, pkey, guids):
+        return self._queue('add', pkey, guids)
+
+    def remove_guids(self, pkey, guids):
+        return self._queue('remove', pkey, guids)
+
+    def _queue(self, op, pkey, guids):
+        self.changes.append((op, pkey, list(guids)))
+        future = futurist.Future()
+        if self.error is not None:
+            future.set_exception(self.error)
+        elif self.resolved:
+            future.set_result(None)
+        self.futures.append(future)
+        return future
+
+
+class FakePortContext(object):
+    """Port context of a baremetal port with a single vlan segment"""
+
+    def __init__(self, segmentation_id=0x10):
+        self.current = {'id': PORT_ID,
+                        portbindings.VNIC_TYPE: portbindings.VNIC_BAREMETAL,
+                        portbindings.HOST_ID: 'node-1'}
+        self.segments_to_bind = [{api.ID: 'segment-1',
+                                  api.NETWORK_ID: 'network-1',
+                                  api.NETWORK_TYPE: 'vlan',
+                                  api.PHYSICAL_NETWORK: PHYSNET,
+                                  api.SEGMENTATION_ID: segmentation_id}]
+        self._plugin_context = None
+        self.binding = None
+        self.continued = None
+
+    def set_binding(self, segment_id, vif_type, vif_details, status=None):
+        self.binding = (segment_id, vif_type, vif_details, status)
+
+    def continue_binding(self, segment_id, next_segments_to_bind):
+        self.continued = (segment_id, next_segments_to_bind)
+
+
+class FakeIronicPort(object):
+
+    def __init__(self, node_uuid, client_id=None):
+        self.node_uuid = node_uuid
+        self.extra = {'client-id': client_id} if client_id else {}
+
+
+class FakeIronicPortManager(object):
+
+    def __init__(self, ports):
+        self.ports = ports
+        self.calls = []
+
+    def list(self, node=None, fields=None, limit=None):
+        self.calls.append(node)
+        return [port for port in self.ports
+                if node is None or port.node_uuid == node]
+
+
+class FakeIronicClient(object):
+
+    def __init__(self, ports):
+        self.port = FakeIronicPortManager(ports)
+
+
+class FakeNetworkContext(object):
+
+    def __init__(self, segmentation_ids):
+        self.network_segments = [{api.ID: 'segment-%d' % index,
+                                  api.NETWORK_ID: 'network-1',
+                                  api.NETWORK_TYPE: 'vlan',
+                                  api.PHYSICAL_NETWORK: PHYSNET,
+                                  api.SEGMENTATION_ID: segmentation_id}
+                                 for index, segmentation_id
+                                 in enumerate(segmentation_ids)]
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, content=b''):
+        self.status_code = status_code
+        self.content = content
+
+
+class FakeAsyncPKeyClient(object):
+    """Async pkey client which resolves deletions once all are requested"""
+
+    def __init__(self, expected, errors=None):
+        self.expected = expected
+        self.errors = errors or {}
+        self.deleted = []
+        self.futures = []
+
+    def delete(self, pkey):
+        self.deleted.append(pkey)
+        self.futures.append((pkey, futurist.Future()))
+        if len(self.deleted) == self.expected:
+            for deleted, future in self.futures:
+                error = self.errors.get(deleted)
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(None)
+        return self.futures[-1][1]
+
+
+class FakeAsyncClient(object):
+
+    def __init__(self, pkey):
+        self.pkey = pkey
+
+
+class FakeExecutor(object):
+    """Executor which runs submitted calls when asked to"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for fn, args in calls:
+            fn(*args)
+
+
+class DriverTestCase(base.TestCase):
+
+    def setUp(self):
+        super(DriverTestCase, self).setUp()
+        self.config = self.useFixture(config_fixture.Config(cfg.CONF))
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           endpoint='https://ufm.example.com')
+        self.addCleanup(logutils.set_max_length,
+                        logutils.DEFAULT_MAX_LENGTH)
+        self.driver = mech_ib_baremetal.InfiniBandBaremetalMechanismDriver()
+        self.driver.initialize()
+        self.queue = FakePKeyQueue()
+        self.driver._get_pkey_queue = lambda physical_network: self.queue
+        self.completed = []
+        self.blocks = []
+        self.useFixture(fixtures.MonkeyPatch(
+            'networking_mlnx_baremetal.plugins.ml2.mech_ib_baremetal.'
+            'InfiniBandBaremetalMechanismDriver._complete_provisioning',
+            staticmethod(lambda context, bind: self.completed.append(
+                (bind.port_id, bind.pkey)))))
+        self.useFixture(fixtures.MonkeyPatch(
+            'neutron_lib.context.get_admin_context', lambda: None))
+        self.useFixture(fixtures.MonkeyPatch(
+            'neutron.db.provisioning_blocks.add_provisioning_component',
+            lambda context, object_id, object_type, entity: (
+                self.blocks.append(object_id))))
+
+
+class TestInitialize(DriverTestCase):
+
+    def test_clients_not_created(self):
+        self.assertFalse(lazy.is_loaded(self.driver.ironic_client))
+        self.assertIsNone(self.driver.ironic_breaker)
+
+
+class TestUpdatePort(DriverTestCase):
+
+    def setUp(self):
+        super(TestUpdatePort, self).setUp()
+        self.levels = []
+        self.driver._get_binding_level = lambda context: (
+            self.levels.append(context.current['id']))
+
+    def _context(self, vif_type, original_vif_type, **changes):
+        context = FakePortContext()
+        context.original = dict(context.current)
+        context.current.update(changes)
+        context.vif_type = vif_type
+        context.original_vif_type = original_vif_type
+        return context
+
+    def test_non_baremetal_port_skipped(self):
+        context = self._context(
+            portbindings.VIF_TYPE_UNBOUND, 'other',
+            **{portbindings.VNIC_TYPE: portbindings.VNIC_NORMAL})
+        self.driver.update_port_postcommit(context)
+        self.assertEqual([], self.levels)
+
+    def test_status_update_skipped_early(self):
+        context = self._context('other', 'other', status='ACTIVE')
+        self.driver.update_port_postcommit(context)
+        self.assertEqual([], self.levels)
+
+    def test_bound_without_background_binding_skipped(self):
+        context = self._context('other', portbindings.VIF_TYPE_UNBOUND)
+        self.driver.update_port_postcommit(context)
+        self.assertEqual([], self.levels)
+
+    def test_unbound_checked(self):
+        context = self._context(portbindings.VIF_TYPE_UNBOUND, 'other')
+        self.driver.update_port_postcommit(context)
+        self.assertEqual([PORT_ID], self.levels)
+
+
+class TestSegmentSupport(DriverTestCase):
+
+    def _segment(self, network_type='vlan', physical_network=PHYSNET,
+                 segmentation_id=0x10):
+        return {api.ID: 'segment-1', api.NETWORK_ID: 'network-1',
+                api.NETWORK_TYPE: network_type,
+                api.PHYSICAL_NETWORK: physical_network,
+                api.SEGMENTATION_ID: segmentation_id}
+
+    def _configure(self, physical_networks):
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           physical_networks=physical_networks)
+        self.driver.initialize()
+
+    def test_supported(self):
+        for network_type in ('vlan', 'vxlan'):
+            self.assertTrue(self.driver._is_segment_supported(
+                self._segment(network_type)))
+        self.assertTrue(self.driver._is_segment_supported(
+            self._segment(physical_network=None)))
+
+    def test_unsupported(self):
+        self.assertFalse(self.driver._is_segment_supported(
+            self._segment('flat')))
+        self.assertFalse(self.driver._is_segment_supported(
+            self._segment(segmentation_id=None)))
+
+    def test_physical_networks(self):
+        self._configure(['ib', 'ib2'])
+        self.assertTrue(self.driver._is_segment_supported(self._segment()))
+        self.assertTrue(self.driver._is_segment_supported(
+            self._segment(physical_network='ib2')))
+        self.assertFalse(self.driver._is_segment_supported(
+            self._segment(physical_network='eth')))
+        self.assertFalse(self.driver._is_segment_supported(
+            self._segment(physical_network=None)))
+
+    def test_checked_once(self):
+        checked = []
+        check = self.driver._check_segment
+        self.driver._check_segment = lambda segment: (
+            checked.append(segment[api.SEGMENTATION_ID]) or check(segment))
+        for segmentation_id in (0x10, 0x20, 0x30):
+            self.assertTrue(self.driver._is_segment_supported(
+                self._segment(segmentation_id=segmentation_id)))
+        self.assertFalse(self.driver._is_segment_supported(
+            self._segment(segmentation_id=None)))
+        self.assertFalse(self.driver._is_segment_supported(
+            self._segment(segmentation_id=0)))
+        # NOTE: the result only depends on the network type, physical
+        #  network and whether there is a segmentation id.
+        self.assertEqual([0x10, None], checked)
+
+
+class TestFabrics(DriverTestCase):
+
+    def setUp(self):
+        super(TestFabrics, self).setUp()
+        del self.driver._get_pkey_queue
+
+    def test_pkey_queue_per_fabric(self):
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           fabric_endpoints={'ib1': 'https://ufm1',
+                                             'ib2': 'https://ufm1',
+                                             'ib3': 'https://ufm3'})
+        self.driver.initialize()
+        queues = [self.driver._get_pkey_queue(physical_network)
+                  for physical_network in ('ib1', 'ib2', 'ib3', None)]
+        self.assertIs(queues[0], queues[1])
+        self.assertEqual(3, len(set(id(queue) for queue in queues)))
+
+    def test_reconcile_worker_per_fabric(self):
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           fabric_endpoints={'ib1': 'https://ufm1',
+                                             'ib3': 'https://ufm3'},
+                           reconcile_interval=60)
+        self.driver.initialize()
+        self.assertEqual(3, len(self.driver.get_workers()))
+
+
+class TestDeleteNetwork(DriverTestCase):
+
+    def _delete(self, segmentation_ids, expected, errors=None):
+        client = FakeAsyncPKeyClient(expected, errors)
+        self.useFixture(fixtures.MonkeyPatch(
+            'networking_mlnx_baremetal.ufm_client.get_async_client',
+            lambda physical_network=None: FakeAsyncClient(client)))
+        self.driver.delete_network_postcommit(
+            FakeNetworkContext(segmentation_ids))
+        return client
+
+    def test_pkeys_deleted_concurrently(self):
+        # NOTE: a deletion is only resolved once all of them are sent.
+        client = self._delete([0x10, 0x20, None, 0x30], 3)
+        self.assertEqual(['0x10', '0x20', '0x30'], client.deleted)
+        for _pkey, future in client.futures:
+            self.assertTrue(future.done())
+
+    def test_missing_pkey_ignored(self):
+        not_found = exceptions.ResourceNotFoundError(
+            'DELETE', '/resources/pkeys/0x20', FakeResponse(404))
+        client = self._delete([0x10, 0x20], 2, {'0x20': not_found})
+        self.assertEqual(['0x10', '0x20'], client.deleted)
+
+    def test_error_raised(self):
+        error = exceptions.UfmConnectionError(url='https://ufm',
+                                              error='refused')
+        self.assertRaises(exceptions.UfmConnectionError, self._delete,
+                          [0x10, 0x20], 2, {'0x20': error})
+
+    def test_deferred(self):
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           deferred_pkey_delete=True)
+        self.driver.initialize()
+        error = exceptions.UfmConnectionError(url='https://ufm',
+                                              error='refused')
+        # NOTE: deletions are not waited for, failures are only logged.
+        client = self._delete([0x10, 0x20], 2, {'0x10': error})
+        self.assertEqual(['0x10', '0x20'], client.deleted)
+
+
+class TestIronicGuids(DriverTestCase):
+
+    def setUp(self):
+        super(TestIronicGuids, self).setUp()
+        self.ironic = FakeIronicClient(
+            [FakeIronicPort('node-1', guid) for guid in GUIDS[:2]] +
+            [FakeIronicPort('node-1'), FakeIronicPort('node-2')])
+        self.driver.ironic_client = lazy.LazyProxy(lambda: self.ironic)
+
+    def _port(self, mac_address):
+        return {'id': PORT_ID, 'mac_address': mac_address,
+                portbindings.HOST_ID: 'node-1'}
+
+    def test_guids_cached_per_node(self):
+        self.assertEqual(GUIDS[:2], self.driver._get_ironic_ib_guids('node-1'))
+        self.assertEqual(GUIDS[:2], self.driver._get_ironic_ib_guids('node-1'))
+        self.assertEqual(['node-1'], self.ironic.port.calls)
+
+    def test_port_change_invalidates_node(self):
+        self.driver._get_ironic_ib_guids('node-1')
+        self.driver._invalidate_guid_cache(self._port('mac-1'),
+                                           self._port('mac-1'))
+        self.driver._get_ironic_ib_guids('node-1')
+        self.assertEqual(['node-1'], self.ironic.port.calls)
+        self.driver._invalidate_guid_cache(self._port('mac-2'),
+                                           self._port('mac-1'))
+        self.driver._get_ironic_ib_guids('node-1')
+        self.assertEqual(['node-1', 'node-1'], self.ironic.port.calls)
+
+    def test_fleet_index_used_first(self):
+        self.driver.guid_index = guid_cache.FleetGuidIndex(self.ironic)
+        self.addCleanup(self.driver.guid_index.stop)
+        self.driver.guid_index.start()
+        for _attempt in range(500):
+            if self.driver.guid_index.loaded:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual([None], self.ironic.port.calls)
+        self.assertEqual(GUIDS[:2], self.driver._get_ironic_ib_guids('node-1'))
+        # NOTE: nodes missing from the index are listed one by one.
+        self.assertEqual([], self.driver._get_ironic_ib_guids('node-2'))
+        self.assertEqual([None, 'node-2'], self.ironic.port.calls)
+
+    def test_node_without_ib_ports_remembered(self):
+        self.assertEqual([], self.driver._get_ironic_ib_guids('node-2'))
+        self.assertEqual([], self.driver._get_ironic_ib_guids('node-2'))
+        self.assertEqual(['node-2'], self.ironic.port.calls)
+        self.assertIn('node-2', self.driver.no_ib_nodes)
+
+    def test_bind_port_skips_node_without_ib_ports(self):
+        self.driver.no_ib_nodes.add('node-1')
+        context = FakePortContext()
+        self.driver.bind_port(context)
+        self.assertEqual([], self.ironic.port.calls)
+        self.assertIsNone(context.binding)
+        self.assertIsNone(context.continued)
+
+    def test_cache_disabled(self):
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           guid_cache_size=0)
+        self.driver.initialize()
+        self.driver.ironic_client = lazy.LazyProxy(lambda: self.ironic)
+        self.driver._get_ironic_ib_guids('node-1')
+        self.driver._get_ironic_ib_guids('node-1')
+        self.assertEqual(['node-1', 'node-1'], self.ironic.port.calls)
+
+
+class TestBindPort(DriverTestCase):
+
+    def setUp(self):
+        super(TestBindPort, self).setUp()
+        self.driver._get_ironic_ib_guids = lambda node: list(GUIDS)
+
+    def test_bind(self):
+        context = FakePortContext()
+        self.queue.resolved = True
+        self.driver.bind_port(context)
+        self.assertEqual([('add', '0x10', GUIDS)], self.queue.changes)
+        self.assertEqual('segment-1', context.continued[0])
+        self.assertIsNone(context.binding)
+
+    def test_failure_keeps_all_guids_in_vif_details(self):
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           log_max_length=16)
+        self.driver.initialize()
+        self.driver._get_pkey_queue = lambda physical_network: self.queue
+        guids = ['%016x' % (0x0002c90300000000 + i) for i in range(64)]
+        self.driver._get_ironic_ib_guids = lambda node: guids
+        self.queue.error = exceptions.UfmConnectionError(url='https://ufm',
+                                                         error='refused')
+        context = FakePortContext()
+        self.driver.bind_port(context)
+        segment_id, vif_type, vif_details, status = context.binding
+        self.assertEqual(portbindings.VIF_TYPE_BINDING_FAILED, vif_type)
+        self.assertEqual(guids, vif_details['guids'])
+        self.assertEqual('0x10', vif_details['pkey'])
+
+    def test_deadline_exceeded_before_ufm(self):
+        now = [1000.0]
+
+        class FakeClock(object):
+            @staticmethod
+            def time():
+                return now[0]
+
+        self.useFixture(fixtures.MonkeyPatch(
+            'networking_mlnx_baremetal.plugins.ml2.mech_ib_baremetal.time',
+            FakeClock))
+
+        def slow_ironic(node):
+            now[0] += 2
+            return list(GUIDS)
+
+        self.driver.bind_port_timeout = 1
+        self.driver._get_ironic_ib_guids = slow_ironic
+        context = FakePortContext()
+        self.driver.bind_port(context)
+        self.assertEqual([], self.queue.changes)
+        self.assertEqual([], self.blocks)
+        self.assertEqual(portbindings.VIF_TYPE_BINDING_FAILED,
+                         context.binding[1])
+
+    def test_deadline_exceeded_removes_queued_guids(self):
+        self.driver.bind_port_timeout = 0.01
+        context = FakePortContext()
+        self.driver.bind_port(context)
+        self.assertEqual([('add', '0x10', GUIDS), ('remove', '0x10', GUIDS)],
+                         self.queue.changes)
+        self.assertIsNone(context.continued)
+        segment_id, vif_type, vif_details, status = context.binding
+        self.assertEqual(portbindings.VIF_TYPE_BINDING_FAILED, vif_type)
+        self.assertEqual('ERROR', status)
+
+
+class TestAsyncBind(DriverTestCase):
+
+    def setUp(self):
+        super(TestAsyncBind, self).setUp()
+        self.executor = FakeExecutor()
+        self.driver.binding_executor = self.executor
+
+    def _bind(self, pkey='0x10'):
+        bind = mech_ib_baremetal._AsyncBind(PORT_ID, pkey, GUIDS, PHYSNET)
+        self.driver._submit_async_bind(bind)
+        return bind
+
+    def test_completed_after_applied_and_committed(self):
+        self._bind()
+        self.queue.futures[0].set_result(None)
+        self.executor.run()
+        self.assertEqual([], self.completed)
+        self.driver._async_bind_committed(None, PORT_ID, '0x10', PHYSNET)
+        self.assertEqual([(PORT_ID, '0x10')], self.completed)
+        self.assertEqual({}, self.driver._async_binds)
+
+    def test_completed_after_committed_and_applied(self):
+        self._bind()
+        self.driver._async_bind_committed(None, PORT_ID, '0x10', PHYSNET)
+        self.assertEqual([], self.completed)
+        self.queue.futures[0].set_result(None)
+        self.executor.run()
+        self.assertEqual([(PORT_ID, '0x10')], self.completed)
+        self.assertEqual({}, self.driver._async_binds)
+
+    def test_rebind_discards_previous_binding(self):
+        self._bind('0x10')
+        self._bind('0x20')
+        self.assertEqual([('add', '0x10', GUIDS), ('remove', '0x10', GUIDS),
+                          ('add', '0x20', GUIDS)], self.queue.changes)
+
+    def test_rebind_same_target_is_not_queued_again(self):
+        self._bind('0x10')
+        self._bind('0x10')
+        self.assertEqual([('add', '0x10', GUIDS)], self.queue.changes)
+
+    def test_committed_other_pkey_replaces_stale_binding(self):
+        self._bind('0x10')
+        self.queue.futures[0].set_result(None)
+        self.executor.run()
+        self.driver._async_bind_committed(None, PORT_ID, '0x20', PHYSNET)
+        self.assertEqual([('add', '0x10', GUIDS), ('remove', '0x10', GUIDS),
+                          ('add', '0x20', GUIDS)], self.queue.changes)
+        self.assertEqual([], self.completed)
+
+        self.queue.futures[2].set_result(None)
+        self.executor.run()
+        self.assertEqual([(PORT_ID, '0x20')], self.completed)
+        self.assertEqual({}, self.driver._async_binds)
+
+    def test_committed_other_pkey_while_stale_binding_pending(self):
+        self._bind('0x10')
+        self.driver._async_bind_committed(None, PORT_ID, '0x20', PHYSNET)
+        # NOTE: the stale binding finishes after it was replaced.
+        self.queue.futures[0].set_result(None)
+        self.queue.futures[2].set_result(None)
+        self.executor.run()
+        self.assertEqual([(PORT_ID, '0x20')], self.completed)
+        self.assertEqual({}, self.driver._async_binds)
+
+    def test_failed_binding_sets_port_error(self):
+        statuses = []
+
+        class FakePlugin(object):
+            def update_port_status(self, context, port_id, status):
+                statuses.append((port_id, status))
+
+        self.useFixture(fixtures.MonkeyPatch(
+            'neutron_lib.plugins.directory.get_plugin',
+            lambda: FakePlugin()))
+        self._bind()
+        self.driver._async_bind_committed(None, PORT_ID, '0x10', PHYSNET)
+        self.queue.futures[0].set_exception(
+            exceptions.UfmConnectionError(url='https://ufm', error='refused'))
+        self.executor.run()
+        self.assertEqual([(PORT_ID, 'ERROR')], statuses)
+        self.assertEqual([], self.completed)
+        self.assertEqual({}, self.driver._async_binds)
+
+    def test_bind_port_in_background(self):
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           async_binding=True)
+        self.driver.initialize()
+        self.addCleanup(self.driver.binding_executor.shutdown)
+        self.driver.binding_executor = self.executor
+        self.driver._get_pkey_queue = lambda physical_network: self.queue
+        self.driver._get_ironic_ib_guids = lambda node: list(GUIDS)
+        context = FakePortContext()
+        self.driver.bind_port(context)
+        # NOTE: bind_port returns before UFM applies the change.
+        self.assertEqual('segment-1', context.continued[0])
+        self.assertEqual([PORT_ID], self.blocks)
+        self.assertEqual([('add', '0x10', GUIDS)], self.queue.changes)
+        self.assertIn(PORT_ID, self.driver._async_binds)
+        self.assertEqual(1, len(self.executor.calls))
+
+    def test_delete_port_discards_pending_binding(self):
+        self._bind()
+        context = FakePortContext()
+        self.driver.delete_port_postcommit(context)
+        self.assertEqual([('add', '0x10', GUIDS), ('remove', '0x10', GUIDS)],
+                         self.queue.changes)
+        self.queue.futures[0].set_result(None)
+        self.executor.run()
+        self.assertEqual([], self.completed)
+        self.assertEqual({}, self.driver._async_binds)
@@ -0,0 +1,227 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import os
+import threading
+
+import fixtures
+
+from networking_mlnx_baremetal import guid_cache
+from networking_mlnx_baremetal.tests import base
+
+NODE = '0f7f3ed6-3c4a-4c39-8a8a-41d4d9c4e1b6'
+GUIDS = ['%016x' % (0x0002c90300000000 + i) for i in range(2)]
+
+
+def _client_id(guid):
+    octets = [guid[i:i + 2] for i in range(0, len(guid), 2)]
+    return ':'.join(['ff', '00', '00', '00', '00', '00', '02', '00', '00',
+                     '02', 'c9', '00'] + octets)
+
+
+class FakeIronicPort(object):
+
+    def __init__(self, node_uuid, client_id=None):
+        self.node_uuid = node_uuid
+        self.extra = {'client-id': client_id} if client_id else {}
+
+
+class FakeIronicPortManager(object):
+
+    def __init__(self, ports):
+        self.ports = ports
+        self.calls = 0
+        self.error = None
+        self.listed = threading.Event()
+
+    def list(self, limit=None, fields=None):
+        self.calls += 1
+        self.listed.set()
+        if self.error is not None:
+            raise self.error
+        return self.ports
+
+
+class FakeIronicClient(object):
+
+    def __init__(self, ports):
+        self.port = FakeIronicPortManager(ports)
+
+
+class FakeLoader(object):
+    """Guid loader which counts its calls"""
+
+    def __init__(self, guids):
+        self.guids = guids
+        self.calls = []
+
+    def __call__(self, node):
+        self.calls.append(node)
+        return list(self.guids)
+
+
+class TestNodeGuidCache(base.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = guid_cache.NodeGuidCache(16, 60)
+        loader = FakeLoader(GUIDS)
+        self.assertEqual(GUIDS, cache.get(NODE, loader))
+        self.assertEqual(GUIDS, cache.get(NODE, loader))
+        self.assertEqual([NODE], loader.calls)
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 16},
+                         cache.stats())
+
+    def test_returns_copies(self):
+        cache = guid_cache.NodeGuidCache(16, 60)
+        cache.get(NODE, FakeLoader(GUIDS)).append('bogus')
+        cache.get(NODE, FakeLoader(GUIDS)).append('bogus')
+        self.assertEqual(GUIDS, cache.get(NODE, FakeLoader([])))
+
+    def test_invalidate(self):
+        cache = guid_cache.NodeGuidCache(16, 60)
+        loader = FakeLoader(GUIDS)
+        cache.get(NODE, loader)
+        cache.invalidate(NODE)
+        cache.get(NODE, loader)
+        cache.clear()
+        cache.get(NODE, loader)
+        self.assertEqual([NODE] * 3, loader.calls)
+
+    def test_bounded(self):
+        cache = guid_cache.NodeGuidCache(2, 60)
+        loader = FakeLoader(GUIDS)
+        for node in ('a', 'b', 'c'):
+            cache.get(node, loader)
+        self.assertEqual(2, cache.stats()['size'])
+        cache.get('c', loader)
+        self.assertEqual(['a', 'b', 'c'], loader.calls)
+
+    def test_loader_error_not_cached(self):
+        cache = guid_cache.NodeGuidCache(16, 60)
+
+        def fail(node):
+            raise RuntimeError('ironic is down')
+
+        self.assertRaises(RuntimeError, cache.get, NODE, fail)
+        self.assertEqual(GUIDS, cache.get(NODE, FakeLoader(GUIDS)))
+
+    def test_disabled(self):
+        for size, ttl in ((0, 60), (16, 0)):
+            cache = guid_cache.NodeGuidCache(size, ttl)
+            loader = FakeLoader(GUIDS)
+            cache.get(NODE, loader)
+            cache.get(NODE, loader)
+            self.assertEqual([NODE, NODE], loader.calls)
+            self.assertEqual(0, cache.stats()['maxsize'])
+
+
+class TestFleetGuidIndex(base.TestCase):
+
+    def setUp(self):
+        super(TestFleetGuidIndex, self).setUp()
+        self.ironic = FakeIronicClient([
+            FakeIronicPort(NODE, _client_id(GUIDS[0])),
+            FakeIronicPort(NODE, GUIDS[1]),
+            FakeIronicPort('other', 'not a client-id'),
+            FakeIronicPort('ethernet'),
+            FakeIronicPort(None, _client_id(GUIDS[0]))])
+        self.index = guid_cache.FleetGuidIndex(self.ironic)
+        self.addCleanup(self.index.stop)
+
+    def _wait_loaded(self):
+        for _attempt in range(500):
+            if self.index.loaded:
+                return
+            threading.Event().wait(0.01)
+        self.fail('index was not loaded')
+
+    def test_refresh(self):
+        self.assertFalse(self.index.loaded)
+        self.index.refresh()
+        self.assertTrue(self.index.loaded)
+        self.assertEqual(
+            {NODE: GUIDS, 'other': ['not a client-id']},
+            dict(self.index.items()))
+
+    def test_invalidate(self):
+        self.index.refresh()
+        self.index.invalidate(NODE)
+        self.assertEqual(['other'], [node for node, _guids
+                                     in self.index.items()])
+
+    def test_loaded_on_first_lookup(self):
+        # NOTE: the index is loaded in background, the first lookup
+        #  falls back to the per-node listing.
+        self.index.get(NODE)
+        self._wait_loaded()
+        self.assertEqual(GUIDS, self.index.get(NODE))
+        self.assertIsNone(self.index.get('ethernet'))
+        self.assertEqual(1, self.ironic.port.calls)
+
+    def test_not_shared_with_forked_child(self):
+        self.index.start()
+        self._wait_loaded()
+        child_pid = os.getpid() + 1
+        self.useFixture(fixtures.MonkeyPatch(
+            'networking_mlnx_baremetal.guid_cache.os.getpid',
+            lambda: child_pid))
+        self.assertFalse(self.index.loaded)
+        self.assertEqual([], list(self.index.items()))
+        # NOTE: the child starts its own thread which loads the index.
+        self.index.get(NODE)
+        self._wait_loaded()
+        self.assertEqual(GUIDS, self.index.get(NODE))
+        self.assertEqual(2, self.ironic.port.calls)
+
+    def test_failed_load_retried(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            'networking_mlnx_baremetal.guid_cache._RETRY_INTERVAL', 0.01))
+        self.ironic.port.error = RuntimeError('ironic is down')
+        self.index.start()
+        self.assertTrue(self.ironic.port.listed.wait(5))
+        self.ironic.port.error = None
+        self._wait_loaded()
+        self.assertEqual(GUIDS, self.index.get(NODE))
+
+
+class TestNoIbNodeCache(base.TestCase):
+
+    def test_add_and_invalidate(self):
+        nodes = guid_cache.NoIbNodeCache(16, 60)
+        self.assertNotIn(NODE, nodes)
+        nodes.add(NODE)
+        self.assertIn(NODE, nodes)
+        nodes.invalidate(NODE)
+        self.assertNotIn(NODE, nodes)
+        nodes.add(NODE)
+        nodes.clear()
+        self.assertNotIn(NODE, nodes)
+
+    def test_stats(self):
+        nodes = guid_cache.NoIbNodeCache(16, 60)
+        nodes.add(NODE)
+        self.assertIn(NODE, nodes)
+        self.assertIn(NODE, nodes)
+        self.assertEqual({'hits': 2, 'size': 1, 'maxsize': 16}, nodes.stats())
+
+    def test_empty_node_ignored(self):
+        nodes = guid_cache.NoIbNodeCache(16, 60)
+        nodes.add(None)
+        nodes.add('')
+        self.assertNotIn(None, nodes)
+        self.assertEqual(0, nodes.stats()['size'])
+
+    def test_disabled(self):
+        nodes = guid_cache.NoIbNodeCache(0, 60)
+        nodes.add(NODE)
+        self.assertNotIn(NODE, nodes)
@@ -0,0 +1,107 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import os
+import subprocess
+import sys
+import threading
+
+import fixtures
+
+from networking_mlnx_baremetal import lazy
+from networking_mlnx_baremetal.tests import base
+
+
+class Target(object):
+
+    value = 42
+
+
+class CountingFactory(object):
+
+    def __init__(self, errors=0):
+        self.calls = 0
+        self.errors = errors
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait()
+        if self.calls <= self.errors:
+            raise RuntimeError('ironic is down')
+        return Target()
+
+
+class TestLazyProxy(base.TestCase):
+
+    def test_created_on_first_use(self):
+        factory = CountingFactory()
+        proxy = lazy.LazyProxy(factory)
+        self.assertFalse(lazy.is_loaded(proxy))
+        self.assertEqual(0, factory.calls)
+        self.assertEqual(42, proxy.value)
+        self.assertTrue(lazy.is_loaded(proxy))
+        self.assertIs(lazy.resolve(proxy), lazy.resolve(proxy))
+        self.assertEqual(1, factory.calls)
+
+    def test_created_once_by_concurrent_callers(self):
+        factory = CountingFactory()
+        factory.release.clear()
+        proxy = lazy.LazyProxy(factory)
+        targets = []
+        threads = [threading.Thread(
+            target=lambda: targets.append(lazy.resolve(proxy)))
+            for _index in range(8)]
+        for thread in threads:
+            thread.start()
+        factory.started.wait(5)
+        factory.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(1, factory.calls)
+        self.assertEqual(8, len(targets))
+        self.assertEqual(1, len(set(id(target) for target in targets)))
+
+    def test_factory_error_not_kept(self):
+        factory = CountingFactory(errors=1)
+        proxy = lazy.LazyProxy(factory)
+        self.assertRaises(RuntimeError, getattr, proxy, 'value')
+        self.assertFalse(lazy.is_loaded(proxy))
+        self.assertEqual(42, proxy.value)
+        self.assertEqual(2, factory.calls)
+
+    def test_created_again_in_forked_child(self):
+        factory = CountingFactory()
+        proxy = lazy.LazyProxy(factory)
+        parent = lazy.resolve(proxy)
+        child_pid = os.getpid() + 1
+        self.useFixture(fixtures.MonkeyPatch(
+            'networking_mlnx_baremetal.lazy.os.getpid', lambda: child_pid))
+        self.assertFalse(lazy.is_loaded(proxy))
+        self.assertIsNot(parent, lazy.resolve(proxy))
+        self.assertEqual(2, factory.calls)
+
+
+class TestDriverImport(base.TestCase):
+
+    def test_ironicclient_not_imported(self):
+        code = ('import sys\n'
+                'from networking_mlnx_baremetal.plugins.ml2 import '
+                'mech_ib_baremetal\n'
+                'sys.exit("ironicclient" in sys.modules)\n')
+        with open(os.devnull, 'w') as devnull:
+            self.assertEqual(0, subprocess.call([sys.executable, '-c', code],
+                                                stderr=devnull))
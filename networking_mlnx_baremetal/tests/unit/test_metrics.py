@@ -0,0 +1,138 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import fixtures
+from oslo_config import cfg
+from oslo_config import fixture as config_fixture
+
+from networking_mlnx_baremetal import constants
+from networking_mlnx_baremetal import metrics
+from networking_mlnx_baremetal.tests import base
+
+
+class RecordingSink(metrics._AggregatingSink):
+
+    def __init__(self, interval):
+        super(RecordingSink, self).__init__('test.', interval)
+        self.flushed = threading.Event()
+        self.flushes = []
+
+    def flush(self, histograms, counters, gauges):
+        self.flushes.append((histograms, counters, gauges))
+        self.flushed.set()
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class TestAggregatingSink(base.TestCase):
+
+    def test_flush_is_abstract(self):
+        self.assertRaises(TypeError, metrics._AggregatingSink, 'test.', 60)
+
+    def test_idle_process_flushed(self):
+        sink = RecordingSink(0.01)
+        self.addCleanup(sink.stop)
+        sink.incr('binds')
+        sink.timing('bind_port', 0.02)
+        sink.gauge('queue', 3)
+        # NOTE: nothing is recorded after, the flusher still reports.
+        self.assertTrue(sink.flushed.wait(5))
+        histograms, counters, gauges = sink.flushes[-1]
+        self.assertEqual({'binds': 1}, counters)
+        self.assertEqual({'queue': 3}, gauges)
+        self.assertEqual(1, histograms['bind_port'][1])
+
+    def test_stop_flushes(self):
+        sink = RecordingSink(3600)
+        sink.incr('binds', 2)
+        sink.stop()
+        self.assertEqual({'binds': 2}, sink.flushes[-1][1])
+
+
+class TestPrometheusFileSink(base.TestCase):
+
+    def setUp(self):
+        super(TestPrometheusFileSink, self).setUp()
+        self.directory = self.useFixture(fixtures.TempDir()).path
+        self.sink = metrics.PrometheusFileSink(
+            'mlnx.', 3600, os.path.join(self.directory, 'metrics.prom'))
+
+    def _write(self, name):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write('# stale\n')
+        return path
+
+    def test_write_process_file(self):
+        self.sink.incr('bind_port.calls')
+        self.sink.stop()
+        with open(self.sink.process_path) as f:
+            content = f.read()
+        self.assertIn('mlnx_bind_port_calls_total{pid="%d"} 1'
+                      % os.getpid(), content)
+
+    def test_remove_files_of_dead_processes(self):
+        dead = self._write('metrics-%d.prom' % _dead_pid())
+        alive = self._write('metrics-%d.prom' % os.getppid())
+        other = self._write('other-1.prom')
+        self.sink.incr('bind_port.calls')
+        self.sink.stop()
+        self.assertFalse(os.path.exists(dead))
+        self.assertTrue(os.path.exists(alive))
+        self.assertTrue(os.path.exists(other))
+        self.assertTrue(os.path.exists(self.sink.process_path))
+
+
+class TestGetSink(base.TestCase):
+
+    def setUp(self):
+        super(TestGetSink, self).setUp()
+        self.config = self.useFixture(config_fixture.Config(cfg.CONF))
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           metrics_sink='log')
+        self.addCleanup(setattr, metrics, 'METRICS_SINK',
+                        metrics.METRICS_SINK)
+        metrics.METRICS_SINK = None
+
+    def test_one_sink_per_process(self):
+        sinks = []
+        created = []
+        log_sink = metrics.LogSink
+
+        def slow_sink(*args):
+            # NOTE: widen the window of creating two sinks.
+            time.sleep(0.01)
+            created.append(1)
+            return log_sink(*args)
+
+        self.useFixture(fixtures.MonkeyPatch(
+            'networking_mlnx_baremetal.metrics.LogSink', slow_sink))
+        threads = [threading.Thread(
+            target=lambda: sinks.append(metrics.get_sink()))
+            for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(created))
+        self.assertEqual(1, len(set(id(sink) for sink in sinks)))
@@ -0,0 +1,147 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import threading
+
+from networking_mlnx_baremetal import pkey_queue
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import exceptions
+from networking_mlnx_baremetal.ufmclient.modules.resources import pkey
+
+GUIDS = ['%016x' % (0x0002c90300000000 + i) for i in range(4)]
+
+
+class FakePKeyClient(object):
+    """PKey client which records the requests sent to UFM"""
+
+    def __init__(self):
+        self.requests = []
+        self.failed = set()
+        self.release = threading.Event()
+        self.release.set()
+        # NOTE: requests of these pkeys wait for release.
+        self.blocked = None
+
+    def add_guids(self, pkey_id, guids, timeout=None, **options):
+        return self._send('add', pkey_id, guids, timeout)
+
+    def remove_guids(self, pkey_id, guids, timeout=None):
+        return self._send('remove', pkey_id, guids, timeout)
+
+    def _send(self, op, pkey_id, guids, timeout):
+        if self.blocked is None or pkey_id in self.blocked:
+            self.release.wait()
+        self.requests.append((op, pkey_id, list(guids), timeout))
+        failed = [guid for guid in guids if guid in self.failed]
+        if not failed:
+            return
+        # NOTE: every guid is a chunk of its own.
+        result = pkey.ChunkedResult()
+        for guid in guids:
+            if guid in self.failed:
+                result.add_failure([guid], exceptions.UfmConnectionError(
+                    url='https://ufm', error='refused'))
+            else:
+                result.add_success([guid])
+        raise exceptions.PartialFailureError(operation=op, pkey=pkey_id,
+                                             result=result)
+
+
+class TestPKeyMembershipQueue(base.TestCase):
+
+    def setUp(self):
+        super(TestPKeyMembershipQueue, self).setUp()
+        self.client = FakePKeyClient()
+
+    def test_coalesce_within_window(self):
+        queue = pkey_queue.PKeyMembershipQueue(self.client, window=60,
+                                               timeout=5)
+        first = queue.add_guids('0x10', GUIDS[:2])
+        second = queue.add_guids('0x10', GUIDS[2:] + GUIDS[:1])
+        other = queue.remove_guids('0x20', GUIDS[:1])
+        self.assertEqual([], self.client.requests)
+        queue.flush()
+        # NOTE: pkeys are flushed concurrently, in no particular order.
+        self.assertEqual([('add', '0x10', GUIDS, 5),
+                          ('remove', '0x20', GUIDS[:1], 5)],
+                         sorted(self.client.requests, key=lambda r: r[1]))
+        for future in (first, second, other):
+            self.assertIsNone(future.result(timeout=1))
+
+    def test_last_change_wins(self):
+        queue = pkey_queue.PKeyMembershipQueue(self.client, window=60)
+        added = queue.add_guids('0x10', GUIDS[:2])
+        removed = queue.remove_guids('0x10', GUIDS[1:2])
+        queue.flush()
+        self.assertEqual([('add', '0x10', GUIDS[:1], None),
+                          ('remove', '0x10', GUIDS[1:2], None)],
+                         self.client.requests)
+        # NOTE: the replaced add is resolved by the remove of its guid.
+        self.assertIsNone(added.result(timeout=1))
+        self.assertIsNone(removed.result(timeout=1))
+
+    def test_normalize_guids(self):
+        queue = pkey_queue.PKeyMembershipQueue(self.client, window=60)
+        queue.add_guids('0x10', [GUIDS[0].upper(), GUIDS[0], 'bogus'])
+        queue.flush()
+        self.assertEqual([('add', '0x10', [GUIDS[0], 'bogus'], None)],
+                         self.client.requests)
+
+    def test_partial_failure(self):
+        self.client.failed.add(GUIDS[1])
+        queue = pkey_queue.PKeyMembershipQueue(self.client, window=60)
+        ok = queue.add_guids('0x10', GUIDS[:1])
+        failed = queue.add_guids('0x10', GUIDS[1:2])
+        both = queue.add_guids('0x10', GUIDS[:2])
+        queue.flush()
+        self.assertIsNone(ok.result(timeout=1))
+        self.assertRaises(exceptions.PartialFailureError, failed.result, 1)
+        self.assertRaises(exceptions.PartialFailureError, both.result, 1)
+
+    def test_changes_sent_in_order(self):
+        self.client.release.clear()
+        queue = pkey_queue.PKeyMembershipQueue(self.client)
+        futures = [queue.add_guids('0x10', GUIDS[:1]),
+                   queue.remove_guids('0x10', GUIDS[:1]),
+                   queue.add_guids('0x10', GUIDS[:1])]
+        self.client.release.set()
+        queue.flush()
+        for future in futures:
+            self.assertIsNone(future.result(timeout=1))
+        ops = [op for op, _pkey, _guids, _timeout in self.client.requests]
+        # NOTE: the first add may be sent before the other changes are
+        #  queued, but the last request always adds the guid back.
+        self.assertEqual('add', ops[-1])
+        self.assertIn(ops, (['add'], ['add', 'add']))
+
+    def test_pkeys_flushed_concurrently(self):
+        self.client.release.clear()
+        self.client.blocked = {'0x10'}
+        queue = pkey_queue.PKeyMembershipQueue(self.client)
+        slow = queue.add_guids('0x10', GUIDS[:1])
+        fast = queue.add_guids('0x20', GUIDS[:1])
+        # NOTE: UFM is still adding guids to 0x10.
+        self.assertIsNone(fast.result(timeout=5))
+        self.assertFalse(slow.done())
+        self.client.release.set()
+        self.assertIsNone(slow.result(timeout=5))
+        queue.flush()
+        self.assertEqual(['0x20', '0x10'],
+                         [pkey_id for _op, pkey_id, _guids, _timeout
+                          in self.client.requests])
+
+    def test_empty_change(self):
+        queue = pkey_queue.PKeyMembershipQueue(self.client)
+        self.assertIsNone(queue.add_guids('0x10', []).result(timeout=1))
+        queue.flush()
+        self.assertEqual([], self.client.requests)
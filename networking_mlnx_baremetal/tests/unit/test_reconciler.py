@@ -0,0 +1,153 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import futurist
+
+from networking_mlnx_baremetal import reconciler
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import guid as ib_guid
+
+GUIDS = ['%016x' % (0x0002c90300000000 + i) for i in range(6)]
+
+
+def _set(*indexes):
+    return ib_guid.GuidSet([GUIDS[i] for i in indexes])
+
+
+class FakeGuidIndex(object):
+
+    loaded = True
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def items(self):
+        return self.nodes.items()
+
+    def refresh(self):
+        pass
+
+
+class FakePKeyClient(object):
+
+    def __init__(self, members=()):
+        self.members = members
+        self.requests = []
+
+    def iter_guids(self):
+        return iter(self.members)
+
+    def add_guids(self, pkey, guids):
+        return self._send('add', pkey, guids)
+
+    def remove_guids(self, pkey, guids):
+        return self._send('remove', pkey, guids)
+
+    def _send(self, op, pkey, guids):
+        self.requests.append((op, pkey, guids))
+        future = futurist.Future()
+        future.set_result(None)
+        return future
+
+
+class FakeUfmClient(object):
+
+    def __init__(self, members=()):
+        self.pkey = FakePKeyClient(members)
+
+
+class TestDiff(base.TestCase):
+
+    def test_add_missing(self):
+        to_add, to_remove = reconciler.PKeyReconciler.diff(
+            {0x10: _set(0, 1), 0x20: _set(2)}, {0x10: _set(0)},
+            {0x10, 0x20}, _set(0, 1, 2))
+        self.assertEqual({0x10: _set(1), 0x20: _set(2)}, to_add)
+        self.assertEqual({}, to_remove)
+
+    def test_remove_only_managed(self):
+        actual = {0x10: _set(0, 1, 2), 0x30: _set(0, 1)}
+        to_add, to_remove = reconciler.PKeyReconciler.diff(
+            {0x10: _set(0)}, actual, {0x10}, _set(0, 1))
+        # NOTE: guid 2 is not a known node and pkey 0x30 is not managed.
+        self.assertEqual({}, to_add)
+        self.assertEqual({0x10: _set(1)}, to_remove)
+
+    def test_in_sync(self):
+        state = {0x10: _set(0, 1)}
+        self.assertEqual(({}, {}), reconciler.PKeyReconciler.diff(
+            state, state, {0x10}, _set(0, 1)))
+
+
+class TestPKeyReconciler(base.TestCase):
+
+    def setUp(self):
+        super(TestPKeyReconciler, self).setUp()
+        self.ufm_client = FakeUfmClient([
+            ('0x10', GUIDS[0], 'full'),
+            ('0x10', GUIDS[2], 'full'),
+            ('0x10', 'bogus', 'full'),
+            ('0x20', GUIDS[4], 'full'),
+        ])
+        self.async_ufm_client = FakeUfmClient()
+        self.index = FakeGuidIndex({'node-a': GUIDS[0:2],
+                                    'node-b': GUIDS[2:4],
+                                    'node-c': GUIDS[4:6]})
+        self.bindings = ([('node-a', 0x10)], {0x10, 0x20}, set())
+        self.reconciler = reconciler.PKeyReconciler(
+            self.ufm_client, self.async_ufm_client, None, ['vlan'],
+            ['ib'], guid_index=self.index)
+        self.reconciler._load_bindings = lambda: self.bindings
+
+    def test_load_actual(self):
+        self.assertEqual({0x10: _set(0, 2), 0x20: _set(4)},
+                         self.reconciler._load_actual())
+
+    def test_confirm_stale(self):
+        self.assertEqual({}, self.reconciler._confirm_stale(
+            {0x10: _set(0, 1)}))
+        self.assertEqual({0x10: _set(1)}, self.reconciler._confirm_stale(
+            {0x10: _set(1, 2), 0x20: _set(3)}))
+        self.assertEqual({0x20: _set(3)}, self.reconciler._confirm_stale(
+            {0x20: _set(3)}))
+
+    def test_remove_after_two_runs(self):
+        to_add, to_remove = self.reconciler.reconcile()
+        self.assertEqual({0x10: _set(1)}, to_add)
+        self.assertEqual({}, to_remove)
+        self.assertEqual([('add', '0x10', [GUIDS[1]])],
+                         self.async_ufm_client.pkey.requests)
+
+        to_add, to_remove = self.reconciler.reconcile()
+        self.assertEqual({0x10: _set(2), 0x20: _set(4)}, to_remove)
+        self.assertIn(('remove', '0x20', [GUIDS[4]]),
+                      self.async_ufm_client.pkey.requests)
+
+    def test_keep_provisioning_nodes(self):
+        self.bindings = ([('node-a', 0x10)], {0x10, 0x20}, {'node-b'})
+        self.reconciler.reconcile()
+        _to_add, to_remove = self.reconciler.reconcile()
+        self.assertEqual({0x20: _set(4)}, to_remove)
+
+    def test_stale_guid_bound_again(self):
+        self.reconciler.reconcile()
+        self.bindings = ([('node-a', 0x10), ('node-b', 0x10)],
+                         {0x10, 0x20}, set())
+        _to_add, to_remove = self.reconciler.reconcile()
+        self.assertEqual({0x20: _set(4)}, to_remove)
+
+    def test_dry_run(self):
+        self.reconciler.dry_run = True
+        self.reconciler.reconcile()
+        self.reconciler.reconcile()
+        self.assertEqual([], self.async_ufm_client.pkey.requests)
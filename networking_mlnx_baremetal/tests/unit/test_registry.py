@@ -0,0 +1,124 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import os
+import signal
+import threading
+
+import fixtures
+import testtools
+
+from networking_mlnx_baremetal import registry
+from networking_mlnx_baremetal.tests import base
+
+
+class TestClientRegistry(base.TestCase):
+
+    def setUp(self):
+        super(TestClientRegistry, self).setUp()
+        self.registry = registry.ClientRegistry()
+
+    def test_created_once(self):
+        created = []
+
+        def factory():
+            created.append(object())
+            return created[-1]
+
+        client = self.registry.get('ufm', factory)
+        self.assertIs(client, self.registry.get('ufm', factory))
+        self.assertIsNot(client, self.registry.get('ironic', factory))
+        self.assertEqual(2, len(created))
+
+    def test_created_once_by_concurrent_callers(self):
+        created = []
+        release = threading.Event()
+
+        def factory():
+            release.wait(5)
+            created.append(object())
+            return created[-1]
+
+        clients = []
+        threads = [threading.Thread(
+            target=lambda: clients.append(self.registry.get('ufm', factory)))
+            for _index in range(8)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(1, len(created))
+        self.assertEqual(created * 8, clients)
+
+    def test_factory_gets_other_clients(self):
+        session = self.registry.get('session', object)
+        client = self.registry.get(
+            'client', lambda: ('client', self.registry.get('session', None)))
+        self.assertEqual(('client', session), client)
+
+    def test_factory_error_not_kept(self):
+        def fail():
+            raise RuntimeError('ufm is down')
+
+        self.assertRaises(RuntimeError, self.registry.get, 'ufm', fail)
+        self.assertEqual('client', self.registry.get('ufm', lambda: 'client'))
+
+    def test_reset(self):
+        first = self.registry.get('ufm', object)
+        other = self.registry.get('ironic', object)
+        self.registry.reset('ufm')
+        self.assertIsNot(first, self.registry.get('ufm', object))
+        self.assertIs(other, self.registry.get('ironic', object))
+        self.registry.reset()
+        self.assertIsNot(other, self.registry.get('ironic', object))
+
+    def test_inherited_clients_dropped(self):
+        parent = self.registry.get('ufm', object)
+        child_pid = os.getpid() + 1
+        self.useFixture(fixtures.MonkeyPatch(
+            'networking_mlnx_baremetal.registry.os.getpid',
+            lambda: child_pid))
+        child = self.registry.get('ufm', object)
+        self.assertIsNot(parent, child)
+        self.assertIs(child, self.registry.get('ufm', object))
+
+    @testtools.skipUnless(hasattr(os, 'fork'), 'fork is not available')
+    def test_fork_while_lock_held(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_factory():
+            started.set()
+            release.wait(5)
+            return object()
+
+        thread = threading.Thread(
+            target=lambda: self.registry.get('ufm', slow_factory))
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(release.set)
+        self.assertTrue(started.wait(5))
+        pid = os.fork()
+        if pid == 0:
+            # NOTE: the thread holding the lock does not exist in the
+            #  child, it is killed if it waits for that lock.
+            signal.alarm(5)
+            code = 1
+            try:
+                if self.registry.get('ufm', object) is not None:
+                    code = 0
+            finally:
+                os._exit(code)
+        _pid, status = os.waitpid(pid, 0)
+        self.assertEqual(0, status)
@@ -0,0 +1,87 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+from oslo_config import cfg
+from oslo_config import fixture as config_fixture
+
+from networking_mlnx_baremetal import constants
+from networking_mlnx_baremetal import registry
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal import ufm_client
+
+ENDPOINT = 'https://ufm.example.com'
+FABRIC = 'https://ufm2'
+STANDBY_FABRIC = 'https://ufm3 | https://ufm4'
+
+
+class TestUfmClients(base.TestCase):
+
+    def setUp(self):
+        super(TestUfmClients, self).setUp()
+        self.config = self.useFixture(config_fixture.Config(cfg.CONF))
+        self.config.config(group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+                           endpoint=ENDPOINT, pkey_replica_ttl=600)
+        registry.REGISTRY.reset()
+        self.addCleanup(registry.REGISTRY.reset)
+
+    def test_async_client_shares_pkey_replica(self):
+        client = ufm_client.get_client()
+        async_client = ufm_client.get_async_client()
+        self.addCleanup(async_client.close, False)
+        self.assertIsNotNone(client.pkey.replica)
+        self.assertIs(client.pkey.replica, async_client.pkey.replica)
+
+
+class TestFabricEndpoints(base.TestCase):
+
+    def setUp(self):
+        super(TestFabricEndpoints, self).setUp()
+        self.config = self.useFixture(config_fixture.Config(cfg.CONF))
+        self.config.config(
+            group=constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME,
+            endpoint=ENDPOINT, username='admin', password='password',
+            endpoint_probe_interval=0,
+            fabric_endpoints={'ib1': FABRIC, 'ib2': FABRIC,
+                              'ib3': STANDBY_FABRIC})
+        registry.REGISTRY.reset()
+        self.addCleanup(registry.REGISTRY.reset)
+
+    def test_get_endpoint(self):
+        self.assertEqual(FABRIC, ufm_client.get_endpoint('ib1'))
+        self.assertEqual(STANDBY_FABRIC, ufm_client.get_endpoint('ib3'))
+        self.assertEqual(ENDPOINT, ufm_client.get_endpoint('other'))
+        self.assertEqual(ENDPOINT, ufm_client.get_endpoint(None))
+
+    def test_get_endpoints(self):
+        self.assertEqual([ENDPOINT, FABRIC, STANDBY_FABRIC],
+                         ufm_client.get_endpoints())
+
+    def test_split_endpoints(self):
+        self.assertEqual(['https://ufm3', 'https://ufm4'],
+                         ufm_client.split_endpoints(STANDBY_FABRIC))
+        self.assertEqual([ENDPOINT], ufm_client.split_endpoints(ENDPOINT))
+
+    def test_fabric_name(self):
+        self.assertEqual(['ib1', 'ib2'],
+                         ufm_client.get_physical_networks(FABRIC))
+        self.assertEqual('ufm', ufm_client._fabric_name(ENDPOINT))
+        self.assertEqual('ufm.ib1', ufm_client._fabric_name(FABRIC))
+        self.assertEqual('ufm.ib3', ufm_client._fabric_name(STANDBY_FABRIC))
+
+    def test_client_per_fabric(self):
+        default = ufm_client.get_client()
+        fabric = ufm_client.get_client('ib1')
+        self.assertIs(fabric, ufm_client.get_client('ib2'))
+        self.assertIs(default, ufm_client.get_client('other'))
+        self.assertIsNot(default, fabric)
+        self.assertIsNot(fabric, ufm_client.get_client('ib3'))
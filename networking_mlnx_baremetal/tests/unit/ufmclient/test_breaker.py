@@ -0,0 +1,108 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import breaker
+from networking_mlnx_baremetal.ufmclient import exceptions
+
+
+class _Failure(Exception):
+    pass
+
+
+def _fail():
+    raise _Failure()
+
+
+def _answer():
+    return 'answer'
+
+
+class TestCircuitBreaker(base.TestCase):
+
+    def setUp(self):
+        super(TestCircuitBreaker, self).setUp()
+        self.events = []
+        self.breaker = self._breaker()
+
+    def _breaker(self, reset_timeout=60):
+        return breaker.CircuitBreaker(
+            'ufm', failure_threshold=3, reset_timeout=reset_timeout,
+            failures=(_Failure,),
+            listener=lambda _breaker, event: self.events.append(event))
+
+    def _fail_times(self, count):
+        for _ in range(count):
+            self.assertRaises(_Failure, self.breaker.call, _fail)
+
+    def test_open_after_consecutive_failures(self):
+        self._fail_times(2)
+        self.assertEqual('answer', self.breaker.call(_answer))
+        self._fail_times(2)
+        self.assertEqual(breaker.STATE_CLOSED, self.breaker.state)
+        self._fail_times(1)
+        self.assertEqual(breaker.STATE_OPEN, self.breaker.state)
+        self.assertEqual([breaker.STATE_OPEN], self.events)
+
+    def test_reject_while_open(self):
+        self._fail_times(3)
+        calls = []
+        error = self.assertRaises(exceptions.CircuitOpenError,
+                                  self.breaker.call, calls.append, 1)
+        self.assertEqual([], calls)
+        self.assertIn('ufm', str(error))
+        self.assertEqual([breaker.STATE_OPEN, breaker.EVENT_REJECTED],
+                         self.events)
+
+    def test_half_open_probe_closes(self):
+        self.breaker = self._breaker(reset_timeout=0)
+        self._fail_times(3)
+        self.assertEqual('answer', self.breaker.call(_answer))
+        self.assertEqual(breaker.STATE_CLOSED, self.breaker.state)
+        self.assertEqual([breaker.STATE_OPEN, breaker.STATE_HALF_OPEN,
+                          breaker.STATE_CLOSED], self.events)
+
+    def test_half_open_probe_reopens(self):
+        self.breaker = self._breaker(reset_timeout=0)
+        self._fail_times(3)
+        self._fail_times(1)
+        self.assertEqual(breaker.STATE_OPEN, self.breaker.state)
+        self.assertEqual([breaker.STATE_OPEN, breaker.STATE_HALF_OPEN,
+                          breaker.STATE_OPEN], self.events)
+
+    def test_half_open_rejects_concurrent_probes(self):
+        self.breaker = self._breaker(reset_timeout=0)
+        self._fail_times(3)
+
+        def probe():
+            # NOTE: a second call while the probe is in flight.
+            self.assertRaises(exceptions.CircuitOpenError,
+                              self.breaker.call, _answer)
+            return 'probed'
+
+        self.assertEqual('probed', self.breaker.call(probe))
+        self.assertEqual(breaker.STATE_CLOSED, self.breaker.state)
+
+    def test_other_errors_count_as_answer(self):
+        self._fail_times(2)
+        self.assertRaises(KeyError, self.breaker.call, {}.__getitem__, 1)
+        self._fail_times(2)
+        self.assertEqual(breaker.STATE_CLOSED, self.breaker.state)
+
+    def test_inner_rejection_is_not_a_failure(self):
+        inner = breaker.CircuitBreaker('inner', 1, 60, failures=(_Failure,))
+        self.assertRaises(_Failure, inner.call, _fail)
+        for _ in range(5):
+            self.assertRaises(exceptions.CircuitOpenError,
+                              self.breaker.call, inner.call, _answer)
+        self.assertEqual(breaker.STATE_CLOSED, self.breaker.state)
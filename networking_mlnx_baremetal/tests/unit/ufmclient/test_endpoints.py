@@ -0,0 +1,104 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import threading
+
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import endpoints
+
+URLS = ['https://ufm1', 'https://ufm2', 'https://ufm3']
+
+
+class TestEndpointSet(base.TestCase):
+
+    def setUp(self):
+        super(TestEndpointSet, self).setUp()
+        self.endpoints = endpoints.EndpointSet(URLS)
+        self.ufm1, self.ufm2, self.ufm3 = self.endpoints.endpoints
+
+    def _order(self):
+        return [endpoint.url for endpoint in self.endpoints.candidates()]
+
+    def test_configured_order(self):
+        self.assertEqual(URLS, self._order())
+        self.assertEqual('https://ufm1/ufmRest',
+                         self.endpoints.primary.base_url)
+
+    def test_no_endpoint(self):
+        self.assertRaises(ValueError, endpoints.EndpointSet, [])
+
+    def test_fail_over_and_back(self):
+        self.endpoints.failed(self.ufm1, 'refused')
+        self.assertEqual(['https://ufm2', 'https://ufm3', 'https://ufm1'],
+                         self._order())
+        self.endpoints.failed(self.ufm1, 'refused')
+        self.assertEqual(2, self.ufm1.failures)
+        self.endpoints.succeeded(self.ufm1)
+        self.assertEqual(URLS, self._order())
+        self.assertEqual(0, self.ufm1.failures)
+
+    def test_all_unhealthy(self):
+        for endpoint in (self.ufm3, self.ufm1, self.ufm2):
+            self.endpoints.failed(endpoint, 'refused')
+        # NOTE: requests still try every endpoint, the primary first.
+        self.assertEqual(URLS, self._order())
+
+    def test_fastest_first(self):
+        self.endpoints.observe(self.ufm1, 0.2)
+        self.endpoints.observe(self.ufm2, 0.05)
+        self.assertEqual(['https://ufm2', 'https://ufm1', 'https://ufm3'],
+                         self._order())
+
+    def test_close_latencies_keep_configured_order(self):
+        self.endpoints.observe(self.ufm1, 0.053)
+        self.endpoints.observe(self.ufm2, 0.051)
+        self.assertEqual('https://ufm1', self.endpoints.primary.url)
+
+    def test_latency_moving_average(self):
+        self.endpoints.observe(self.ufm1, 1.0)
+        self.endpoints.observe(self.ufm1, 2.0)
+        self.assertAlmostEqual(1.3, self.ufm1.latency)
+        self.assertIsNotNone(self.ufm1.checked_at)
+
+    def test_probe_all(self):
+        def probe(endpoint):
+            if endpoint is self.ufm1:
+                raise IOError('refused')
+            return 0.01 if endpoint is self.ufm3 else 0.5
+
+        self.endpoints = endpoints.EndpointSet(URLS, probe=probe)
+        self.ufm1, self.ufm2, self.ufm3 = self.endpoints.endpoints
+        self.endpoints.probe_all()
+        self.assertEqual(['https://ufm3', 'https://ufm2', 'https://ufm1'],
+                         self._order())
+        self.assertEqual([False, True, True],
+                         [endpoint['healthy']
+                          for endpoint in self.endpoints.as_list()])
+
+    def test_probed_in_background(self):
+        probed = threading.Event()
+
+        def probe(endpoint):
+            probed.set()
+            return 0.01
+
+        probing = endpoints.EndpointSet(URLS, probe=probe, interval=60)
+        probing.start()
+        self.addCleanup(probing.stop)
+        self.assertTrue(probed.wait(5))
+
+    def test_single_endpoint_not_probed(self):
+        single = endpoints.EndpointSet(URLS[:1], probe=lambda e: 0.01,
+                                       interval=60)
+        single.start()
+        self.assertIsNone(single._thread)
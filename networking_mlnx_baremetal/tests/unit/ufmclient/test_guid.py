@@ -0,0 +1,109 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import guid
+
+GUID = '04bd700300123456'
+
+
+class TestParse(base.TestCase):
+
+    def test_forms(self):
+        expected = int(GUID, 16)
+        for value in (_client_id(GUID), '04:bd:70:03:00:12:34:56', GUID,
+                      GUID.upper(), expected):
+            self.assertEqual(expected, guid.parse(value))
+
+    def test_invalid(self):
+        for value in ('', 'not a guid', '1' * 17, -1, 2 ** 64):
+            self.assertRaises(ValueError, guid.parse, value)
+
+    def test_guid_format(self):
+        value = guid.Guid.parse(_client_id(GUID))
+        self.assertEqual(GUID, str(value))
+        self.assertEqual('04:bd:70:03:00:12:34:56', value.colon())
+        self.assertEqual('0000000000000001', str(guid.Guid(1)))
+
+
+def _client_id(value):
+    """Build an ironic InfiniBand port client-id of a GUID"""
+    octets = [value[i:i + 2] for i in range(0, len(value), 2)]
+    return ':'.join(['ff', '00', '00', '00', '00', '00', '02', '00', '00',
+                     '02', 'c9', '00'] + octets)
+
+
+class TestBulk(base.TestCase):
+
+    def setUp(self):
+        super(TestBulk, self).setUp()
+        self.guids = ['%016x' % (0x0002c90300000000 + i) for i in range(50)]
+        self.client_ids = [_client_id(value) for value in self.guids]
+
+    def test_parse_all_client_ids(self):
+        result = guid.parse_all(self.client_ids)
+        self.assertEqual([int(value, 16) for value in self.guids],
+                         list(result))
+        self.assertEqual(self.guids, guid.format_all(result))
+
+    def test_parse_all_mixed_forms(self):
+        values = self.client_ids[:2] + self.guids[2:4] + [7]
+        self.assertEqual([int(value, 16) for value in self.guids[:4]] + [7],
+                         list(guid.parse_all(values)))
+
+    def test_parse_all_malformed_client_id(self):
+        broken = self.client_ids[0][:-2] + 'zz'
+        self.assertRaises(ValueError, guid.parse_all,
+                          self.client_ids[1:] + [broken])
+
+    def test_normalize_all(self):
+        self.assertEqual(self.guids[:2],
+                         guid.normalize_all(iter(self.client_ids[:2])))
+        self.assertEqual([self.guids[0], 'bogus', self.guids[1]],
+                         guid.normalize_all([self.client_ids[0], 'bogus',
+                                             self.guids[1].upper()]))
+
+
+class TestGuidSet(base.TestCase):
+
+    def test_membership(self):
+        guids = guid.GuidSet([GUID, _client_id(GUID), 1])
+        self.assertEqual(2, len(guids))
+        self.assertIn(GUID, guids)
+        self.assertIn(_client_id(GUID), guids)
+        self.assertIn(1, guids)
+        self.assertNotIn(2, guids)
+        self.assertNotIn('bogus', guids)
+        self.assertEqual(['0000000000000001', GUID], guids.formatted())
+
+    def test_strict(self):
+        self.assertRaises(ValueError, guid.GuidSet, [GUID, 'bogus'])
+        self.assertEqual(1, len(guid.GuidSet([GUID, 'bogus'], strict=False)))
+        self.assertFalse(guid.GuidSet())
+
+    def test_operations(self):
+        left = guid.GuidSet([1, 2, 3])
+        right = guid.GuidSet.from_ints([3, 4])
+        self.assertEqual(guid.GuidSet([3]), left & right)
+        self.assertEqual(guid.GuidSet([1, 2, 3, 4]), left | right)
+        self.assertEqual(guid.GuidSet([1, 2]), left - right)
+        self.assertEqual(guid.GuidSet([1, 2, 4]), left ^ right)
+        self.assertEqual(guid.GuidSet([1]), left - ['2', '03'])
+        self.assertNotEqual(left, right)
+
+    def test_sorted_iteration(self):
+        guids = guid.GuidSet.from_ints([3, 1 << 63, 2]) | [GUID]
+        self.assertEqual([2, 3, int(GUID, 16), 1 << 63], list(guids))
+        self.assertEqual(['0000000000000002', '0000000000000003', GUID,
+                          '8000000000000000'], guids.formatted())
+        self.assertTrue(all(isinstance(value, guid.Guid) for value in guids))
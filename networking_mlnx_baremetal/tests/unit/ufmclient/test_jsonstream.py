@@ -0,0 +1,120 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import json
+
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import jsonstream
+
+
+def _chunks(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _walk(reader):
+    """Rebuild the next value by walking containers token by token"""
+    char = reader.peek()
+    if char == '{':
+        return dict((key, _walk(reader)) for key in reader.items())
+    if char == '[':
+        return list(reader.elements())
+    return reader.value()
+
+
+class TestJsonReader(base.TestCase):
+
+    DOCUMENT = {
+        '0x1': {'guids': [{'guid': '0002c90300000001',
+                           'membership': 'full'}],
+                'ip_over_ib': True},
+        '0x7fff': {'guids': [], 'name': u'réseau 中文'},
+        'empty': {},
+        'numbers': [0, -12345678901234, 3.25, 1e-07, True, None],
+    }
+
+    def _reader(self, text, size):
+        return jsonstream.JsonReader(_chunks(text, size))
+
+    def test_every_chunk_size(self):
+        text = json.dumps(self.DOCUMENT, ensure_ascii=False)
+        for size in range(1, 24):
+            reader = self._reader(text, size)
+            self.assertEqual(self.DOCUMENT, _walk(reader),
+                             'chunk size %d' % size)
+            self.assertIsNone(reader.peek())
+
+    def test_string_split_across_chunks(self):
+        reader = self._reader('["abcdefgh", "ij"]', 3)
+        self.assertEqual(['abcdefgh', 'ij'], list(reader.elements()))
+
+    def test_number_split_across_chunks(self):
+        # NOTE: a number which ends with a chunk must not be decoded
+        #  before the next chunk is read.
+        for text, expected in (('[12345, 678]', [12345, 678]),
+                               ('[3.25]', [3.25]),
+                               ('[1e-07, 2E+3]', [1e-07, 2e3]),
+                               ('[-10]', [-10])):
+            for size in range(1, len(text)):
+                reader = self._reader(text, size)
+                self.assertEqual(expected, list(reader.elements()),
+                                 '%s in chunks of %d' % (text, size))
+        reader = self._reader('12345', 3)
+        self.assertEqual(12345, reader.value())
+
+    def test_multibyte_character_split_across_chunks(self):
+        text = u'["é中\U0001f600"]'
+        for size in range(1, 8):
+            reader = self._reader(text, size)
+            self.assertEqual([u'é中\U0001f600'],
+                             list(reader.elements()))
+
+    def test_text_chunks(self):
+        reader = jsonstream.JsonReader(['{"a"', ': [1', ', 2]}'])
+        self.assertEqual({'a': [1, 2]}, _walk(reader))
+
+    def test_whitespace_between_tokens(self):
+        reader = self._reader(' {\n "a" :\t[ 1 ,\r\n 2 ] , "b" : { } }\n', 4)
+        self.assertEqual({'a': [1, 2], 'b': {}}, _walk(reader))
+        self.assertIsNone(reader.peek())
+
+    def test_skip_member_values(self):
+        reader = self._reader('{"a": {"x": [1, {"y": 2}]}, "b": 3}', 5)
+        keys = []
+        for key in reader.items():
+            keys.append(key)
+            value = reader.value()
+        self.assertEqual(['a', 'b'], keys)
+        self.assertEqual(3, value)
+
+    def test_truncated_document(self):
+        for text in ('{"a": [1, 2', '{"a": "unterminated', '{"a"', '[1,',
+                     '{"a": 1'):
+            reader = self._reader(text, 4)
+            self.assertRaises(jsonstream.JsonStreamError, _walk, reader)
+
+    def test_empty_document(self):
+        reader = self._reader('', 4)
+        self.assertIsNone(reader.peek())
+        self.assertRaises(jsonstream.JsonStreamError, next, reader.items())
+        self.assertRaises(jsonstream.JsonStreamError, reader.value)
+
+    def test_malformed_document(self):
+        for text in ('{"a" 1}', '{"a": 1 "b": 2}', '[1 2]', '{1: 2}',
+                     '{"a": nope}', '[1, 2}'):
+            reader = self._reader(text, 3)
+            self.assertRaises(jsonstream.JsonStreamError, _walk, reader)
+
+    def test_unexpected_container(self):
+        reader = self._reader('[1]', 8)
+        self.assertRaises(jsonstream.JsonStreamError, next, reader.items())
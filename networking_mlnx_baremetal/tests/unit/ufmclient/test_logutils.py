@@ -0,0 +1,82 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import logging
+
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import logutils
+
+
+class CountingRepr(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __repr__(self):
+        self.calls += 1
+        return 'counted'
+
+
+class TestTruncated(base.TestCase):
+
+    def setUp(self):
+        super(TestTruncated, self).setUp()
+        self.addCleanup(logutils.set_max_length,
+                        logutils.DEFAULT_MAX_LENGTH)
+
+    def test_short_text_kept(self):
+        self.assertEqual('guids', str(logutils.truncated('guids', 8)))
+
+    def test_text_truncated(self):
+        self.assertEqual('0123...(4 of 10)',
+                         str(logutils.truncated('0123456789', 4)))
+
+    def test_bytes_decoded_from_head(self):
+        content = b'{"pkey": "0x10"}' + b'\xff' * 100
+        self.assertEqual('{"pkey"...(7 of 116)',
+                         str(logutils.truncated(content, 7)))
+        self.assertIn(u'�', u'%s' % logutils.truncated(b'ok\xff', 8))
+
+    def test_container_repr_limited(self):
+        guids = ['%016x' % guid for guid in range(1000)]
+        text = str(logutils.truncated(guids, 100000))
+        # NOTE: reprlib keeps the first items of a container only.
+        self.assertTrue(text.endswith(', ...]'))
+        self.assertLess(len(text), 1000)
+
+    def test_not_truncated_without_limit(self):
+        guids = ['%016x' % guid for guid in range(1000)]
+        self.assertEqual(repr(guids), str(logutils.truncated(guids, 0)))
+
+    def test_default_limit(self):
+        logutils.set_max_length(4)
+        self.assertEqual('0123...(4 of 10)',
+                         str(logutils.truncated('0123456789')))
+
+    def test_formatted_only_when_logged(self):
+        value = CountingRepr()
+        logger = logging.getLogger('networking_mlnx_baremetal.tests.lazy')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        self.addCleanup(setattr, logger, 'propagate', True)
+        self.addCleanup(logger.setLevel, logging.NOTSET)
+        records = []
+        handler = logging.Handler()
+        handler.emit = lambda record: records.append(record.getMessage())
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        logger.debug('value %s', logutils.truncated(value))
+        self.assertEqual(0, value.calls)
+        logger.info('value %s', logutils.truncated(value))
+        self.assertEqual(1, value.calls)
+        self.assertEqual(['value counted'], records)
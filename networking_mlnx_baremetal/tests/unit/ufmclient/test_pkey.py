@@ -0,0 +1,384 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import json
+
+import fixtures
+import futurist
+
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import exceptions
+from networking_mlnx_baremetal.ufmclient import jsonstream
+from networking_mlnx_baremetal.ufmclient.modules.resources import pkey
+
+GUID = '0002c90300000001'
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, content=b''):
+        self.status_code = status_code
+        self.content = content
+
+
+class FakeClock(object):
+    """Clock which only advances when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeSession(object):
+    """Session which answers a streamed pkey listing and records writes"""
+
+    def __init__(self, listing=None, chunk_size=7, fail_paths=()):
+        if not isinstance(listing, str):
+            listing = json.dumps(listing or {})
+        self.listing = listing.encode('utf-8')
+        self.chunk_size = chunk_size
+        self.fail_paths = fail_paths
+        self.requests = []
+        self.closed = False
+        # NOTE: pkey -> data answered by getting a pkey.
+        self.pkeys = {}
+        self.on_write = None
+
+    def get(self, url, timeout=None, stream=False):
+        self.requests.append(('GET', url, timeout))
+        return self.listing
+
+    def get_json(self, url, timeout=None):
+        self.requests.append(('GET', url, timeout))
+        pkey_id = url.split('/')[-1].split('?')[0]
+        if pkey_id not in self.pkeys:
+            raise exceptions.ResourceNotFoundError(
+                'GET', url, FakeResponse(404))
+        return self.pkeys[pkey_id], True
+
+    def iter_content(self, response, chunk_size):
+        try:
+            for i in range(0, len(response), self.chunk_size):
+                yield response[i:i + self.chunk_size]
+        finally:
+            self.closed = True
+
+    def post(self, url, payload, timeout=None, idempotent=None):
+        self._write('POST', url, timeout)
+
+    def put(self, url, payload, timeout=None):
+        self._write('PUT', url, timeout)
+
+    def delete(self, url, timeout=None):
+        self._write('DELETE', url, timeout)
+
+    def _write(self, method, url, timeout):
+        self.requests.append((method, url, timeout))
+        if self.on_write is not None:
+            self.on_write()
+        if any(path in url for path in self.fail_paths):
+            raise exceptions.UfmConnectionError(url=url, error='refused')
+
+
+class TestDeadline(base.TestCase):
+
+    def test_deadline_shared_by_chunks(self):
+        session = FakeSession()
+        client = pkey.PKeyResourceClient(session, None, chunk_size=1)
+        client.add_guids('0x10', ['%016x' % guid for guid in range(3)],
+                         timeout=10)
+        timeouts = [timeout for _method, _url, timeout in session.requests]
+        self.assertEqual(3, len(timeouts))
+        self.assertTrue(all(0 < timeout <= 10 for timeout in timeouts))
+        self.assertEqual(sorted(timeouts, reverse=True), timeouts)
+
+    def test_deadline_exceeded(self):
+        deadline = pkey._Deadline(pkey.OP_ADD, 0.001)
+        deadline._at -= 1
+        self.assertRaises(exceptions.UfmDeadlineExceeded, deadline.remaining)
+
+    def test_no_deadline(self):
+        self.assertIsNone(pkey._Deadline(pkey.OP_ADD, None).remaining())
+
+    def test_operation_timeout(self):
+        session = FakeSession()
+        client = pkey.PKeyResourceClient(
+            session, None, operation_timeouts={pkey.OP_REMOVE: 2})
+        client.remove_guids('0x10', [GUID], timeout=10)
+        client.remove_guids('0x10', [GUID], timeout=1)
+        client.add_guids('0x10', [GUID])
+        timeouts = [timeout for _method, _url, timeout in session.requests]
+        self.assertTrue(0 < timeouts[0] <= 2)
+        self.assertTrue(0 < timeouts[1] <= 1)
+        # NOTE: operations without a timeout use the one of the session.
+        self.assertIsNone(timeouts[2])
+
+    def test_deadline_expires_between_chunks(self):
+        clock = FakeClock()
+        self.useFixture(fixtures.MonkeyPatch(
+            'networking_mlnx_baremetal.ufmclient.modules.resources.pkey.time',
+            clock))
+        session = FakeSession()
+        session.on_write = lambda: clock.sleep(4)
+        client = pkey.PKeyResourceClient(session, None, chunk_size=1)
+        guids = ['%016x' % guid for guid in range(3)]
+        error = self.assertRaises(exceptions.PartialFailureError,
+                                  client.add_guids, '0x10', guids, timeout=6)
+        self.assertEqual(guids[:2], error.result.succeeded)
+        self.assertEqual(guids[2:], error.result.failed)
+        self.assertIsInstance(error.result.errors[0],
+                              exceptions.UfmDeadlineExceeded)
+        self.assertEqual([6, 2], [timeout for _method, _url, timeout
+                                  in session.requests])
+
+
+class TestChunkedWrites(base.TestCase):
+
+    def test_add_guids_in_chunks(self):
+        session = FakeSession()
+        client = pkey.PKeyResourceClient(session, None, chunk_size=2)
+        guids = ['%016x' % guid for guid in range(5)]
+        result = client.add_guids('0x10', guids)
+        self.assertEqual(3, result.chunks)
+        self.assertEqual(guids, result.succeeded)
+        self.assertEqual(3, len(session.requests))
+
+    def test_failed_chunks(self):
+        guids = ['%016x' % guid for guid in range(4)]
+        session = FakeSession(fail_paths=[','.join(guids[2:])])
+        client = pkey.PKeyResourceClient(session, None, chunk_size=2)
+        error = self.assertRaises(exceptions.PartialFailureError,
+                                  client.remove_guids, '0x10', guids)
+        self.assertEqual(guids[:2], error.result.succeeded)
+        self.assertEqual(guids[2:], error.result.failed)
+
+    def test_concurrent_chunks_partial_failure(self):
+        guids = ['%016x' % guid for guid in range(6)]
+        session = FakeSession(fail_paths=[','.join(guids[2:4])])
+        client = pkey.PKeyResourceClient(session, None, chunk_size=2,
+                                         chunk_concurrency=3)
+        error = self.assertRaises(exceptions.PartialFailureError,
+                                  client.remove_guids, '0x10', guids)
+        # NOTE: every chunk is sent even if another one failed.
+        self.assertEqual(3, len(session.requests))
+        self.assertEqual(guids[:2] + guids[4:],
+                         sorted(error.result.succeeded))
+        self.assertEqual(guids[2:4], error.result.failed)
+        self.assertEqual(3, error.result.chunks)
+        self.assertIsInstance(error.result.errors[0],
+                              exceptions.UfmConnectionError)
+
+    def test_single_chunk_error_raised_as_is(self):
+        session = FakeSession(fail_paths=['/guids/'])
+        client = pkey.PKeyResourceClient(session, None, chunk_size=2)
+        self.assertRaises(exceptions.UfmConnectionError,
+                          client.remove_guids, '0x10', [GUID])
+
+    def test_failed_chunk_invalidates_replica(self):
+        guids = ['%016x' % guid for guid in range(4)]
+        session = FakeSession(fail_paths=[','.join(guids[2:])])
+        client = pkey.PKeyResourceClient(session, None, chunk_size=2,
+                                         replica_ttl=600)
+        client.replica.load({'0x10': {'guids': guids}})
+        session.pkeys['0x10'] = {'guids': guids}
+        self.assertRaises(exceptions.PartialFailureError,
+                          client.remove_guids, '0x10', guids)
+        self.assertTrue(client.replica.expired)
+
+
+class TestIterGuids(base.TestCase):
+
+    def _iter(self, listing, chunk_size=7):
+        session = FakeSession(listing, chunk_size)
+        client = pkey.PKeyResourceClient(session, None)
+        return list(client.iter_guids()), session
+
+    def test_memberships(self):
+        listing = {
+            '0x1': {'guids': [
+                {'guid': '0002c90300000001', 'membership': 'full'},
+                {'guid': '0002c90300000002', 'membership': 'limited'},
+                {'guid': '0002c90300000003'}]},
+            '0x2': {'guids': ['0002c90300000004']},
+        }
+        guids, session = self._iter(listing)
+        self.assertEqual([('0x1', '0002c90300000001', 'full'),
+                          ('0x1', '0002c90300000002', 'limited'),
+                          ('0x1', '0002c90300000003', 'full'),
+                          ('0x2', '0002c90300000004', 'full')], guids)
+        self.assertTrue(session.closed)
+
+    def test_skip_other_members_and_pkeys(self):
+        listing = {
+            '0x1': {'ip_over_ib': True, 'partition': 'a',
+                    'nested': {'guids': [{'guid': '0002c903000000ff'}]},
+                    'guids': [{'guid': '0002c90300000001',
+                               'index0': True}],
+                    'mtu_limit': 2},
+            '0x2': {'guids': None},
+            '0x3': {'guids': []},
+            '0x4': {},
+            '0x5': 'not a pkey',
+            '0x6': [1, 2, 3],
+            '0x7': {'guids': [{'membership': 'full'}, '',
+                              {'guid': None}]},
+        }
+        guids, _session = self._iter(listing)
+        self.assertEqual([('0x1', '0002c90300000001', 'full')], guids)
+
+    def test_every_chunk_size(self):
+        listing = json.dumps({
+            '0x%x' % pkey_id: {'guids': [
+                {'guid': '%016x' % guid, 'membership': 'full'}
+                for guid in range(pkey_id)]}
+            for pkey_id in range(1, 5)})
+        expected, _session = self._iter(listing, len(listing))
+        for size in range(1, 40):
+            guids, _session = self._iter(listing, size)
+            self.assertEqual(expected, guids)
+        self.assertEqual(10, len(expected))
+
+    def test_truncated_listing(self):
+        listing = '{"0x1": {"guids": [{"guid": "0002c90300000001"}, {"gu'
+        session = FakeSession(listing)
+        client = pkey.PKeyResourceClient(session, None)
+        iterator = client.iter_guids()
+        self.assertEqual(('0x1', '0002c90300000001', 'full'), next(iterator))
+        self.assertRaises(jsonstream.JsonStreamError, next, iterator)
+        self.assertTrue(session.closed)
+
+
+class FakeAsyncSession(object):
+    """Async session which runs requests in the caller thread"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def submit(self, fn, *args, **kwargs):
+        future = futurist.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class TestSharedReplica(base.TestCase):
+
+    def setUp(self):
+        super(TestSharedReplica, self).setUp()
+        self.session = FakeSession()
+        self.client = pkey.PKeyResourceClient(self.session, None,
+                                              replica_ttl=600)
+        self.async_client = pkey.AsyncPKeyResourceClient(
+            FakeAsyncSession(self.session), None,
+            replica=self.client.replica)
+        self.client.replica.load({'0x10': {'guids': [GUID]}})
+
+    def test_replica_shared(self):
+        self.assertIs(self.client.replica, self.async_client.replica)
+
+    def test_delete_in_background(self):
+        self.async_client.delete('0x10').result()
+        self.client.add_guids('0x10', [GUID])
+        self.assertEqual(['DELETE', 'POST'],
+                         [method for method, _url, _timeout
+                          in self.session.requests])
+
+    def test_remove_in_background(self):
+        self.async_client.remove_guids('0x10', [GUID]).result()
+        self.assertEqual([], self.client.replica.present('0x10', [GUID]))
+
+
+class TestReplica(base.TestCase):
+    """A replica only skips writes confirmed redundant by UFM"""
+
+    def setUp(self):
+        super(TestReplica, self).setUp()
+        self.session = FakeSession()
+        self.client = pkey.PKeyResourceClient(self.session, None,
+                                              replica_ttl=600)
+        self.replica = self.client.replica
+        self.replica.load({'0x10': {'guids': [GUID]}})
+
+    def _methods(self):
+        return [method for method, _url, _timeout in self.session.requests]
+
+    def test_add_removed_by_another_process(self):
+        self.session.pkeys['0x10'] = {'guids': []}
+        self.client.add_guids('0x10', [GUID])
+        self.assertEqual(['GET', 'POST'], self._methods())
+        self.assertEqual([], self.replica.missing('0x10', [GUID], 'full'))
+
+    def test_add_pkey_deleted_by_another_process(self):
+        self.client.add_guids('0x10', [GUID])
+        self.assertEqual(['GET', 'POST'], self._methods())
+
+    def test_add_confirmed_redundant(self):
+        self.session.pkeys['0x10'] = {'guids': [{'guid': GUID}]}
+        self.assertIsNone(self.client.add_guids('0x10', [GUID]))
+        self.assertEqual(['GET'], self._methods())
+        self.assertEqual(1, self.replica.stats()['avoided_writes'])
+        self.assertEqual(1, self.replica.stats()['confirmations'])
+
+    def test_add_only_unconfirmed_guids(self):
+        other = '0002c90300000002'
+        self.session.pkeys['0x10'] = {'guids': [GUID]}
+        result = self.client.add_guids('0x10', [GUID, other])
+        self.assertEqual([other], result.succeeded)
+
+    def test_add_new_guids_without_confirmation(self):
+        self.client.add_guids('0x10', ['0002c90300000002'])
+        self.assertEqual(['POST'], self._methods())
+
+    def test_remove_added_by_another_process(self):
+        other = '0002c90300000002'
+        self.session.pkeys['0x10'] = {'guids': [GUID, other]}
+        result = self.client.remove_guids('0x10', [other])
+        self.assertEqual(['GET', 'DELETE'], self._methods())
+        self.assertEqual([other], result.succeeded)
+
+    def test_remove_confirmed_redundant(self):
+        self.session.pkeys['0x10'] = {'guids': [GUID]}
+        self.client.remove_guids('0x10', ['0002c90300000002'])
+        self.assertEqual(['GET'], self._methods())
+
+    def test_write_sent_if_confirmation_fails(self):
+
+        def get_json(url, timeout=None):
+            raise exceptions.UfmConnectionError(url=url, error='refused')
+
+        self.session.get_json = get_json
+        self.client.add_guids('0x10', [GUID])
+        self.assertEqual(['POST'], self._methods())
+
+    def test_update_confirmed(self):
+        self.session.pkeys['0x10'] = {'guids': []}
+        self.client.update('0x10', [GUID])
+        self.assertEqual(['GET', 'PUT'], self._methods())
+
+    def test_journal_replayed_on_load(self):
+        self.replica.invalidate()
+        self.assertTrue(self.replica.start_load())
+        self.assertFalse(self.replica.start_load())
+        self.replica.remove('0x10', [GUID])
+        # NOTE: the listing was taken before the remove.
+        self.replica.load({'0x10': {'guids': [GUID]}})
+        self.replica.end_load()
+        self.assertEqual([], self.replica.present('0x10', [GUID]))
+        self.assertFalse(self.replica.expired)
@@ -0,0 +1,97 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import threading
+import time
+
+import requests
+from six.moves import BaseHTTPServer
+
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import pool
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPoolStats(base.TestCase):
+
+    def test_listener(self):
+        names = []
+        stats = pool.PoolStats(listener=names.append)
+        stats.incr('created')
+        stats.incr('reused')
+        stats.incr('reused')
+        self.assertEqual(['created', 'reused', 'reused'], names)
+        self.assertEqual({'created': 1, 'reused': 2, 'waits': 0,
+                          'expired': 0}, stats.as_dict())
+
+
+class TestUfmHTTPAdapter(base.TestCase):
+
+    def setUp(self):
+        super(TestUfmHTTPAdapter, self).setUp()
+        server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), _Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = 'http://127.0.0.1:%d/' % server.server_address[1]
+
+    def _session(self, **kwargs):
+        self.names = []
+        adapter = pool.UfmHTTPAdapter(pool_listener=self.names.append,
+                                      **kwargs)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        self.addCleanup(session.close)
+        return session, adapter
+
+    def test_connection_reused(self):
+        session, adapter = self._session()
+        for _attempt in range(3):
+            self.assertEqual({}, session.get(self.url).json())
+        self.assertEqual({'created': 1, 'reused': 2, 'waits': 0,
+                          'expired': 0}, adapter.pool_stats.as_dict())
+        self.assertEqual(['created', 'reused', 'reused'], self.names)
+
+    def test_idle_connection_expired(self):
+        session, adapter = self._session(pool_idle_timeout=0.05)
+        session.get(self.url)
+        time.sleep(0.1)
+        session.get(self.url)
+        self.assertEqual({'created': 2, 'reused': 0, 'waits': 0,
+                          'expired': 1}, adapter.pool_stats.as_dict())
+
+    def test_wait_for_connection(self):
+        session, adapter = self._session(pool_maxsize=1)
+        connection_pool = adapter.poolmanager.connection_from_url(self.url)
+        first = connection_pool._get_conn()
+        # NOTE: the only connection of the pool is in use.
+        second = connection_pool._get_conn()
+        connection_pool._put_conn(first)
+        second.close()
+        self.assertEqual(1, adapter.pool_stats.waits)
+        self.assertEqual(2, adapter.pool_stats.created)
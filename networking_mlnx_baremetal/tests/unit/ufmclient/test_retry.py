@@ -0,0 +1,90 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import exceptions
+from networking_mlnx_baremetal.ufmclient import retry
+
+
+class FlakyRequest(object):
+    """Request which fails a number of times before it is answered"""
+
+    def __init__(self, failures, error=None):
+        self.failures = failures
+        self.error = error or exceptions.UfmConnectionError(
+            url='https://ufm', error='reset')
+        self.timeouts = []
+
+    def __call__(self, timeout=None):
+        self.timeouts.append(timeout)
+        if len(self.timeouts) <= self.failures:
+            raise self.error
+        return 'answer'
+
+
+class TestRetryPolicy(base.TestCase):
+
+    def setUp(self):
+        super(TestRetryPolicy, self).setUp()
+        self.retries = []
+        self.policy = self._policy()
+
+    def _policy(self, max_attempts=3, budget=60):
+        return retry.RetryPolicy(
+            max_attempts, base_delay=0, max_delay=0, budget=budget,
+            listener=lambda *args: self.retries.append(args[2]))
+
+    def test_retry_until_answered(self):
+        request = FlakyRequest(2)
+        self.assertEqual('answer',
+                         self.policy.call('GET', '/pkeys', request))
+        self.assertEqual([1, 2], self.retries)
+
+    def test_stop_after_max_attempts(self):
+        request = FlakyRequest(3)
+        self.assertRaises(exceptions.UfmConnectionError,
+                          self.policy.call, 'GET', '/pkeys', request)
+        self.assertEqual(3, len(request.timeouts))
+
+    def test_other_errors_not_retried(self):
+        request = FlakyRequest(1, ValueError())
+        self.assertRaises(ValueError,
+                          self.policy.call, 'GET', '/pkeys', request)
+        self.assertEqual(1, len(request.timeouts))
+
+    def test_timeout_bounds_retries(self):
+        request = FlakyRequest(1)
+        self.policy.call('GET', '/pkeys', request, timeout=10)
+        first, second = request.timeouts
+        self.assertEqual(10, first)
+        self.assertTrue(0 < second <= 10)
+
+    def test_budget_exhausted(self):
+        self.policy = self._policy(budget=0)
+        request = FlakyRequest(1)
+        self.assertRaises(exceptions.UfmConnectionError,
+                          self.policy.call, 'GET', '/pkeys', request)
+        self.assertEqual([], self.retries)
+
+    def test_is_retryable(self):
+        self.assertTrue(self.policy.is_retryable('get'))
+        self.assertTrue(self.policy.is_retryable('DELETE'))
+        self.assertFalse(self.policy.is_retryable('POST'))
+        self.assertTrue(self.policy.is_retryable('POST', idempotent=True))
+        self.assertFalse(self.policy.is_retryable('GET', idempotent=False))
+        self.assertFalse(self._policy(max_attempts=1).is_retryable('GET'))
+
+    def test_delay_ceiling(self):
+        policy = retry.RetryPolicy(5, base_delay=1, max_delay=3, budget=60)
+        for attempt in range(5):
+            self.assertTrue(0 <= policy.delay(attempt) <= min(3, 2 ** attempt))
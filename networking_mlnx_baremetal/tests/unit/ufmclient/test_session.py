@@ -0,0 +1,144 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import json
+import threading
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+from networking_mlnx_baremetal.tests import base
+from networking_mlnx_baremetal.ufmclient import cache
+from networking_mlnx_baremetal.ufmclient import session
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    # NOTE: kept-alive connections of a session do not block shutdown.
+    daemon_threads = True
+
+
+class FakeUfm(object):
+    """State of the local UFM answering pkey listings"""
+
+    def __init__(self):
+        self.body = {'0x10': {}}
+        self.etag = None
+        self.requests = []
+
+
+def _handler(ufm):
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            ufm.requests.append(dict(self.headers))
+            if ufm.etag and self.headers.get('If-None-Match') == ufm.etag:
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            content = json.dumps(ufm.body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            if ufm.etag:
+                self.send_header('ETag', ufm.etag)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class TestResponseCache(base.TestCase):
+
+    def _entry(self, value):
+        return cache.CachedResponse(None, None, cache.digest(b'x'), value)
+
+    def test_least_recently_used_evicted(self):
+        response_cache = cache.ResponseCache(2)
+        response_cache.put('/a', self._entry('a'))
+        response_cache.put('/b', self._entry('b'))
+        self.assertEqual('a', response_cache.get('/a').value)
+        response_cache.put('/c', self._entry('c'))
+        self.assertIsNone(response_cache.get('/b'))
+        self.assertEqual('a', response_cache.get('/a').value)
+        self.assertEqual(2, response_cache.as_dict()['entries'])
+        response_cache.clear()
+        self.assertIsNone(response_cache.get('/a'))
+
+
+class TestConditionalGet(base.TestCase):
+
+    def setUp(self):
+        super(TestConditionalGet, self).setUp()
+        self.ufm = FakeUfm()
+        server = _Server(('127.0.0.1', 0), _handler(self.ufm))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.endpoint = 'http://127.0.0.1:%d' % server.server_address[1]
+
+    def _session(self, response_cache_size=8):
+        ufm_session = session.UfmSession(
+            self.endpoint, 'admin', 'password', False,
+            response_cache_size=response_cache_size)
+        self.addCleanup(ufm_session.close)
+        return ufm_session
+
+    def test_not_modified(self):
+        self.ufm.etag = '"1"'
+        ufm_session = self._session()
+        first, changed = ufm_session.get_json('/resources/pkeys')
+        self.assertTrue(changed)
+        second, changed = ufm_session.get_json('/resources/pkeys')
+        self.assertFalse(changed)
+        self.assertIs(first, second)
+        self.assertEqual('"1"', self.ufm.requests[1].get('If-None-Match'))
+        self.assertEqual(1, ufm_session.response_cache.not_modified)
+
+    def test_changed(self):
+        self.ufm.etag = '"1"'
+        ufm_session = self._session()
+        ufm_session.get_json('/resources/pkeys')
+        self.ufm.etag = '"2"'
+        self.ufm.body = {'0x20': {}}
+        value, changed = ufm_session.get_json('/resources/pkeys')
+        self.assertTrue(changed)
+        self.assertEqual({'0x20': {}}, value)
+        self.assertEqual(2, ufm_session.response_cache.changed)
+
+    def test_unchanged_digest_without_validators(self):
+        ufm_session = self._session()
+        first, _changed = ufm_session.get_json('/resources/pkeys')
+        second, changed = ufm_session.get_json('/resources/pkeys')
+        self.assertFalse(changed)
+        self.assertIs(first, second)
+        self.assertNotIn('If-None-Match', self.ufm.requests[1])
+        self.assertEqual(1, ufm_session.response_cache.unchanged)
+
+    def test_no_cache(self):
+        self.ufm.etag = '"1"'
+        ufm_session = self._session(response_cache_size=0)
+        first, _changed = ufm_session.get_json('/resources/pkeys')
+        second, changed = ufm_session.get_json('/resources/pkeys')
+        self.assertTrue(changed)
+        self.assertIsNot(first, second)
+        self.assertNotIn('If-None-Match', self.ufm.requests[1])
@@ -11,45 +11,259 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import functools
 import os
 
-from ironicclient import client
 from oslo_config import cfg
 from oslo_utils import strutils
 
 from networking_mlnx_baremetal._i18n import _
 from networking_mlnx_baremetal import constants
 from networking_mlnx_baremetal import exceptions
+from networking_mlnx_baremetal import metrics
 from networking_mlnx_baremetal.plugins.ml2 import config
+from networking_mlnx_baremetal import registry
+from networking_mlnx_baremetal.ufmclient import breaker
 from networking_mlnx_baremetal.ufmclient import client
+from networking_mlnx_baremetal.ufmclient.modules.resources import pkey
+from networking_mlnx_baremetal.ufmclient import retry
+from networking_mlnx_baremetal.ufmclient import session
 
-UFM_CLIENT = None
 CONF = cfg.CONF
 config.register_opts(CONF)
 
+UFM_CLIENT_KEY = 'ufm'
+UFM_ASYNC_CLIENT_KEY = 'ufm.async'
 
-def get_client():
-    """Create an UFM REST API client instance.
 
+def get_client(physical_network=None):
+    """Get the UFM REST API client of the infiniband fabric of a physical
+    network.
+
+    Every fabric has its own client instance in this process, with its
+    own session, connection pool and circuit breaker. Requests of a
+    client fail over between the primary and standby UFMs of its fabric.
+
+    :param physical_network: the physical network of a segment, the
+        default endpoint is used if it is not mapped to a fabric.
+    :return: an UFM REST API client instance.
+    """
+    return get_endpoint_client(get_endpoint(physical_network))
+
+
+def get_endpoint_client(endpoint):
+    """Get the UFM REST API client of an UFM endpoint.
+
+    :param endpoint: the UFM REST API endpoint, or the primary and standby
+        endpoints separated by '|'
     :return: an UFM REST API client instance.
     """
-    global UFM_CLIENT
-    if not UFM_CLIENT:
-        conf = CONF[constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
-        verify_ca = conf.get('verify_ca', 'True')
-        if isinstance(verify_ca, str):
-            if not os.path.exists(verify_ca):
-                try:
-                    verify_ca = strutils.bool_from_string(verify_ca,
-                                                          strict=True)
-                except ValueError:
-                    option = ('[%s]/verify_ca' %
-                              constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME)
-                    details = _("The value should be a Boolean or a path "
-                                "to a ca file/directory.")
-                    raise exceptions.InvalidConfigValueException(
-                        details=details, option=option, value=verify_ca)
-        UFM_CLIENT = client.UfmClient(conf.endpoint, conf.username,
-                                      conf.password, verify_ca)
-
-    return UFM_CLIENT
+    return registry.REGISTRY.get((UFM_CLIENT_KEY, endpoint),
+                                 lambda: _create_client(endpoint))
+
+
+def get_async_client(physical_network=None):
+    """Get the background UFM REST API client of the infiniband fabric of
+    a physical network.
+
+    Its methods return futures, requests are sent by a bounded pool of
+    background workers of the fabric.
+
+    :param physical_network: the physical network of a segment, the
+        default endpoint is used if it is not mapped to a fabric.
+    :return: an async UFM REST API client instance.
+    """
+    return get_endpoint_async_client(get_endpoint(physical_network))
+
+
+def get_endpoint_async_client(endpoint):
+    """Get the background UFM REST API client of an UFM endpoint.
+
+    :param endpoint: the UFM REST API endpoint, or the primary and standby
+        endpoints separated by '|'
+    :return: an async UFM REST API client instance.
+    """
+    return registry.REGISTRY.get((UFM_ASYNC_CLIENT_KEY, endpoint),
+                                 lambda: _create_async_client(endpoint))
+
+
+def get_endpoint(physical_network=None):
+    """Return the endpoint of the UFM which manages the infiniband fabric
+    of a physical network.
+
+    :param physical_network: the physical network of a segment
+    :return: the UFM REST API endpoint, or the primary and standby
+        endpoints separated by '|'
+    """
+    conf = CONF[constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
+    fabric_endpoints = conf.fabric_endpoints
+    if physical_network and physical_network in fabric_endpoints:
+        return fabric_endpoints[physical_network]
+    return conf.endpoint
+
+
+def get_endpoints():
+    """Return the endpoints of all fabrics, the default one comes first.
+
+    :return: a list of UFM REST API endpoints, each one may list the
+        primary and standby endpoints of its fabric separated by '|'
+    """
+    conf = CONF[constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
+    endpoints = [conf.endpoint]
+    for endpoint in sorted(set(conf.fabric_endpoints.values())):
+        if endpoint not in endpoints:
+            endpoints.append(endpoint)
+    return endpoints
+
+
+def split_endpoints(endpoint):
+    """Split an endpoint option into the primary and standby UFMs.
+
+    :param endpoint: the endpoint option, UFM endpoints separated by '|'
+    :return: a list of UFM REST API endpoints, the primary first
+    """
+    return [value.strip() for value in endpoint.split('|') if value.strip()]
+
+
+def get_physical_networks(endpoint):
+    """Return the physical networks mapped to the fabric of an UFM.
+
+    :param endpoint: the UFM REST API endpoint
+    :return: sorted list of physical networks
+    """
+    conf = CONF[constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
+    return sorted(physnet for physnet, value in conf.fabric_endpoints.items()
+                  if value == endpoint)
+
+
+def _fabric_name(endpoint):
+    """Name of the fabric of an UFM used in metric names"""
+    conf = CONF[constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
+    physical_networks = get_physical_networks(endpoint)
+    if endpoint == conf.endpoint or not physical_networks:
+        return 'ufm'
+    return 'ufm.%s' % physical_networks[0]
+
+
+def _create_client(endpoint):
+    conf = CONF[constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
+    return client.UfmClient(
+        split_endpoints(endpoint), conf.username, conf.password,
+        _get_verify_ca(conf), pkey_replica_ttl=conf.pkey_replica_ttl,
+        pkey_replica_listener=functools.partial(_on_replica_event,
+                                                _fabric_name(endpoint)),
+        **_get_client_kwargs(conf, endpoint))
+
+
+def _create_async_client(endpoint):
+    conf = CONF[constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
+    # NOTE: pkeys deleted and guids changed in background must reach the
+    #  replica the blocking client skips redundant writes by.
+    return client.AsyncUfmClient(
+        split_endpoints(endpoint), conf.username, conf.password,
+        _get_verify_ca(conf), concurrency=conf.async_request_concurrency,
+        pkey_replica=get_endpoint_client(endpoint).pkey.replica,
+        **_get_client_kwargs(conf, endpoint))
+
+
+def _get_verify_ca(conf):
+    verify_ca = conf.get('verify_ca', 'True')
+    if isinstance(verify_ca, str):
+        if not os.path.exists(verify_ca):
+            try:
+                verify_ca = strutils.bool_from_string(verify_ca,
+                                                      strict=True)
+            except ValueError:
+                option = ('[%s]/verify_ca' %
+                          constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME)
+                details = _("The value should be a Boolean or a path "
+                            "to a ca file/directory.")
+                raise exceptions.InvalidConfigValueException(
+                    details=details, option=option, value=verify_ca)
+    return verify_ca
+
+
+def _get_client_kwargs(conf, endpoint):
+    """Options shared by the UFM clients of an endpoint"""
+    return dict(
+        timeout=conf.timeout, connect_timeout=conf.connect_timeout,
+        operation_timeouts=_get_operation_timeouts(conf),
+        chunk_size=conf.guids_chunk_size,
+        chunk_concurrency=conf.guids_chunk_concurrency,
+        pool_connections=conf.pool_connections,
+        pool_maxsize=conf.pool_maxsize,
+        pool_block=conf.pool_block,
+        pool_idle_timeout=conf.pool_idle_timeout,
+        response_cache_size=conf.response_cache_size,
+        probe_interval=conf.endpoint_probe_interval,
+        probe_timeout=conf.endpoint_probe_timeout,
+        failover_listener=_on_failover,
+        pool_listener=functools.partial(_on_pool_event,
+                                        _fabric_name(endpoint)),
+        breaker=get_breaker(_fabric_name(endpoint),
+                            session.BREAKER_FAILURES),
+        retry_policy=_get_retry_policy(conf))
+
+
+def get_breaker(name, failures):
+    """Create a circuit breaker of a service from driver configuration.
+
+    :param name: the service name, used in metric names
+    :param failures: exception classes which count as service failure
+    :return: a circuit breaker, or None if circuit breakers are disabled
+    """
+    conf = CONF[constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME]
+    if conf.circuit_breaker_threshold <= 0:
+        return None
+    return breaker.CircuitBreaker(
+        name, conf.circuit_breaker_threshold,
+        conf.circuit_breaker_reset_timeout,
+        half_open_requests=conf.circuit_breaker_half_open_requests,
+        failures=failures, listener=metrics.circuit_breaker_listener)
+
+
+def _get_retry_policy(conf):
+    if conf.retry_attempts <= 1:
+        return None
+    return retry.RetryPolicy(conf.retry_attempts, conf.retry_base_delay,
+                             conf.retry_max_delay, conf.retry_budget,
+                             listener=_on_retry)
+
+
+def _on_retry(method, url, attempt, error):
+    metrics.incr('ufm.retries')
+
+
+def _on_failover(method, url, endpoint):
+    metrics.incr('ufm.failovers')
+
+
+def _on_pool_event(fabric, name):
+    metrics.incr('%s.pool.%s' % (fabric, name))
+
+
+def _on_replica_event(fabric, name):
+    metrics.incr('%s.pkey_replica.%s' % (fabric, name))
+
+
+def _get_operation_timeouts(conf):
+    option = ('[%s]/operation_timeouts' %
+              constants.MLNX_BAREMETAL_DRIVER_GROUP_NAME)
+    timeouts = {}
+    for operation, value in (conf.operation_timeouts or {}).items():
+        if operation not in pkey.OPERATIONS:
+            details = _("Operation should be one of %s.") % ', '.join(
+                pkey.OPERATIONS)
+            raise exceptions.InvalidConfigValueException(
+                details=details, option=option, value=operation)
+        try:
+            timeouts[operation] = float(value)
+        except ValueError:
+            details = _("Timeout should be a number of seconds.")
+            raise exceptions.InvalidConfigValueException(
+                details=details, option=option, value=value)
+        if timeouts[operation] <= 0:
+            details = _("Timeout should be positive.")
+            raise exceptions.InvalidConfigValueException(
+                details=details, option=option, value=value)
+    return timeouts
@@ -0,0 +1,169 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import logging
+import threading
+import time
+
+from networking_mlnx_baremetal.ufmclient import exceptions
+
+LOG = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+"""numeric value of states, used as a gauge"""
+
+EVENT_REJECTED = 'rejected'
+
+
+class CircuitBreaker(object):
+    """Fail fast while a remote service keeps failing.
+
+    The breaker is closed at first and every call passes. After
+    ``failure_threshold`` consecutive failures it opens, and calls are
+    rejected with :class:`~.exceptions.CircuitOpenError` without touching
+    the remote service. Once ``reset_timeout`` seconds have passed, it is
+    half open and lets ``half_open_requests`` calls through as probes: a
+    successful probe closes the breaker, a failed one opens it again.
+
+    Only the exceptions in ``failures`` count as failures, any other
+    exception means the remote service did answer and counts as success.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout,
+                 half_open_requests=1, failures=(Exception,),
+                 listener=None):
+        """Initial a circuit breaker
+
+        :param name: name of the protected service, used in errors and
+            metrics
+        :param failure_threshold: count of consecutive failures which
+            opens the breaker
+        :param reset_timeout: seconds the breaker stays open before
+            probing the service again
+        :param half_open_requests: maximum count of concurrent probes
+            while half open
+        :param failures: exception classes which count as failure
+        :param listener: callable(breaker, event) called on every state
+            transition (event is the new state) and rejected call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_requests = max(1, half_open_requests)
+        self.failures = tuple(failures)
+        self._listener = listener
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probes = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def call(self, func, *args, **kwargs):
+        """Call a function through the breaker.
+
+        :param func: the function which talks to the remote service
+        :return: the result of the function
+        :raises: CircuitOpenError if the call is rejected
+        """
+        self._before()
+        try:
+            result = func(*args, **kwargs)
+        except exceptions.CircuitOpenError:
+            # NOTE: rejected by an inner breaker, it is not an answer of
+            #  the remote service.
+            self._release()
+            raise
+        except self.failures:
+            self._after(False)
+            raise
+        except Exception:
+            self._after(True)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        self._after(True)
+        return result
+
+    def _before(self):
+        events = []
+        retry_after = None
+        with self._lock:
+            if self._state == STATE_OPEN:
+                elapsed = time.time() - self._opened_at
+                if elapsed < self.reset_timeout:
+                    retry_after = self.reset_timeout - elapsed
+                else:
+                    self._transit(STATE_HALF_OPEN, events)
+            if self._state == STATE_HALF_OPEN:
+                if self._probes >= self.half_open_requests:
+                    # NOTE: probes are in flight, wait for their answer.
+                    retry_after = 0
+                else:
+                    self._probes += 1
+            if retry_after is not None:
+                events.append(EVENT_REJECTED)
+        self._notify(events)
+        if retry_after is not None:
+            raise exceptions.CircuitOpenError(name=self.name,
+                                              retry_after=retry_after)
+
+    def _after(self, success):
+        events = []
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            if success:
+                self._consecutive_failures = 0
+                if self._state != STATE_CLOSED:
+                    self._transit(STATE_CLOSED, events)
+            else:
+                self._consecutive_failures += 1
+                if (self._state == STATE_HALF_OPEN or (
+                        self._state == STATE_CLOSED and
+                        self._consecutive_failures >=
+                        self.failure_threshold)):
+                    self._opened_at = time.time()
+                    self._transit(STATE_OPEN, events)
+        self._notify(events)
+
+    def _release(self):
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def _transit(self, state, events):
+        LOG.warning('Circuit breaker of %(name)s changes from %(old)s to '
+                    '%(new)s.', {'name': self.name, 'old': self._state,
+                                 'new': state})
+        self._state = state
+        self._probes = 0
+        events.append(state)
+
+    def _notify(self, events):
+        if self._listener is None:
+            return
+        for event in events:
+            try:
+                self._listener(self, event)
+            except Exception:
+                LOG.exception('Failed to notify circuit breaker event.')
@@ -0,0 +1,89 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import collections
+import hashlib
+import threading
+
+CachedResponse = collections.namedtuple(
+    'CachedResponse', ['etag', 'last_modified', 'digest', 'value'])
+"""a parsed response body with its validators and content digest"""
+
+
+def digest(content):
+    """Return the digest of a response body, used to detect changes
+
+    :param content: the response body, bytes
+    """
+    return hashlib.sha1(content).hexdigest()
+
+
+class ResponseCache(object):
+    """LRU cache of parsed UFM GET responses, keyed by url.
+
+    Validators of a cached response (ETag, Last-Modified) are sent with the
+    next GET of its url, UFM answers 304 if it has not changed. If UFM does
+    not send validators, the digest of the new body is compared with the
+    cached one instead, which still skips decoding the body.
+
+    Cached values are shared by all callers, they must not be changed.
+    """
+
+    def __init__(self, size):
+        """Initial a response cache
+
+        :param size: maximum count of cached urls
+        """
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+
+    def get(self, url):
+        """Return the cached response of url, or None"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                # NOTE: move to the end, the least recently used is first.
+                del self._entries[url]
+                self._entries[url] = entry
+            return entry
+
+    def put(self, url, entry):
+        with self._lock:
+            self._entries.pop(url, None)
+            self._entries[url] = entry
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def as_dict(self):
+        """Return cache counters
+
+        :return: a dict contains count of responses answered 304 by UFM,
+            count of bodies found unchanged by digest and count of bodies
+            which changed (or were not cached)
+        """
+        with self._lock:
+            return {'not_modified': self.not_modified,
+                    'unchanged': self.unchanged, 'changed': self.changed,
+                    'entries': len(self._entries)}
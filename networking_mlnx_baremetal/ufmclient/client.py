@@ -12,13 +12,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 from networking_mlnx_baremetal.ufmclient.modules.resources import pkey
+from networking_mlnx_baremetal.ufmclient.session import AsyncUfmSession
 from networking_mlnx_baremetal.ufmclient.session import UfmSession
 
 
 class UfmClient(object):
     """UFM API Client"""
 
-    def __init__(self, endpoint, username, password, verify_ca, timeout=None):
+    def __init__(self, endpoint, username, password, verify_ca, timeout=None,
+                 pkey_replica_ttl=None, operation_timeouts=None,
+                 chunk_size=None, chunk_concurrency=1,
+                 pkey_replica_listener=None, **session_kwargs):
         self._endpoint = endpoint
         self._username = username
         self._password = password
@@ -26,9 +30,13 @@ class UfmClient(object):
 
         # initialize request session
         self._session = UfmSession(endpoint, username, password, verify_ca,
-                                   timeout=timeout)
+                                   timeout=timeout, **session_kwargs)
         # initialize UFM PKey resource client
-        self._pkey = pkey.PKeyResourceClient(self._session, ufm_client=self)
+        self._pkey = pkey.PKeyResourceClient(
+            self._session, ufm_client=self, replica_ttl=pkey_replica_ttl,
+            operation_timeouts=operation_timeouts, chunk_size=chunk_size,
+            chunk_concurrency=chunk_concurrency,
+            replica_listener=pkey_replica_listener)
 
     @property
     def pkey(self):
@@ -37,3 +45,51 @@ class UfmClient(object):
         :return: UFM PKey resource client
         """
         return self._pkey
+
+    @property
+    def session(self):
+        """reference to the UFM REST API session"""
+        return self._session
+
+
+class AsyncUfmClient(object):
+    """UFM API Client whose resource methods return futures"""
+
+    def __init__(self, endpoint, username, password, verify_ca, timeout=None,
+                 concurrency=None, operation_timeouts=None,
+                 chunk_size=None, chunk_concurrency=1, pkey_replica=None,
+                 **session_kwargs):
+        self._endpoint = endpoint
+        self._username = username
+        self._password = password
+        self._verify_ca = verify_ca
+
+        # initialize async request session
+        self._session = AsyncUfmSession(endpoint, username, password,
+                                        verify_ca, timeout=timeout,
+                                        concurrency=concurrency,
+                                        **session_kwargs)
+        # initialize async UFM PKey resource client
+        # NOTE: the pkey replica is shared with the blocking client of the
+        #  same UFM, so that both see the writes of each other.
+        self._pkey = pkey.AsyncPKeyResourceClient(
+            self._session, ufm_client=self,
+            operation_timeouts=operation_timeouts, chunk_size=chunk_size,
+            chunk_concurrency=chunk_concurrency, replica=pkey_replica)
+
+    @property
+    def pkey(self):
+        """reference to async UFM PKey resource client
+
+        :return: async UFM PKey resource client
+        """
+        return self._pkey
+
+    @property
+    def session(self):
+        """reference to the async UFM REST API session"""
+        return self._session
+
+    def close(self, wait=True):
+        """Stop background workers of this client"""
+        self._session.close(wait=wait)
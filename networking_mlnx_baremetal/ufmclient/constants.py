@@ -38,5 +38,10 @@ DELETE = 'DELETE'
 HEADER_CONTENT_TYPE = 'Content-Type'
 """Redfish API HTTP header 'Content-Type'"""
 
+HEADER_ETAG = 'ETag'
+HEADER_LAST_MODIFIED = 'Last-Modified'
+HEADER_IF_NONE_MATCH = 'If-None-Match'
+HEADER_IF_MODIFIED_SINCE = 'If-Modified-Since'
+
 MLNX_INFINIBAND_CLIENT_ID_PREFIX = 'ff:00:00:00:00:00:02:00:00:02:c9:00:'
 IRONIC_IB_PORT_CLIENT_ID_LEN = 59
@@ -0,0 +1,194 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Primary and standby UFM endpoints of a fabric and their health.
+
+Requests go to the healthy endpoint with the lowest probe latency, the
+configured order breaks ties, so the primary is used as long as nothing
+is known about the others. An endpoint is marked unhealthy by a failed
+request or probe, and healthy again by a successful one. Endpoints are
+re-ordered only when their health or latency changes, a request just
+reads the current order.
+"""
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+PROBE_PATH = '/ufmRest/app/ufm_version'
+"""cheap UFM REST API resource requested by health probes"""
+
+_INFINITY = float('inf')
+
+# NOTE: latencies closer than this are equal when ranking endpoints, the
+#  configured order decides then, so requests do not flap between two
+#  equally fast UFMs.
+_LATENCY_RESOLUTION = 0.01
+
+
+class Endpoint(object):
+    """An UFM endpoint and its health"""
+
+    __slots__ = ('url', 'base_url', 'index', 'healthy', 'latency',
+                 'failures', 'checked_at')
+
+    def __init__(self, url, index):
+        """Initial an UFM endpoint
+
+        :param url: the UFM REST API endpoint
+        :param index: position of the endpoint in configured order
+        """
+        self.url = url.rstrip('/')
+        self.base_url = '%s/ufmRest' % self.url
+        self.index = index
+        self.healthy = True
+        # NOTE: moving average of probe latencies in seconds, None until
+        #  the endpoint has been probed.
+        self.latency = None
+        self.failures = 0
+        self.checked_at = None
+
+    def as_dict(self):
+        return {'url': self.url, 'healthy': self.healthy,
+                'latency': self.latency, 'failures': self.failures}
+
+    def __repr__(self):
+        return self.url
+
+
+class EndpointSet(object):
+    """Ordered UFM endpoints with health probed in background"""
+
+    def __init__(self, urls, probe=None, interval=0, smoothing=0.3):
+        """Initial an UFM endpoint set
+
+        :param urls: UFM REST API endpoints, the primary first
+        :param probe: callable(endpoint) returns the seconds UFM took to
+            answer a probe, raises if the endpoint is unavailable
+        :param interval: seconds between two probes of every endpoint,
+            endpoints are only checked by requests if it is not positive
+        :param smoothing: weight of a new latency in the moving average
+        """
+        if not urls:
+            raise ValueError('At least one UFM endpoint is required.')
+        self.endpoints = [Endpoint(url, index)
+                          for index, url in enumerate(urls)]
+        self.interval = interval
+        self.smoothing = smoothing
+        self._probe = probe
+        self._lock = threading.Lock()
+        self._order = list(self.endpoints)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def primary(self):
+        """The endpoint requests are sent to first"""
+        return self._order[0]
+
+    def candidates(self):
+        """Return endpoints in the order requests should try them
+
+        :return: healthy endpoints by latency, then unhealthy ones
+        """
+        return self._order
+
+    def succeeded(self, endpoint):
+        """Record a request answered by an endpoint"""
+        if endpoint.healthy:
+            return
+        with self._lock:
+            self._mark(endpoint, True)
+
+    def failed(self, endpoint, error):
+        """Record a request or probe an endpoint failed to answer
+
+        :param endpoint: the failed endpoint
+        :param error: the error of the request
+        """
+        with self._lock:
+            endpoint.failures += 1
+            if endpoint.healthy:
+                LOG.warning('UFM endpoint %(url)s is unavailable, error: '
+                            '%(error)s', {'url': endpoint.url,
+                                          'error': error})
+            self._mark(endpoint, False)
+
+    def observe(self, endpoint, latency):
+        """Record the latency of a successful probe of an endpoint"""
+        with self._lock:
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += self.smoothing * (latency -
+                                                      endpoint.latency)
+            endpoint.checked_at = time.time()
+            self._mark(endpoint, True)
+
+    def _mark(self, endpoint, healthy):
+        if healthy and not endpoint.healthy:
+            LOG.info('UFM endpoint %s is available again.', endpoint.url)
+            endpoint.failures = 0
+        endpoint.healthy = healthy
+        primary = self._order[0]
+        self._order = sorted(self.endpoints, key=self._rank)
+        if self._order[0] is not primary:
+            LOG.warning('UFM requests switch from %(old)s to %(new)s.',
+                        {'old': primary.url, 'new': self._order[0].url})
+
+    @staticmethod
+    def _rank(endpoint):
+        if not endpoint.healthy:
+            return 1, 0, endpoint.index
+        latency = endpoint.latency
+        if latency is None:
+            return 0, _INFINITY, endpoint.index
+        return 0, int(latency / _LATENCY_RESOLUTION), endpoint.index
+
+    def probe_all(self):
+        """Probe every endpoint once"""
+        for endpoint in self.endpoints:
+            try:
+                latency = self._probe(endpoint)
+            except Exception as e:
+                self.failed(endpoint, e)
+            else:
+                self.observe(endpoint, latency)
+
+    def start(self):
+        """Keep probing endpoints in a background thread.
+
+        Nothing is probed when there is a single endpoint, it is used
+        whatever its health is.
+        """
+        if (self._thread is not None or self._probe is None
+                or self.interval <= 0 or len(self.endpoints) < 2):
+            return
+        self._thread = threading.Thread(target=self._run,
+                                        name='ufm-endpoint-probe')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.probe_all()
+            self._stopped.wait(self.interval)
+
+    def as_list(self):
+        """Return the health of endpoints in configured order"""
+        with self._lock:
+            return [endpoint.as_dict() for endpoint in self.endpoints]
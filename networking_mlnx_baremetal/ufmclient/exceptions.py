@@ -18,6 +18,8 @@ import logging
 
 from six.moves import http_client
 
+from networking_mlnx_baremetal.ufmclient import logutils
+
 LOG = logging.getLogger(__name__)
 
 
@@ -44,6 +46,29 @@ class UfmConnectionError(UfmClientError):
     message = 'Unable to connect to %(url)s. Error: %(error)s'
 
 
+class UfmDeadlineExceeded(UfmClientError):
+    message = ('Deadline of %(operation)s exceeded, it should complete in '
+               '%(timeout)s seconds')
+
+
+class CircuitOpenError(UfmClientError):
+    message = ('Circuit breaker of %(name)s is open, requests are rejected '
+               'for %(retry_after).1f seconds')
+
+
+class PartialFailureError(UfmClientError):
+    """Some chunks of a request split into chunks failed"""
+
+    message = ('%(failed)d of %(total)d guids failed in %(operation)s of '
+               'partition key %(pkey)s. First error: %(error)s')
+
+    def __init__(self, operation, pkey, result):
+        self.result = result
+        super(PartialFailureError, self).__init__(
+            operation=operation, pkey=pkey, failed=len(result.failed),
+            total=result.total, error=result.errors[0])
+
+
 class ArchiveParsingError(UfmClientError):
     message = 'Failed parsing archive "%(path)s": %(error)s'
 
@@ -61,9 +86,9 @@ class UfmHttpRequestError(UfmClientError):
         kwargs = {'url': url,
                   'method': method,
                   'code': self.status_code,
-                  'error': response.content}
-        LOG.info(('HTTP response for %(method)s %(url)s -> '
-                  'status code: %(code)s, error: %(error)s'), kwargs)
+                  'error': str(logutils.truncated(response.content))}
+        LOG.debug(('HTTP response for %(method)s %(url)s -> '
+                   'status code: %(code)s, error: %(error)s'), kwargs)
         super(UfmHttpRequestError, self).__init__(**kwargs)
 
 
@@ -0,0 +1,275 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Compact InfiniBand GUID representation.
+
+A GUID is 64 bits, it is kept as an integer instead of a 16 characters
+string: it hashes and compares faster and takes less memory. Client-ids
+are decoded in bulk into an ``array('Q')`` of 8 bytes per GUID.
+
+Accepted forms are:
+
+* Ironic port client-id,
+  ``ff:00:00:00:00:00:02:00:00:02:c9:00:04:bd:70:03:00:37:44:86``
+* colon separated GUID, ``04:bd:70:03:00:37:44:86``
+* bare hexadecimal GUID, ``04bd700300374486`` or ``0x4bd700300374486``
+"""
+import array
+import binascii
+import sys
+
+import six
+
+from networking_mlnx_baremetal.ufmclient import constants
+
+GUID_LEN = 16
+"""hexadecimal characters of a formatted GUID"""
+
+_MAX = (1 << 64) - 1
+_CLIENT_ID_GUID_LEN = 23
+"""characters of the colon separated GUID at the end of a client-id"""
+
+
+class Guid(int):
+    """A 64 bits InfiniBand GUID"""
+
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, value):
+        """Parse a client-id, colon separated or bare GUID.
+
+        :param value: the GUID in any accepted form, or an integer
+        :return: a :class:`Guid`
+        :raises: ValueError if value is not a GUID
+        """
+        return cls(parse(value))
+
+    def __str__(self):
+        return '%0*x' % (GUID_LEN, self)
+
+    def __repr__(self):
+        return 'Guid(%s)' % self
+
+    def colon(self):
+        """Format as colon separated octets, like ``04:bd:70:...``"""
+        text = str(self)
+        return ':'.join(text[i:i + 2] for i in range(0, GUID_LEN, 2))
+
+
+def parse(value):
+    """Parse a GUID in any accepted form to an integer.
+
+    :param value: the GUID in any accepted form, or an integer
+    :return: the GUID as an integer
+    :raises: ValueError if value is not a GUID
+    """
+    if isinstance(value, six.integer_types):
+        guid = value
+    elif len(value) == constants.IRONIC_IB_PORT_CLIENT_ID_LEN:
+        guid = int(value[-_CLIENT_ID_GUID_LEN:].replace(':', ''), 16)
+    elif ':' in value:
+        guid = int(value.replace(':', ''), 16)
+    else:
+        guid = int(value, 16)
+    if not 0 <= guid <= _MAX:
+        raise ValueError('%r is not a 64 bits GUID' % (value,))
+    return guid
+
+
+def _unhexlify_all(guids):
+    """Decode colon separated GUIDs to a native ``array('Q')`` at once.
+
+    :param guids: list of colon separated GUIDs
+    :return: the array, or None if any GUID is malformed
+    """
+    text = ':'.join(guids)
+    # NOTE: every third character is a colon if all GUIDs are well formed.
+    if (len(text) != len(guids) * (_CLIENT_ID_GUID_LEN + 1) - 1
+            or text[2::3].strip(':')):
+        return None
+    try:
+        raw = binascii.unhexlify(text.replace(':', ''))
+    except (TypeError, ValueError):
+        return None
+    result = array.array('Q')
+    if six.PY2:
+        result.fromstring(raw)
+    else:
+        result.frombytes(raw)
+    if sys.byteorder == 'little':
+        result.byteswap()
+    return result
+
+
+def parse_all(values):
+    """Parse GUIDs in any accepted form in bulk.
+
+    Client-ids, which are most of the input, are decoded all at once.
+
+    :param values: iterable of GUIDs
+    :return: sequence of GUIDs as integers, in the same order
+    :raises: ValueError if any value is not a GUID
+    """
+    values = values if isinstance(values, list) else list(values)
+    client_id_len = constants.IRONIC_IB_PORT_CLIENT_ID_LEN
+    start = -_CLIENT_ID_GUID_LEN
+    try:
+        guids = [value[start:] for value in values
+                 if len(value) == client_id_len]
+    except TypeError:
+        guids = None
+    if guids is not None and len(guids) == len(values):
+        result = _unhexlify_all(guids)
+        if result is not None:
+            return result
+    return [parse(value) for value in values]
+
+
+def format_all(guids):
+    """Format integer GUIDs as UFM does, 16 lower case hex characters.
+
+    :param guids: iterable of GUIDs as integers
+    :return: list of formatted GUIDs
+    """
+    return ['%016x' % guid for guid in guids]
+
+
+def normalize_all(values):
+    """Convert GUIDs in any accepted form to the form UFM expects.
+
+    Values which are not GUIDs are passed through unchanged, UFM reports
+    them.
+
+    :param values: iterable of GUIDs
+    :return: list of formatted GUIDs, in the same order
+    """
+    values = list(values)
+    try:
+        return format_all(parse_all(values))
+    except (ValueError, TypeError):
+        result = []
+        for value in values:
+            try:
+                result.append('%016x' % parse(value))
+            except (ValueError, TypeError):
+                result.append(value)
+        return result
+
+
+class GuidSet(object):
+    """Immutable set of GUIDs backed by a ``frozenset`` of integers.
+
+    Set operations run on the built-in sets of both operands without
+    converting them, GUIDs are only sorted when they are iterated or
+    formatted.
+    """
+
+    __slots__ = ('_guids',)
+
+    def __init__(self, guids=(), strict=True):
+        """Initial a GUID set
+
+        :param guids: iterable of GUIDs in any accepted form
+        :param strict: raise ValueError for values which are not GUIDs if
+            true, else skip them
+        """
+        if isinstance(guids, GuidSet):
+            self._guids = guids._guids
+            return
+        guids = guids if isinstance(guids, list) else list(guids)
+        try:
+            ints = parse_all(guids)
+        except (ValueError, TypeError):
+            if strict:
+                raise
+            ints = []
+            for value in guids:
+                try:
+                    ints.append(parse(value))
+                except (ValueError, TypeError):
+                    pass
+        self._guids = frozenset(ints)
+
+    @classmethod
+    def from_ints(cls, ints):
+        """Create a GUID set from integer GUIDs, like an ``array('Q')``
+
+        :param ints: iterable of GUIDs as integers
+        """
+        return cls._from_ints(frozenset(ints))
+
+    @classmethod
+    def _from_ints(cls, ints):
+        result = cls.__new__(cls)
+        result._guids = ints
+        return result
+
+    @staticmethod
+    def _ints(other):
+        if isinstance(other, GuidSet):
+            return other._guids
+        return parse_all(other)
+
+    def __len__(self):
+        return len(self._guids)
+
+    def __bool__(self):
+        return len(self._guids) > 0
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        return (Guid(guid) for guid in sorted(self._guids))
+
+    def __contains__(self, value):
+        try:
+            return parse(value) in self._guids
+        except (ValueError, TypeError):
+            return False
+
+    def __eq__(self, other):
+        if isinstance(other, GuidSet):
+            return self._guids == other._guids
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'GuidSet(%d guids)' % len(self)
+
+    def __and__(self, other):
+        return self._from_ints(self._guids.intersection(self._ints(other)))
+
+    def __or__(self, other):
+        return self._from_ints(self._guids.union(self._ints(other)))
+
+    def __sub__(self, other):
+        return self._from_ints(self._guids.difference(self._ints(other)))
+
+    def __xor__(self, other):
+        return self._from_ints(self._guids.symmetric_difference(
+            self._ints(other)))
+
+    intersection = __and__
+    union = __or__
+    difference = __sub__
+    symmetric_difference = __xor__
+
+    def formatted(self):
+        """Return the GUIDs formatted as UFM does, in ascending order."""
+        return format_all(sorted(self._guids))
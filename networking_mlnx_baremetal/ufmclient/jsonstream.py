@@ -0,0 +1,164 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Incremental parsing of large UFM JSON documents.
+
+A document is read from an iterable of byte chunks (like
+``Response.iter_content``), only the current chunk and the JSON value
+being decoded are held in memory. Containers are walked token by token,
+their small leaf values are decoded by :meth:`json.JSONDecoder.raw_decode`.
+"""
+import codecs
+import json
+import re
+
+import six
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# NOTE: characters which may go on a number, like '.25' after '3'.
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+
+# NOTE: consumed text is dropped once it is larger than this, so the
+#  buffer does not grow with the document.
+_COMPACT_SIZE = 64 * 1024
+
+
+class JsonStreamError(ValueError):
+    """The document is malformed or truncated"""
+
+
+class JsonReader(object):
+    """Read JSON tokens and values from a stream of byte chunks"""
+
+    def __init__(self, chunks, encoding='utf-8'):
+        """Initial a JSON reader
+
+        :param chunks: iterable of bytes (or text) chunks of the document
+        :param encoding: encoding of bytes chunks
+        """
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Read one more chunk, return False at the end of document"""
+        if self._eof:
+            return False
+        if self._pos > _COMPACT_SIZE:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._decoder.decode(chunk)
+            if chunk:
+                self._buffer += chunk
+                return True
+        self._buffer += self._decoder.decode(b'', final=True)
+        self._eof = True
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it
+
+        :return: the character, or None at the end of document
+        """
+        while True:
+            buffer = self._buffer
+            pos = self._pos = _WHITESPACE.match(buffer, self._pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return None
+
+    def next_char(self, expected=None):
+        """Consume the next non-whitespace character
+
+        :param expected: the characters which may come next, any
+            character if not set
+        :return: the character
+        :raises: JsonStreamError if the character is not expected
+        """
+        char = self.peek()
+        if char is None or (expected is not None and char not in expected):
+            raise JsonStreamError('Expected %r at offset %d, got %r'
+                                  % (expected, self._pos, char))
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode and consume the next JSON value
+
+        :return: the decoded value
+        :raises: JsonStreamError if the document is malformed or truncated
+        """
+        self.peek()
+        while True:
+            buffer = self._buffer
+            try:
+                value, end = self._json.raw_decode(buffer, self._pos)
+            except ValueError as e:
+                if self._fill():
+                    continue
+                raise JsonStreamError(str(e))
+            # NOTE: a number which ends with the buffer may go on in the
+            #  next chunk, even if its decoded part stops before the end,
+            #  like '1' of '1e'.
+            if (not self._eof and
+                    _NUMBER_TAIL.match(buffer, end).end() == len(buffer)):
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+    def items(self):
+        """Iterate on the members of the object which comes next.
+
+        Every member value has to be consumed (by :meth:`value`,
+        :meth:`items` or :meth:`elements`) before the next member is
+        yielded.
+
+        :return: an iterator of member keys
+        """
+        self.next_char('{')
+        if self.peek() == '}':
+            self.next_char()
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, six.string_types):
+                raise JsonStreamError('Expected a string key at offset %d, '
+                                      'got %r' % (self._pos, key))
+            self.next_char(':')
+            yield key
+            if self.next_char(',}') == '}':
+                return
+
+    def elements(self):
+        """Iterate on the elements of the array which comes next
+
+        Elements are decoded by :meth:`value`, so each of them should be
+        small.
+
+        :return: an iterator of decoded elements
+        """
+        self.next_char('[')
+        if self.peek() == ']':
+            self.next_char()
+            return
+        while True:
+            yield self.value()
+            if self.next_char(',]') == ']':
+                return
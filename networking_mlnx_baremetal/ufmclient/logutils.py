@@ -0,0 +1,98 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Cheap logging of large values.
+
+Values are wrapped in :class:`Truncated` and passed as log arguments,
+they are only formatted when a handler emits the record, that is when
+the log level is enabled, and their text is capped at a maximum length.
+Response bodies are decoded from their first bytes only, containers are
+formatted by a size limited ``reprlib`` instead of ``repr``.
+
+Example::
+
+    LOG.debug('UFM response: %s', logutils.truncated(response.content))
+"""
+import six
+from six.moves import reprlib
+
+DEFAULT_MAX_LENGTH = 1024
+"""characters of a formatted value kept by default"""
+
+_max_length = DEFAULT_MAX_LENGTH
+
+_REPR = reprlib.Repr()
+_REPR.maxlevel = 4
+_REPR.maxdict = _REPR.maxlist = _REPR.maxtuple = 16
+_REPR.maxset = _REPR.maxfrozenset = 16
+_REPR.maxstring = _REPR.maxother = 256
+
+
+def set_max_length(max_length):
+    """Set the characters of a formatted value kept by default
+
+    :param max_length: maximum characters, values are not truncated if
+        it is not positive
+    """
+    global _max_length
+    _max_length = max_length
+
+
+class Truncated(object):
+    """Log argument which formats a value lazily and truncates it"""
+
+    __slots__ = ('value', 'max_length')
+
+    def __init__(self, value, max_length=None):
+        """Wrap a value to log
+
+        :param value: bytes, text or any object
+        :param max_length: maximum characters of the formatted value, the
+            default set by :func:`set_max_length` if not set
+        """
+        self.value = value
+        self.max_length = max_length
+
+    def __str__(self):
+        value = self.value
+        limit = self.max_length
+        if limit is None:
+            limit = _max_length
+        if isinstance(value, six.binary_type):
+            size = len(value)
+            if limit > 0:
+                value = value[:limit]
+            text = value.decode('utf-8', 'replace')
+        elif isinstance(value, six.string_types):
+            size = len(value)
+            text = value
+        else:
+            text = _REPR.repr(value) if limit > 0 else repr(value)
+            size = len(text)
+        if 0 < limit < size:
+            return '%s...(%d of %d)' % (text[:limit], limit, size)
+        return text
+
+    __unicode__ = __str__
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def truncated(value, max_length=None):
+    """Return a lazy, truncated log argument of a value
+
+    :param value: bytes, text or any object
+    :param max_length: maximum characters of the formatted value
+    """
+    return Truncated(value, max_length)
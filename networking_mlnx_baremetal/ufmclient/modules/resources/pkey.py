@@ -13,34 +13,601 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import logging
+import os
+import threading
+import time
+
+import futurist
+from futurist import waiters
+import six
+
+from networking_mlnx_baremetal.ufmclient import exceptions
+from networking_mlnx_baremetal.ufmclient import guid as ib_guid
+from networking_mlnx_baremetal.ufmclient import jsonstream
 from networking_mlnx_baremetal.ufmclient.modules import base
 from networking_mlnx_baremetal.ufmclient import utils
 
+LOG = logging.getLogger(__name__)
+
+FULL_MEMBERSHIP = 'full'
+LIMITED_MEMBERSHIP = 'limited'
+
+OP_LIST = 'list'
+OP_GET = 'get'
+OP_UPDATE = 'update'
+OP_ADD = 'add'
+OP_REMOVE = 'remove'
+OP_DELETE = 'delete'
+OPERATIONS = (OP_LIST, OP_GET, OP_UPDATE, OP_ADD, OP_REMOVE, OP_DELETE)
+"""operations which may have their own timeout"""
+
+STREAM_CHUNK_SIZE = 64 * 1024
+"""bytes read at once from a streamed pkey listing"""
+
+
+_MEMBERSHIPS = {FULL_MEMBERSHIP: FULL_MEMBERSHIP,
+                LIMITED_MEMBERSHIP: LIMITED_MEMBERSHIP}
+
+
+def _membership(full_membership):
+    return FULL_MEMBERSHIP if full_membership else LIMITED_MEMBERSHIP
+
+
+class ChunkedResult(object):
+    """Aggregated outcome of a guid request split into chunks"""
+
+    def __init__(self):
+        self.chunks = 0
+        self.succeeded = []
+        # [(guids, error)] of failed chunks
+        self.failures = []
+
+    def add_success(self, guids):
+        self.chunks += 1
+        self.succeeded.extend(guids)
+
+    def add_failure(self, guids, error):
+        self.chunks += 1
+        self.failures.append((guids, error))
+
+    @property
+    def failed(self):
+        """guids of failed chunks"""
+        return [guid for guids, _error in self.failures for guid in guids]
+
+    @property
+    def errors(self):
+        """errors of failed chunks"""
+        return [error for _guids, error in self.failures]
+
+    @property
+    def total(self):
+        return len(self.succeeded) + len(self.failed)
+
+    @property
+    def ok(self):
+        return not self.failures
+
+
+class _Deadline(object):
+    """Deadline shared by all requests of one call"""
+
+    def __init__(self, operation, timeout):
+        """Initial a deadline
+
+        :param operation: the operation name, used in errors
+        :param timeout: timeout in seconds of the whole call, no deadline
+            if not set
+        """
+        self.operation = operation
+        self.timeout = timeout
+        self._at = time.time() + timeout if timeout else None
+
+    def remaining(self):
+        """Return the timeout of the next request of the call
+
+        :return: seconds left, or None if there is no deadline
+        :raises: UfmDeadlineExceeded if the deadline has passed
+        """
+        if self._at is None:
+            return None
+        remaining = self._at - time.time()
+        if remaining <= 0:
+            raise exceptions.UfmDeadlineExceeded(operation=self.operation,
+                                                 timeout=self.timeout)
+        return remaining
+
+
+class PKeyReplica(object):
+    """Local replica of UFM PKey membership
+
+    The replica is loaded from a pkey listing with guids and updated after
+    each successful write, so writes which would not change UFM can be
+    skipped. It expires after ttl seconds (and after any failed write) and
+    has to be loaded again, changes made to UFM by others are picked up
+    then.
+
+    Every process has its own replica, which does not see the writes of
+    other processes, so it only tells which writes may be redundant: the
+    members of the pkey are confirmed with UFM before a write is skipped,
+    see :meth:`confirm`.
+
+    Writes made while a listing is being loaded are recorded and applied
+    again on top of the listing, which may have been taken before them.
+    """
+
+    def __init__(self, ttl, listener=None):
+        """Initial a PKey membership replica
+
+        :param ttl: seconds the replica stays fresh after a load
+        :param listener: callable(name) called every time one of the
+            counters of :meth:`stats` is increased
+        """
+        self._ttl = ttl
+        self._listener = listener
+        self._lock = threading.Lock()
+        # pkey(int) -> {guid(int): membership}
+        self._pkeys = {}
+        self._loaded_at = None
+        self._writes_at_load = 0
+        # NOTE: pid of the process loading the replica, and writes made
+        #  since the load started.
+        self._loading_pid = None
+        self._journal = None
+        self.loads = 0
+        self.writes = 0
+        self.avoided_writes = 0
+        self.confirmations = 0
+
+    @staticmethod
+    def _pkey(pkey):
+        if isinstance(pkey, six.integer_types):
+            return pkey
+        return int(pkey, 16)
+
+    @staticmethod
+    def _guid(guid):
+        # NOTE: guids are kept as integers, they hash faster and take less
+        #  memory than strings.
+        try:
+            return ib_guid.parse(guid)
+        except (ValueError, TypeError):
+            return utils.mlnx_ib_client_id_to_guid(guid).lower()
+
+    @property
+    def expired(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.time() - loaded_at > self._ttl
+
+    def start_load(self):
+        """Mark a load of the replica in progress.
+
+        :return: False if another load is already in progress in this
+            process, the caller should not load the replica then.
+        """
+        pid = os.getpid()
+        with self._lock:
+            if self._loading_pid == pid:
+                return False
+            self._loading_pid = pid
+            self._journal = []
+            return True
+
+    def end_load(self):
+        with self._lock:
+            self._loading_pid = None
+            self._journal = None
+
+    def load(self, listing):
+        """Replace the replica with a pkey listing with guids
+
+        :param listing: the response of pkey listing with guids data
+        """
+        pkeys = dict((self._pkey(pkey), self._members(data))
+                     for pkey, data in (listing or {}).items())
+        with self._lock:
+            for change, args in self._journal or ():
+                change(pkeys, *args)
+            self._pkeys = pkeys
+            self._loaded_at = time.time()
+            self._writes_at_load = self.writes
+            self.loads += 1
+        self._notify('loads')
+
+    def _members(self, data):
+        """Parse the members of a pkey of UFM to guid -> membership"""
+        members = {}
+        for member in (data or {}).get('guids') or []:
+            if isinstance(member, dict):
+                guid = member.get('guid')
+                membership = member.get('membership', FULL_MEMBERSHIP)
+                membership = _MEMBERSHIPS.get(membership, membership)
+            else:
+                guid, membership = member, FULL_MEMBERSHIP
+            if guid:
+                members[self._guid(guid)] = membership
+        return members
+
+    def confirm(self, pkey, data):
+        """Replace the members of a pkey with those just read from UFM
+
+        :param pkey: the pkey
+        :param data: the response of getting the pkey with guids data, None
+            if the pkey does not exist
+        """
+        members = self._members(data) if data is not None else None
+        with self._lock:
+            change = _set_members
+            args = (self._pkey(pkey), members)
+            change(self._pkeys, *args)
+            if self._journal is not None:
+                self._journal.append((change, args))
+            self.confirmations += 1
+        self._notify('confirmations')
+
+    def refresh(self, listing, changed=True):
+        """Load a pkey listing with guids unless nothing has changed
+
+        The replica is only marked fresh if the listing has not changed
+        since it was loaded, and the replica has been neither written nor
+        invalidated since.
+
+        :param listing: the response of pkey listing with guids data
+        :param changed: whether the listing changed since the last one
+        """
+        with self._lock:
+            if (not changed and self._loaded_at is not None
+                    and self._writes_at_load == self.writes):
+                self._loaded_at = time.time()
+                return
+        self.load(listing)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def missing(self, pkey, guids, membership):
+        """Return guids which are not members of a pkey with membership"""
+        with self._lock:
+            members = self._pkeys.get(self._pkey(pkey), {})
+            return [guid for guid in guids
+                    if members.get(self._guid(guid)) != membership]
+
+    def present(self, pkey, guids):
+        """Return guids which are members of a pkey"""
+        with self._lock:
+            members = self._pkeys.get(self._pkey(pkey), {})
+            return [guid for guid in guids if self._guid(guid) in members]
+
+    def equals(self, pkey, guids, membership):
+        """Return whether a pkey has exactly these members"""
+        with self._lock:
+            members = self._pkeys.get(self._pkey(pkey))
+            if members is None:
+                return False
+            expected = dict((self._guid(guid), membership) for guid in guids)
+            return members == expected
+
+    def add(self, pkey, guids, membership):
+        self._write(_add_members, self._pkey(pkey),
+                    [self._guid(guid) for guid in guids], membership)
+
+    def remove(self, pkey, guids):
+        self._write(_remove_members, self._pkey(pkey),
+                    [self._guid(guid) for guid in guids])
+
+    def replace(self, pkey, guids, membership):
+        self._write(_replace_members, self._pkey(pkey),
+                    [self._guid(guid) for guid in guids], membership)
+
+    def drop(self, pkey):
+        self._write(_drop_pkey, self._pkey(pkey))
+
+    def _write(self, change, *args):
+        with self._lock:
+            change(self._pkeys, *args)
+            if self._journal is not None:
+                self._journal.append((change, args))
+            self.writes += 1
+        self._notify('writes')
+
+    def avoided(self):
+        with self._lock:
+            self.avoided_writes += 1
+        self._notify('avoided_writes')
+
+    def _notify(self, name):
+        if self._listener is not None:
+            self._listener(name)
+
+    def stats(self):
+        """Return replica counters
+
+        :return: a dict contains count of loads, UFM writes sent, UFM
+            writes avoided and pkeys confirmed with UFM
+        """
+        with self._lock:
+            return {'loads': self.loads, 'writes': self.writes,
+                    'avoided_writes': self.avoided_writes,
+                    'confirmations': self.confirmations}
+
+
+def _add_members(pkeys, pkey, guids, membership):
+    members = pkeys.setdefault(pkey, {})
+    for guid in guids:
+        members[guid] = membership
+
+
+def _remove_members(pkeys, pkey, guids):
+    members = pkeys.get(pkey, {})
+    for guid in guids:
+        members.pop(guid, None)
+
+
+def _replace_members(pkeys, pkey, guids, membership):
+    pkeys[pkey] = dict((guid, membership) for guid in guids)
+
+
+def _drop_pkey(pkeys, pkey):
+    pkeys.pop(pkey, None)
+
+
+def _set_members(pkeys, pkey, members):
+    if members is None:
+        pkeys.pop(pkey, None)
+    else:
+        pkeys[pkey] = dict(members)
+
 
 class PKeyResourceClient(base.RestApiBaseClient):
     """UFM PKey resource Client"""
 
-    def __init__(self, session, ufm_client):
+    def __init__(self, session, ufm_client, replica_ttl=None,
+                 operation_timeouts=None, chunk_size=None,
+                 chunk_concurrency=1, replica_listener=None, replica=None):
         #
         """Initial a UFM PKey Resource Client
 
         :param session: UFM connection session
         :param ufm_client: a reference to global
             :class:`~networking_mlnx_baremetal.ufmclient.UfmClient` object
+        :param replica_ttl: keep a local replica of pkey membership which
+            is reloaded after these seconds, writes which would not change
+            UFM are skipped. No replica is kept if not set.
+        :param operation_timeouts: a dict of operation name (one of
+            :data:`OPERATIONS`) -> timeout in seconds, operations not in it
+            use the timeout of session.
+        :param chunk_size: maximum count of guids added or removed by one
+            UFM request, larger guid lists are split into chunks. Guid
+            lists are never split if not set.
+        :param chunk_concurrency: maximum count of chunks of one call sent
+            to UFM concurrently
+        :param replica_listener: callable(name) called when a counter of
+            the replica is increased, see :class:`PKeyReplica`
+        :param replica: a :class:`PKeyReplica` shared with other clients of
+            the same UFM, replica_ttl and replica_listener are ignored if
+            it is set.
         """
         super(PKeyResourceClient, self).__init__(session, ufm_client)
+        if replica is None and replica_ttl:
+            replica = PKeyReplica(replica_ttl, listener=replica_listener)
+        self.replica = replica
+        self.operation_timeouts = dict(operation_timeouts or {})
+        self.chunk_size = chunk_size
+        self.chunk_concurrency = max(1, chunk_concurrency)
+        self._chunk_executor = None
+        self._chunk_executor_lock = threading.Lock()
+
+    def _timeout(self, operation, timeout=None):
+        """Return the timeout of an operation, None for session default
+
+        :param operation: the operation name
+        :param timeout: timeout of this call, capped by the operation
+            timeout
+        """
+        timeouts = [t for t in (timeout, self.operation_timeouts.get(
+            operation)) if t]
+        return min(timeouts) if timeouts else None
+
+    def list(self, with_guid=False, timeout=None):
+        """List pkeys
+
+        The listing is shared with other callers if the session caches
+        responses, it must not be changed.
+        """
+        listing, changed = self._session.get_json(
+            '/resources/pkeys?guids_data=%s' % with_guid,
+            timeout=self._timeout(OP_LIST, timeout))
+        if with_guid and self.replica is not None:
+            self.replica.refresh(listing, changed)
+        return listing
 
-    def list(self, with_guid=False):
-        resp = self._session.get('/resources/pkeys?guids_data=%s' % with_guid)
-        return resp.json()
+    def iter_guids(self, timeout=None):
+        """Iterate on guid membership of all pkeys.
 
-    def get(self, pkey, with_guid=False):
-        resp = self._session.get('/resources/pkeys/%s?guids_data=%s'
-                                 % (pkey, with_guid))
-        return resp.json()
+        The pkey listing with guids is parsed while it is received, so
+        memory does not grow with the size of fabric. Pkeys without guids
+        are not reported.
+
+        :param timeout: timeout in seconds of the request, it applies to
+            every read of the response body as well.
+        :return: an iterator of (pkey, guid, membership) tuples, pkey and
+            guid are strings as returned by UFM
+        :raises: JsonStreamError if the listing is malformed
+        """
+        resp = self._session.get('/resources/pkeys?guids_data=True',
+                                 timeout=self._timeout(OP_LIST, timeout),
+                                 stream=True)
+        chunks = self._session.iter_content(resp, STREAM_CHUNK_SIZE)
+        reader = jsonstream.JsonReader(chunks)
+        try:
+            for pkey in reader.items():
+                if reader.peek() != '{':
+                    reader.value()
+                    continue
+                for key in reader.items():
+                    if key != 'guids' or reader.peek() != '[':
+                        reader.value()
+                        continue
+                    for member in reader.elements():
+                        if isinstance(member, dict):
+                            guid = member.get('guid')
+                            membership = member.get('membership',
+                                                    FULL_MEMBERSHIP)
+                            membership = _MEMBERSHIPS.get(membership,
+                                                          membership)
+                        else:
+                            guid, membership = member, FULL_MEMBERSHIP
+                        if guid:
+                            yield pkey, guid, membership
+        finally:
+            chunks.close()
+
+    def _replica_usable(self):
+        """Return whether writes may be skipped by the replica.
+
+        An expired replica is reloaded by a single background thread,
+        callers do not wait for it and send their writes to UFM meanwhile.
+        """
+        replica = self.replica
+        if replica is None:
+            return False
+        if not replica.expired:
+            return True
+        if replica.start_load():
+            thread = threading.Thread(target=self._load_replica,
+                                      name='ufm-pkey-replica')
+            thread.daemon = True
+            thread.start()
+        return False
+
+    def _confirm(self, pkey, deadline):
+        """Confirm the members of a pkey in the replica with UFM.
+
+        The replica of this process does not see writes of other
+        processes, guids it finds redundant are only skipped once the
+        members of their pkey have been confirmed.
+
+        :param pkey: the pkey to be written
+        :param deadline: the :class:`_Deadline` of the write
+        :return: whether the members have been confirmed, the write should
+            be sent as is if not
+        """
+        try:
+            data = self.get(pkey, with_guid=True,
+                            timeout=deadline.remaining())
+        except exceptions.ResourceNotFoundError:
+            data = None
+        except exceptions.UfmDeadlineExceeded:
+            raise
+        except exceptions.UfmClientError as e:
+            LOG.warning('Failed to confirm members of partition key '
+                        '%(pkey)s, the write is sent to UFM. Reason is '
+                        '%(reason)s.', {'pkey': pkey, 'reason': e})
+            return False
+        self.replica.confirm(pkey, data)
+        return True
+
+    def _load_replica(self):
+        try:
+            self.list(with_guid=True)
+        except exceptions.UfmClientError as e:
+            LOG.warning('Failed to load UFM partition keys replica, '
+                        'reason is %s.', e)
+        finally:
+            self.replica.end_load()
+
+    def _write(self, replica, func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            if replica is not None:
+                replica.invalidate()
+            raise
+
+    def _chunks(self, guids):
+        size = self.chunk_size
+        if not size or len(guids) <= size:
+            return [guids]
+        return [guids[i:i + size] for i in range(0, len(guids), size)]
+
+    def _executor(self):
+        if self._chunk_executor is None:
+            with self._chunk_executor_lock:
+                if self._chunk_executor is None:
+                    self._chunk_executor = futurist.ThreadPoolExecutor(
+                        max_workers=self.chunk_concurrency)
+        return self._chunk_executor
+
+    def _send_chunks(self, operation, pkey, guids, send):
+        """Send a guid list to UFM in chunks.
+
+        A guid list which fits in one chunk is sent by the caller thread
+        and its error is raised as is. Chunks of a larger list are sent
+        by at most chunk_concurrency workers, all of them are sent even
+        if some fail.
+
+        :param operation: the operation name, used in errors
+        :param pkey: the pkey which is changed
+        :param guids: list of formatted guids
+        :param send: callable which sends one chunk of guids
+        :return: a :class:`ChunkedResult`
+        :raises: PartialFailureError if any chunk failed
+        """
+        chunks = self._chunks(guids)
+        result = ChunkedResult()
+        if len(chunks) == 1:
+            send(chunks[0])
+            result.add_success(chunks[0])
+            return result
+
+        LOG.debug('Split %(operation)s of %(count)d guids of partition key '
+                  '%(pkey)s into %(chunks)d chunks.',
+                  {'operation': operation, 'count': len(guids),
+                   'pkey': pkey, 'chunks': len(chunks)})
+        if self.chunk_concurrency == 1:
+            for chunk in chunks:
+                try:
+                    send(chunk)
+                except Exception as e:
+                    result.add_failure(chunk, e)
+                else:
+                    result.add_success(chunk)
+        else:
+            executor = self._executor()
+            futures = [(chunk, executor.submit(send, chunk))
+                       for chunk in chunks]
+            waiters.wait_for_all([future for _chunk, future in futures])
+            for chunk, future in futures:
+                error = future.exception()
+                if error is not None:
+                    result.add_failure(chunk, error)
+                else:
+                    result.add_success(chunk)
+
+        if not result.ok:
+            LOG.warning('%(failed)d of %(chunks)d chunks of %(operation)s '
+                        'of partition key %(pkey)s failed.',
+                        {'failed': len(result.failures),
+                         'chunks': result.chunks, 'operation': operation,
+                         'pkey': pkey})
+            raise exceptions.PartialFailureError(operation, pkey, result)
+        return result
+
+    def get(self, pkey, with_guid=False, timeout=None):
+        """Get a pkey
+
+        The result is shared with other callers if the session caches
+        responses, it must not be changed.
+        """
+        result, _changed = self._session.get_json(
+            '/resources/pkeys/%s?guids_data=%s' % (pkey, with_guid),
+            timeout=self._timeout(OP_GET, timeout))
+        return result
 
     def update(self, pkey, guids, index0=False, ip_over_ib=True,
-               full_membership=True):
+               full_membership=True, timeout=None):
         """Sets a list of configured GUIDs for PKey or overwrites the current
         list, if found.
 
@@ -60,21 +627,49 @@ class PKeyResourceClient(base.RestApiBaseClient):
         - limited: members with limited membership cannot communicate with
         other members. However, communication is allowed between every other
         combination of membership types
+        :param timeout: timeout in seconds of this request
         """
+        guids = ib_guid.normalize_all(guids)
+        membership = _membership(full_membership)
+        replica = self.replica
+        deadline = _Deadline(OP_UPDATE, self._timeout(OP_UPDATE, timeout))
+        if (self._replica_usable()
+                and replica.equals(pkey, guids, membership)
+                and self._confirm(pkey, deadline)
+                and replica.equals(pkey, guids, membership)):
+            replica.avoided()
+            return
+
         payload = {
-            "guids": [utils.mlnx_ib_client_id_to_guid(guid) for guid in guids],
+            "guids": guids,
             "ip_over_ib": ip_over_ib,
             "index0": index0,
-            "membership": "full" if full_membership else "limited",
+            "membership": membership,
             "pkey": pkey
         }
-        self._session.put('/resources/pkeys', payload=payload)
+        self._write(replica, self._session.put, '/resources/pkeys',
+                    payload=payload, timeout=deadline.remaining())
+        if replica is not None:
+            replica.replace(pkey, guids, membership)
 
-    def delete(self, pkey):
-        self._session.delete('/resources/pkeys/%s' % pkey)
+    def delete(self, pkey, timeout=None):
+        replica = self.replica
+        try:
+            self._session.delete('/resources/pkeys/%s' % pkey,
+                                 timeout=self._timeout(OP_DELETE, timeout))
+        except exceptions.ResourceNotFoundError:
+            if replica is not None:
+                replica.drop(pkey)
+            raise
+        except Exception:
+            if replica is not None:
+                replica.invalidate()
+            raise
+        if replica is not None:
+            replica.drop(pkey)
 
     def add_guids(self, pkey, guids, index0=True, ip_over_ib=True,
-                  full_membership=True):
+                  full_membership=True, timeout=None):
         """add guid list to a PKey
 
         :param pkey:    indicates the identify of pkey to add. Hexadecimal
@@ -92,24 +687,139 @@ class PKeyResourceClient(base.RestApiBaseClient):
         - limited: members with limited membership cannot communicate with
         other members. However, communication is allowed between every other
         combination of membership types
+        :param timeout: timeout in seconds of the whole call, shared by all
+            chunks and their retries
+        :return: a :class:`ChunkedResult`, None if no request was needed
+        :raises: PartialFailureError if the guids were split into chunks
+            and some of them failed
         """
-        payload = {
-            "guids": [utils.mlnx_ib_client_id_to_guid(guid) for guid in guids],
-            "ip_over_ib": ip_over_ib,
-            "index0": index0,
-            "membership": "full" if full_membership else "limited",
-            "pkey": pkey
-        }
-        self._session.post('/resources/pkeys/', payload=payload)
+        guids = ib_guid.normalize_all(guids)
+        membership = _membership(full_membership)
+        replica = self.replica
+        deadline = _Deadline(OP_ADD, self._timeout(OP_ADD, timeout))
+        if self._replica_usable():
+            missing = replica.missing(pkey, guids, membership)
+            if len(missing) < len(guids) and self._confirm(pkey, deadline):
+                guids = replica.missing(pkey, guids, membership)
+                if not guids:
+                    replica.avoided()
+                    return
 
-    def remove_guids(self, pkey, guids):
+        def send(chunk):
+            payload = {
+                "guids": chunk,
+                "ip_over_ib": ip_over_ib,
+                "index0": index0,
+                "membership": membership,
+                "pkey": pkey
+            }
+            # NOTE: adding guids which are already members changes nothing,
+            #  so the request is safe to retry.
+            self._write(replica, self._session.post, '/resources/pkeys/',
+                        payload=payload, timeout=deadline.remaining(),
+                        idempotent=True)
+            if replica is not None:
+                replica.add(pkey, chunk, membership)
+
+        return self._send_chunks(OP_ADD, pkey, guids, send)
+
+    def remove_guids(self, pkey, guids, timeout=None):
         """remove guid list from a PKey
 
         DELETE /ufmRest/resources/pkeys/<pkey>/guids/<guid1>,<guid2>,...
 
         :param pkey:    indicates the identify of pkey to add
         :param guids:   indicates the guid list to be added
+        :param timeout: timeout in seconds of the whole call, shared by all
+            chunks and their retries
+        :return: a :class:`ChunkedResult`, None if no request was needed
+        :raises: PartialFailureError if the guids were split into chunks
+            and some of them failed
+        """
+        guids = ib_guid.normalize_all(guids)
+        replica = self.replica
+        deadline = _Deadline(OP_REMOVE, self._timeout(OP_REMOVE, timeout))
+        if self._replica_usable():
+            present = replica.present(pkey, guids)
+            if len(present) < len(guids) and self._confirm(pkey, deadline):
+                guids = replica.present(pkey, guids)
+                if not guids:
+                    replica.avoided()
+                    return
+
+        def send(chunk):
+            # NOTE: guids are joined in the url path, chunks keep it below
+            #  url length limits.
+            joined = ','.join(chunk)
+            self._write(replica, self._session.delete,
+                        '/resources/pkeys/%s/guids/%s' % (pkey, joined),
+                        timeout=deadline.remaining())
+            if replica is not None:
+                replica.remove(pkey, chunk)
+
+        return self._send_chunks(OP_REMOVE, pkey, guids, send)
+
+
+class AsyncPKeyResourceClient(base.RestApiBaseClient):
+    """UFM PKey resource Client which does not block callers
+
+    It has the same methods as :class:`PKeyResourceClient`, but every
+    method returns a future of the result. The count of concurrent UFM
+    requests is bounded by the workers of the async session.
+    """
+
+    def __init__(self, session, ufm_client, operation_timeouts=None,
+                 chunk_size=None, chunk_concurrency=1, replica=None):
+        """Initial an async UFM PKey Resource Client
+
+        :param session: async UFM connection session
+        :param ufm_client: a reference to global
+            :class:`~networking_mlnx_baremetal.ufmclient.AsyncUfmClient`
+            object
+        :param operation_timeouts: a dict of operation name -> timeout in
+            seconds, see :class:`PKeyResourceClient`
+        :param chunk_size: maximum count of guids of one UFM request, see
+            :class:`PKeyResourceClient`
+        :param chunk_concurrency: maximum count of chunks of one call sent
+            to UFM concurrently
+        :param replica: the :class:`PKeyReplica` of the blocking client of
+            the same UFM, writes sent by this client update it as well.
         """
-        joined = ','.join([utils.mlnx_ib_client_id_to_guid(guid)
-                           for guid in guids])
-        self._session.delete('/resources/pkeys/%s/guids/%s' % (pkey, joined))
+        super(AsyncPKeyResourceClient, self).__init__(session, ufm_client)
+        self._pkey = PKeyResourceClient(
+            session.session, ufm_client,
+            operation_timeouts=operation_timeouts, chunk_size=chunk_size,
+            chunk_concurrency=chunk_concurrency, replica=replica)
+
+    @property
+    def replica(self):
+        return self._pkey.replica
+
+    def list(self, with_guid=False, timeout=None):
+        return self._session.submit(self._pkey.list, with_guid=with_guid,
+                                    timeout=timeout)
+
+    def get(self, pkey, with_guid=False, timeout=None):
+        return self._session.submit(self._pkey.get, pkey,
+                                    with_guid=with_guid, timeout=timeout)
+
+    def update(self, pkey, guids, index0=False, ip_over_ib=True,
+               full_membership=True, timeout=None):
+        return self._session.submit(self._pkey.update, pkey, guids,
+                                    index0=index0, ip_over_ib=ip_over_ib,
+                                    full_membership=full_membership,
+                                    timeout=timeout)
+
+    def delete(self, pkey, timeout=None):
+        return self._session.submit(self._pkey.delete, pkey, timeout=timeout)
+
+    def add_guids(self, pkey, guids, index0=True, ip_over_ib=True,
+                  full_membership=True, timeout=None):
+        return self._session.submit(self._pkey.add_guids, pkey, guids,
+                                    index0=index0, ip_over_ib=ip_over_ib,
+                                    full_membership=full_membership,
+                                    timeout=timeout)
+
+    def remove_guids(self, pkey, guids, timeout=None):
+        return self._session.submit(self._pkey.remove_guids, pkey, guids,
+                                    timeout=timeout)
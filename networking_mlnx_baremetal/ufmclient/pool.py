@@ -0,0 +1,106 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import threading
+import time
+
+from requests import adapters
+from urllib3 import connectionpool
+
+
+class PoolStats(object):
+    """Counters of a HTTP connection pool"""
+
+    def __init__(self, listener=None):
+        """Initial connection pool counters
+
+        :param listener: callable(name) called every time a counter is
+            increased, used to report the counters as metrics
+        """
+        self._lock = threading.Lock()
+        self._listener = listener
+        self.created = 0
+        self.reused = 0
+        self.waits = 0
+        self.expired = 0
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+        if self._listener is not None:
+            self._listener(name)
+
+    def as_dict(self):
+        with self._lock:
+            return {'created': self.created, 'reused': self.reused,
+                    'waits': self.waits, 'expired': self.expired}
+
+
+class _MeteredPoolMixin(object):
+    """Count connections taken from pool and expire idle connections"""
+
+    pool_stats = None
+    idle_timeout = None
+
+    def _get_conn(self, timeout=None):
+        if self.pool is not None and self.pool.empty():
+            # NOTE: every connection is in use, the caller either waits for
+            # a free one (pool_block) or opens a connection beyond maxsize.
+            self.pool_stats.incr('waits')
+        conn = super(_MeteredPoolMixin, self)._get_conn(timeout=timeout)
+        released_at = getattr(conn, '_ufm_released_at', None)
+        if (self.idle_timeout and released_at is not None
+                and time.time() - released_at > self.idle_timeout):
+            self.pool_stats.incr('expired')
+            conn.close()
+        if getattr(conn, 'sock', None) is None:
+            # NOTE: a new, dropped or expired connection, it will connect
+            # (and do TLS handshake) again when sending the request.
+            self.pool_stats.incr('created')
+        else:
+            self.pool_stats.incr('reused')
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._ufm_released_at = time.time()
+        super(_MeteredPoolMixin, self)._put_conn(conn)
+
+
+class UfmHTTPAdapter(adapters.HTTPAdapter):
+    """HTTP adapter which records connection pool metrics
+
+    :param pool_idle_timeout: seconds a connection may stay idle in pool
+        before it is closed and re-established, no limit if not positive.
+    :param pool_listener: callable(name) called when a pool counter is
+        increased, see :class:`PoolStats`
+    """
+
+    def __init__(self, pool_idle_timeout=None, pool_listener=None, **kwargs):
+        self.pool_stats = PoolStats(listener=pool_listener)
+        self.pool_idle_timeout = pool_idle_timeout
+        attrs = {'pool_stats': self.pool_stats,
+                 'idle_timeout': pool_idle_timeout}
+        self._pool_classes = {
+            'http': type('MeteredHTTPConnectionPool',
+                         (_MeteredPoolMixin,
+                          connectionpool.HTTPConnectionPool), attrs),
+            'https': type('MeteredHTTPSConnectionPool',
+                          (_MeteredPoolMixin,
+                           connectionpool.HTTPSConnectionPool), attrs),
+        }
+        super(UfmHTTPAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(UfmHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self._pool_classes
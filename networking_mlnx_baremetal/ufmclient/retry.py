@@ -0,0 +1,124 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import logging
+import random
+import time
+
+from networking_mlnx_baremetal.ufmclient import constants
+from networking_mlnx_baremetal.ufmclient import exceptions
+
+LOG = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset([constants.HEAD, constants.GET,
+                                constants.PUT, constants.DELETE])
+"""http methods which are safe to send again"""
+
+RETRY_ON = (exceptions.UfmConnectionError, exceptions.ServerSideError)
+"""errors which are worth a retry"""
+
+
+class RetryPolicy(object):
+    """Retry transient UFM errors with jittered exponential backoff.
+
+    The n-th retry waits a random time between 0 and
+    ``min(max_delay, base_delay * 2 ** n)`` seconds ("full jitter"), so
+    callers which failed together do not retry together. Retries stop
+    after ``max_attempts`` attempts, or when the next attempt would start
+    after the ``budget`` seconds since the first one. A timeout of the
+    call shortens the budget, every retry gets the time left as timeout.
+
+    Only idempotent requests are retried, a request which fails after it
+    has been applied by UFM is harmless to send again then.
+    """
+
+    def __init__(self, max_attempts, base_delay, max_delay, budget,
+                 retry_on=RETRY_ON, listener=None):
+        """Initial a retry policy
+
+        :param max_attempts: maximum count of attempts of a request,
+            including the first one
+        :param base_delay: seconds to wait before the first retry at most
+        :param max_delay: maximum seconds to wait between two attempts
+        :param budget: maximum seconds spent on a request with retries
+        :param retry_on: exception classes which are retried
+        :param listener: callable(method, url, attempt, error) called
+            before every retry
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.retry_on = tuple(retry_on)
+        self._listener = listener
+
+    def is_retryable(self, method, idempotent=None):
+        """Whether a request is retried on transient errors
+
+        :param method: http method of the request
+        :param idempotent: override whether the request is idempotent,
+            decided by the http method if it is None
+        """
+        if self.max_attempts <= 1:
+            return False
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        return idempotent
+
+    def delay(self, retry):
+        """Return the seconds to wait before a retry
+
+        :param retry: the count of retries done before this one
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** retry))
+        return random.uniform(0, ceiling)
+
+    def call(self, method, url, func, *args, **kwargs):
+        """Call a request function, retry it on transient errors.
+
+        :param method: http method of the request
+        :param url: url of the request, used in logs
+        :param func: the function which sends the request, its ``timeout``
+            keyword argument is the timeout of the whole call if it is set.
+        :return: the result of the function
+        """
+        timeout = kwargs.get('timeout')
+        budget = min(self.budget, timeout) if timeout else self.budget
+        deadline = time.time() + budget
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except self.retry_on as e:
+                if attempt >= self.max_attempts:
+                    raise
+                delay = self.delay(attempt - 1)
+                remaining = deadline - time.time() - delay
+                if remaining <= 0:
+                    LOG.warning('Retry budget (%(budget)ss) of UFM request '
+                                '%(method)s %(url)s is exhausted.',
+                                {'budget': budget, 'method': method,
+                                 'url': url})
+                    raise
+                LOG.warning('UFM request %(method)s %(url)s failed '
+                            '(attempt %(attempt)d/%(max)d), retry in '
+                            '%(delay).2fs. Error: %(error)s',
+                            {'method': method, 'url': url,
+                             'attempt': attempt, 'max': self.max_attempts,
+                             'delay': delay, 'error': e})
+                if self._listener is not None:
+                    self._listener(method, url, attempt, e)
+                time.sleep(delay)
+                # NOTE: the retry must not outlive the deadline.
+                kwargs['timeout'] = remaining
+                attempt += 1
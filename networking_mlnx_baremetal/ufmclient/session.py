@@ -12,12 +12,22 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import logging
+import time
 
+import futurist
 import requests
 from requests.auth import HTTPBasicAuth
+import six
+from six.moves import http_client
+from urllib3 import exceptions as urllib3_exc
 
+from networking_mlnx_baremetal.ufmclient import cache
 from networking_mlnx_baremetal.ufmclient import constants
+from networking_mlnx_baremetal.ufmclient import endpoints
 from networking_mlnx_baremetal.ufmclient import exceptions
+from networking_mlnx_baremetal.ufmclient import logutils
+from networking_mlnx_baremetal.ufmclient import pool
+from networking_mlnx_baremetal.ufmclient import retry
 
 LOG = logging.getLogger(__name__)
 
@@ -38,6 +48,16 @@ PUT = 'PUT'
 
 DELETE = 'DELETE'
 
+BREAKER_FAILURES = (exceptions.UfmConnectionError, exceptions.ServerSideError)
+"""errors which count as UFM failures for a circuit breaker"""
+
+UNAVAILABLE_CODES = frozenset([http_client.BAD_GATEWAY,
+                               http_client.SERVICE_UNAVAILABLE,
+                               http_client.GATEWAY_TIMEOUT])
+"""http status codes which mean an UFM endpoint is unavailable"""
+
+_DEFAULT_PROBE_TIMEOUT = 5
+
 
 class UfmSession(object):
     """UFM REST API session"""
@@ -46,20 +66,111 @@ class UfmSession(object):
     # http://docs.python-requests.org/en/master/user/advanced/#timeouts
     _DEFAULT_TIMEOUT = 60
 
-    def __init__(self, endpoint, username, password, verify_ca, timeout=None):
-        self.endpoint = endpoint
-        self.base_url = '%s/ufmRest' % endpoint
-        self._timeout = timeout if timeout else self._DEFAULT_TIMEOUT
+    # Default count of connection pools and connections per pool
+    _DEFAULT_POOL_SIZE = 10
+
+    def __init__(self, endpoint, username, password, verify_ca, timeout=None,
+                 connect_timeout=None, pool_connections=None,
+                 pool_maxsize=None, pool_block=False, pool_idle_timeout=None,
+                 breaker=None, retry_policy=None, response_cache_size=None,
+                 probe_interval=None, probe_timeout=None,
+                 failover_listener=None, pool_listener=None):
+        """Initial a UFM REST API session
+
+        :param endpoint: UFM REST API endpoint, or a list of endpoints of
+            the primary and standby UFMs of a fabric, the primary first
+        :param username: username for UFM REST API authentication
+        :param password: password for UFM REST API authentication
+        :param verify_ca: a boolean or a path to CA bundle
+        :param timeout: HTTP read timeout in seconds
+        :param connect_timeout: HTTP connect timeout in seconds, same as
+            read timeout if not set
+        :param pool_connections: count of connection pools to cache
+        :param pool_maxsize: maximum count of connections kept per pool
+        :param pool_block: wait for a free connection when all connections
+            of a pool are in use instead of opening a new one
+        :param pool_idle_timeout: seconds a connection may stay idle before
+            it is re-established, no limit if not set
+        :param breaker: a circuit breaker every request goes through, see
+            :class:`~.breaker.CircuitBreaker` and :data:`BREAKER_FAILURES`
+        :param retry_policy: a :class:`~.retry.RetryPolicy` of transient
+            errors, idempotent requests are retried through the breaker.
+        :param response_cache_size: count of parsed responses of
+            :meth:`get_json` cached with their validators, nothing is
+            cached if not set.
+        :param probe_interval: seconds between two health probes of the
+            endpoints of a list, endpoints are only checked by requests
+            if not set
+        :param probe_timeout: timeout in seconds of a health probe
+        :param failover_listener: callable(method, url, endpoint) called
+            when a request is sent to the next endpoint
+        :param pool_listener: callable(name) called when a connection pool
+            counter of :meth:`pool_stats` is increased
+        """
+        if isinstance(endpoint, six.string_types):
+            endpoint = [endpoint]
+        self.endpoints = endpoints.EndpointSet(
+            endpoint, probe=self._probe, interval=probe_interval or 0)
+        self._probe_timeout = probe_timeout or _DEFAULT_PROBE_TIMEOUT
+        self._failover_listener = failover_listener
+        self._read_timeout = timeout if timeout else self._DEFAULT_TIMEOUT
+        self._connect_timeout = connect_timeout or self._read_timeout
+        self.breaker = breaker
+        self.retry_policy = retry_policy
+        self.response_cache = (cache.ResponseCache(response_cache_size)
+                               if response_cache_size else None)
 
         # Initial request session
         self._session = requests.Session()
         self._session.verify = verify_ca
         self._session.auth = HTTPBasicAuth(username, password)
 
+        self._adapter = pool.UfmHTTPAdapter(
+            pool_connections=pool_connections or self._DEFAULT_POOL_SIZE,
+            pool_maxsize=pool_maxsize or self._DEFAULT_POOL_SIZE,
+            pool_block=pool_block,
+            pool_idle_timeout=pool_idle_timeout,
+            pool_listener=pool_listener)
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+
         from networking_mlnx_baremetal import __version__ as version
         self._session.headers.update({
             'User-Agent': 'python-ufmclient - v%s' % version
         })
+        self.endpoints.start()
+
+    @property
+    def endpoint(self):
+        """the UFM REST API endpoint requests are sent to first"""
+        return self.endpoints.primary.url
+
+    @property
+    def base_url(self):
+        return self.endpoints.primary.base_url
+
+    def close(self):
+        """Stop probing the health of endpoints"""
+        self.endpoints.stop()
+
+    def pool_stats(self):
+        """Return connection pool counters of this session
+
+        :return: a dict contains count of connections created, reused,
+            expired and count of times no idle connection is available.
+        """
+        return self._adapter.pool_stats.as_dict()
+
+    def cache_stats(self):
+        """Return response cache counters of this session
+
+        :return: a dict of counters, see
+            :meth:`~.cache.ResponseCache.as_dict`, empty if no response
+            is cached.
+        """
+        if self.response_cache is None:
+            return {}
+        return self.response_cache.as_dict()
 
     def get_url(self, path):
         """get absolute URL for UFM REST API resource
@@ -67,55 +178,332 @@ class UfmSession(object):
         :param path: path of resource, can be relative path or absolute path
         :return:
         """
-        if path.startswith(self.base_url):
-            return path
-        elif path.startswith('/ufmRest'):
-            return '%s%s' % (self.endpoint, path)
-        else:
-            return '%s%s' % (self.base_url, path)
+        return '%s%s' % (self.base_url, self.get_path(path))
+
+    def get_path(self, url):
+        """get the path of UFM REST API resource relative to /ufmRest, it
+        is the same on every endpoint
+
+        :param url: path of resource, can be relative path or absolute path
+        :return:
+        """
+        for endpoint in self.endpoints.endpoints:
+            if url.startswith(endpoint.base_url):
+                return url[len(endpoint.base_url):]
+        if url.startswith('/ufmRest'):
+            return url[len('/ufmRest'):]
+        return url
 
-    def get(self, url, headers=None):
-        return self.request(GET, url, headers=headers)
+    def endpoint_stats(self):
+        """Return the health of endpoints of this session
 
-    def post(self, url, payload, headers=None):
-        return self.request(POST, url, json=payload, headers=headers)
+        :return: a list of dicts contains url, health, probe latency and
+            count of consecutive failures of every endpoint
+        """
+        return self.endpoints.as_list()
 
-    def put(self, url, payload, headers=None):
-        return self.request(PUT, url, json=payload, headers=headers)
+    def get(self, url, headers=None, timeout=None, stream=False):
+        """Send a GET request to UFM
 
-    def patch(self, url, payload, headers=None):
-        return self.request(PATCH, url, json=payload, headers=headers)
+        :param stream: do not read the response body, it should be read
+            by :meth:`iter_content`
+        """
+        return self.request(GET, url, headers=headers, timeout=timeout,
+                            stream=stream)
 
-    def delete(self, url, headers=None):
-        return self.request(DELETE, url, headers=headers)
+    def get_json(self, url, headers=None, timeout=None):
+        """Send a GET request to UFM and return the parsed response body.
 
-    def request(self, method, url, json=None, headers=None):
-        try:
-            url = self.get_url(url)
-            return self._request(method, url, json=json, headers=headers)
-        except requests.exceptions.RequestException as e:
-            response = e.response
-            if response is not None:
-                LOG.warning('UFM responses -> %(method)s %(url)s, '
-                            'code: %(code)s, response: %(resp_txt)s',
+        With a response cache, the request is conditional and the cached
+        body is returned if it has not changed, without decoding it again.
+
+        :return: a tuple of the parsed body and whether it changed since
+            the last call, the body must not be changed by the caller.
+        """
+        response_cache = self.response_cache
+        if response_cache is None:
+            return self.get(url, headers=headers, timeout=timeout).json(), True
+
+        # NOTE: keyed by path, a cached response is still used after a
+        #  fail over to another endpoint.
+        key = self.get_path(url)
+        entry = response_cache.get(key)
+        headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                headers[constants.HEADER_IF_NONE_MATCH] = entry.etag
+            if entry.last_modified:
+                headers[constants.HEADER_IF_MODIFIED_SINCE] = (
+                    entry.last_modified)
+        res = self.get(url, headers=headers, timeout=timeout)
+        if entry is not None and res.status_code == http_client.NOT_MODIFIED:
+            response_cache.incr('not_modified')
+            return entry.value, False
+
+        etag = res.headers.get(constants.HEADER_ETAG)
+        last_modified = res.headers.get(constants.HEADER_LAST_MODIFIED)
+        digest = cache.digest(res.content)
+        if entry is not None and entry.digest == digest:
+            response_cache.incr('unchanged')
+            response_cache.put(key, entry._replace(
+                etag=etag, last_modified=last_modified))
+            return entry.value, False
+
+        value = res.json()
+        response_cache.incr('changed')
+        response_cache.put(key, cache.CachedResponse(etag, last_modified,
+                                                     digest, value))
+        return value, True
+
+    def post(self, url, payload, headers=None, timeout=None,
+             idempotent=None):
+        return self.request(POST, url, json=payload, headers=headers,
+                            timeout=timeout, idempotent=idempotent)
+
+    def put(self, url, payload, headers=None, timeout=None):
+        return self.request(PUT, url, json=payload, headers=headers,
+                            timeout=timeout)
+
+    def patch(self, url, payload, headers=None, timeout=None):
+        return self.request(PATCH, url, json=payload, headers=headers,
+                            timeout=timeout)
+
+    def delete(self, url, headers=None, timeout=None):
+        return self.request(DELETE, url, headers=headers, timeout=timeout)
+
+    def get_timeout(self, timeout=None):
+        """Return the (connect, read) timeout tuple of a request
+
+        :param timeout: timeout of this request in seconds, it overrides
+            the read timeout and caps the connect timeout of the session.
+        :return: a (connect, read) timeout tuple
+        """
+        if not timeout:
+            return self._connect_timeout, self._read_timeout
+        return min(self._connect_timeout, timeout), timeout
+
+    def request(self, method, url, json=None, headers=None, timeout=None,
+                idempotent=None, stream=False):
+        """Send a request to UFM
+
+        :param idempotent: whether the request is safe to retry, decided
+            by the http method if it is not set
+        :param stream: do not read the response body, only getting the
+            response headers is retried.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in retry.IDEMPOTENT_METHODS
+        policy = self.retry_policy
+        if policy is not None and policy.is_retryable(method, idempotent):
+            return policy.call(method, url, self._call, method, url,
+                               json=json, headers=headers, timeout=timeout,
+                               stream=stream, idempotent=idempotent)
+        return self._call(method, url, json=json, headers=headers,
+                          timeout=timeout, stream=stream,
+                          idempotent=idempotent)
+
+    def _call(self, method, url, json=None, headers=None, timeout=None,
+              stream=False, idempotent=False):
+        if self.breaker is not None:
+            return self.breaker.call(self._send, method, url, json=json,
+                                     headers=headers, timeout=timeout,
+                                     stream=stream, idempotent=idempotent)
+        return self._send(method, url, json=json, headers=headers,
+                          timeout=timeout, stream=stream,
+                          idempotent=idempotent)
+
+    def _send(self, method, url, json=None, headers=None, timeout=None,
+              stream=False, idempotent=False):
+        """Send a request to the first endpoint which answers.
+
+        A request which finds an endpoint unavailable is sent to the next
+        one, unless it is not idempotent and may have been applied.
+        """
+        path = self.get_path(url)
+        candidates = self.endpoints.candidates()
+        last = len(candidates) - 1
+        for index, endpoint in enumerate(candidates):
+            url = endpoint.base_url + path
+            try:
+                response = self._request(method, url, json=json,
+                                         headers=headers, timeout=timeout,
+                                         stream=stream)
+            except requests.exceptions.RequestException as e:
+                if not self._is_unavailable(e):
+                    self._raise_for_error(method, url, e)
+                self.endpoints.failed(endpoint, e)
+                if index == last or not (idempotent or
+                                         self._is_not_applied(e)):
+                    self._raise_for_error(method, url, e)
+                LOG.warning('UFM request %(method)s %(url)s failed, send it '
+                            'to %(next)s instead. Error: %(error)s',
                             {'method': method, 'url': url,
-                             'code': response.status_code,
-                             'resp_txt': response.content})
-                raise exceptions.raise_for_response(method, url, response)
-            else:
-                raise exceptions.UfmConnectionError(url=url, error=e)
+                             'next': candidates[index + 1].url, 'error': e})
+                if self._failover_listener is not None:
+                    self._failover_listener(method, url, endpoint)
+                continue
+            self.endpoints.succeeded(endpoint)
+            return response
+
+    @staticmethod
+    def _raise_for_error(method, url, error):
+        response = error.response
+        if response is not None:
+            LOG.warning('UFM responses -> %(method)s %(url)s, '
+                        'code: %(code)s, response: %(resp_txt)s',
+                        {'method': method, 'url': url,
+                         'code': response.status_code,
+                         'resp_txt': logutils.truncated(response.content)})
+            raise exceptions.raise_for_response(method, url, response)
+        else:
+            raise exceptions.UfmConnectionError(url=url, error=error)
+
+    @staticmethod
+    def _is_unavailable(error):
+        """Whether a request error means the UFM endpoint is unavailable
+
+        :param error: a requests exception
+        """
+        response = error.response
+        if response is not None:
+            return response.status_code in UNAVAILABLE_CODES
+        return isinstance(error, (requests.exceptions.ConnectionError,
+                                  requests.exceptions.Timeout))
+
+    @staticmethod
+    def _is_not_applied(error):
+        """Whether a failed request has surely not been applied by UFM
 
-    def _request(self, method, url, json=None, headers=None):
+        :param error: a requests exception of an unavailable endpoint
+        """
+        response = error.response
+        if response is not None:
+            return response.status_code == http_client.SERVICE_UNAVAILABLE
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        # NOTE: the connection could not be established, nothing was sent.
+        reason = getattr(error.args[0] if error.args else None, 'reason',
+                         None)
+        return isinstance(reason, urllib3_exc.NewConnectionError)
+
+    def _probe(self, endpoint):
+        """Send a health probe to an UFM endpoint
+
+        Any answer but an unavailable one means the endpoint is healthy.
+
+        :param endpoint: the :class:`~.endpoints.Endpoint` to probe
+        :return: seconds UFM took to answer
+        :raises: RequestException or UfmHttpRequestError if it is not
+            available
+        """
+        url = endpoint.url + endpoints.PROBE_PATH
+        started = time.time()
+        response = self._session.get(
+            url, timeout=self.get_timeout(self._probe_timeout))
+        elapsed = time.time() - started
+        if response.status_code in UNAVAILABLE_CODES:
+            raise exceptions.ServerSideError(constants.GET, url, response)
+        return elapsed
+
+    def _request(self, method, url, json=None, headers=None, timeout=None,
+                 stream=False):
         if method.upper() in [constants.POST, constants.PATCH, constants.PUT]:
             headers = headers or {}
             headers.update({constants.HEADER_CONTENT_TYPE: 'application/json'})
 
         req = requests.Request(method, url, json=json, headers=headers)
         prepped_req = self._session.prepare_request(req)
-        res = self._session.send(prepped_req, timeout=self._timeout)
+        res = self._session.send(prepped_req,
+                                 timeout=self.get_timeout(timeout),
+                                 stream=stream)
         res.raise_for_status()
+        if stream:
+            LOG.debug('UFM responses -> %(method)s %(url)s, code: %(code)s, '
+                      'content is streamed.',
+                      {'method': method, 'url': url, 'code': res.status_code})
+            return res
         LOG.debug('UFM responses -> %(method)s %(url)s, code: %(code)s, '
                   'content:: %(content)s',
                   {'method': method, 'url': url, 'code': res.status_code,
-                   'content': res.text})
+                   'content': logutils.truncated(res.content)})
         return res
+
+    @staticmethod
+    def iter_content(response, chunk_size):
+        """Iterate on the body of a streamed response in chunks
+
+        The response is closed, and its connection released to the pool,
+        when the iteration ends or the iterator is closed.
+
+        :param response: a response of a request sent with stream
+        :param chunk_size: maximum bytes of a chunk
+        :return: an iterator of bytes chunks
+        :raises: UfmConnectionError if reading the body fails
+        """
+        try:
+            for chunk in response.iter_content(chunk_size):
+                yield chunk
+        except requests.exceptions.RequestException as e:
+            raise exceptions.UfmConnectionError(url=response.url, error=e)
+        finally:
+            response.close()
+
+
+class AsyncUfmSession(object):
+    """UFM REST API session which runs requests in background workers
+
+    Requests are sent through a wrapped :class:`UfmSession` by a bounded
+    pool of workers, every request method returns a future instead of the
+    response. Workers are green threads when the process is monkey patched
+    by eventlet, so a slow UFM response does not block the caller.
+    """
+
+    # Default maximum count of concurrent requests
+    _DEFAULT_CONCURRENCY = 8
+
+    def __init__(self, endpoint, username, password, verify_ca, timeout=None,
+                 concurrency=None, **session_kwargs):
+        concurrency = concurrency or self._DEFAULT_CONCURRENCY
+        session_kwargs.setdefault('pool_maxsize', concurrency)
+        self.session = UfmSession(endpoint, username, password, verify_ca,
+                                  timeout=timeout, **session_kwargs)
+        self._executor = futurist.ThreadPoolExecutor(max_workers=concurrency)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run a callable in a background worker
+
+        :return: a future of the callable result
+        """
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def pool_stats(self):
+        return self.session.pool_stats()
+
+    def get(self, url, headers=None, timeout=None):
+        return self.submit(self.session.get, url, headers=headers,
+                           timeout=timeout)
+
+    def post(self, url, payload, headers=None, timeout=None,
+             idempotent=None):
+        return self.submit(self.session.post, url, payload, headers=headers,
+                           timeout=timeout, idempotent=idempotent)
+
+    def put(self, url, payload, headers=None, timeout=None):
+        return self.submit(self.session.put, url, payload, headers=headers,
+                           timeout=timeout)
+
+    def patch(self, url, payload, headers=None, timeout=None):
+        return self.submit(self.session.patch, url, payload, headers=headers,
+                           timeout=timeout)
+
+    def delete(self, url, headers=None, timeout=None):
+        return self.submit(self.session.delete, url, headers=headers,
+                           timeout=timeout)
+
+    def close(self, wait=True):
+        """Stop background workers
+
+        :param wait: wait for all submitted requests to finish if true
+        """
+        self._executor.shutdown(wait=wait)
+        self.session.close()
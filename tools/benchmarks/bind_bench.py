@@ -0,0 +1,444 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Benchmark the bind/unbind hot path of the mlnx_ib_bm mechanism driver.
+
+For every fleet size, a fresh driver is initialized against an in-process
+fake Ironic client and a fake UFM HTTP server. Every node gets one
+baremetal port which is bound (``bind_port`` followed by the
+``update_port_postcommit`` of the binding) and then unbound
+(``update_port_postcommit`` from bound to unbound) by a pool of
+concurrent workers.
+
+Updates the driver has to ignore are measured between bind and unbind:
+``--updates`` rounds of status changes of every bound port, and
+``--attempts`` rounds of binding a port of each of ``--no-ib-nodes``
+nodes which have no infiniband port.
+
+With ``--fabrics`` networks are spread over physical networks whose
+infiniband fabrics are managed by their own fake UFM, binds are reported
+per fabric. ``--slow-fabric-latency`` slows down the UFM of the first
+fabric only, the other fabrics should not be affected.
+
+``--switchover-at`` makes the UFM of every fabric answer 503 for
+``--switchover-duration`` seconds from that time of the bind phase on,
+like during an UFM master switchover. With ``--standby`` every fabric
+has a standby UFM requests fail over to.
+
+Usage::
+
+    $ python tools/benchmarks/bind_bench.py --nodes 10,100,1000,10000 \\
+        --ironic-latency 0.005 --ufm-latency 0.01 --concurrency 32 \\
+        --set pkey_batch_window=0.05
+    $ python tools/benchmarks/bind_bench.py --nodes 1000 --updates 5 \\
+        --no-ib-nodes 1000 --attempts 5
+    $ python tools/benchmarks/bind_bench.py --nodes 1000 --fabrics 2 \\
+        --slow-fabric-latency 0.2
+    $ python tools/benchmarks/bind_bench.py --nodes 1000 --standby \\
+        --switchover-at 1 --switchover-duration 5
+"""
+import argparse
+import copy
+import threading
+import time
+import uuid
+
+import fake_ironic
+import fake_ufm
+import futurist
+from neutron_lib.api.definitions import portbindings
+from neutron_lib import constants as n_const
+from neutron_lib.plugins.ml2 import api
+from oslo_config import cfg
+
+from networking_mlnx_baremetal import constants as const
+from networking_mlnx_baremetal import ironic_client
+from networking_mlnx_baremetal.plugins.ml2 import mech_ib_baremetal
+from networking_mlnx_baremetal import registry
+
+CONF = cfg.CONF
+
+
+class _FakeProvisioningBlocks(object):
+    """Replace neutron provisioning blocks, they need a neutron database"""
+
+    @staticmethod
+    def add_provisioning_component(context, object_id, object_type, entity):
+        pass
+
+    @staticmethod
+    def provisioning_complete(context, object_id, object_type, entity):
+        pass
+
+
+class _FakeNetworkContext(object):
+
+    def __init__(self, network, segments, fabric=0):
+        self.current = network
+        self.network_segments = segments
+        self.fabric = fabric
+
+
+class FakePortContext(object):
+    """Synthetic ml2 PortContext of a baremetal port"""
+
+    def __init__(self, port, original, network, segments_to_bind=None,
+                 vif_type=portbindings.VIF_TYPE_UNBOUND,
+                 original_vif_type=None):
+        self.current = port
+        self.original = original
+        self.network = network
+        self.segments_to_bind = segments_to_bind or []
+        self.vif_type = vif_type
+        self.original_vif_type = original_vif_type
+        self.vif_details = {}
+        self.host = port.get(portbindings.HOST_ID)
+        self._plugin_context = None
+        self.bound_segment = None
+
+    def continue_binding(self, segment_id, next_segments_to_bind):
+        self.bound_segment = segment_id
+
+    def set_binding(self, segment_id, vif_type, vif_details, status=None):
+        self.vif_type = vif_type
+        self.vif_details = vif_details
+
+
+def _segment(network_id, segmentation_id, physical_network=None):
+    network_type = n_const.TYPE_VXLAN
+    if physical_network:
+        network_type = n_const.TYPE_VLAN
+    return {api.ID: str(uuid.uuid4()),
+            api.NETWORK_ID: network_id,
+            api.NETWORK_TYPE: network_type,
+            api.SEGMENTATION_ID: segmentation_id,
+            api.PHYSICAL_NETWORK: physical_network}
+
+
+def _port(node, network_id, vif_type, binding_levels=None):
+    return {'id': str(uuid.uuid4()),
+            'network_id': network_id,
+            'mac_address': 'fa:16:3e:00:00:01',
+            'status': n_const.PORT_STATUS_DOWN,
+            portbindings.HOST_ID: node,
+            portbindings.VNIC_TYPE: portbindings.VNIC_BAREMETAL,
+            portbindings.VIF_TYPE: vif_type,
+            portbindings.PROFILE: {},
+            'binding_levels': binding_levels or []}
+
+
+def _percentile(samples, percent):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100.0 * len(ordered))))
+    return ordered[index]
+
+
+class Fleet(object):
+    """A driver bound to fake Ironic and UFM for a fleet of nodes"""
+
+    def __init__(self, nodes, networks, ib_ports, ironic_latency,
+                 ufm_latency, ufm_error_rate=0.0, no_ib_nodes=0, fabrics=1,
+                 slow_fabric_latency=None, standby=False):
+        self.ironic = fake_ironic.FakeIronicClient(
+            nodes, ib_ports=ib_ports, latency=ironic_latency,
+            no_ib_nodes=no_ib_nodes)
+        self.ufms = []
+        for index in range(fabrics):
+            latency = ufm_latency
+            if index == 0 and slow_fabric_latency is not None:
+                latency = slow_fabric_latency
+            self.ufms.append(fake_ufm.FakeUfmServer(
+                latency=latency, error_rate=ufm_error_rate).start())
+        self.ufm = self.ufms[0]
+        self.standbys = []
+        if standby:
+            self.standbys = [fake_ufm.FakeUfmServer(
+                latency=ufm_latency, error_rate=ufm_error_rate).start()
+                for _ in self.ufms]
+        endpoints = [ufm.endpoint for ufm in self.ufms]
+        for index, server in enumerate(self.standbys):
+            endpoints[index] += '|' + server.endpoint
+        self.networks = []
+        for index in range(max(networks, fabrics)):
+            network_id = str(uuid.uuid4())
+            fabric = index % fabrics
+            physical_network = 'fabric%d' % fabric if fabrics > 1 else None
+            segment = _segment(network_id, 1000 + index, physical_network)
+            self.networks.append(_FakeNetworkContext(
+                {'id': network_id}, [segment], fabric))
+
+        CONF.set_override('endpoint', endpoints[0],
+                          group=const.MLNX_BAREMETAL_DRIVER_GROUP_NAME)
+        if fabrics > 1:
+            CONF.set_override(
+                'fabric_endpoints',
+                dict(('fabric%d' % index, endpoint)
+                     for index, endpoint in enumerate(endpoints)),
+                group=const.MLNX_BAREMETAL_DRIVER_GROUP_NAME)
+        registry.REGISTRY.reset()
+        ironic_client.get_client = lambda *args, **kwargs: self.ironic
+        mech_ib_baremetal.provisioning_blocks = _FakeProvisioningBlocks
+
+        self.driver = mech_ib_baremetal.InfiniBandBaremetalMechanismDriver()
+        self.driver.initialize()
+
+    def close(self):
+        for ufm in self.ufms + self.standbys:
+            ufm.stop()
+
+    def switchover(self, at, duration):
+        """Make the UFM of every fabric unavailable for a while
+
+        :param at: seconds from now the UFMs become unavailable
+        :param duration: seconds the UFMs stay unavailable
+        """
+        def _set(unavailable):
+            for ufm in self.ufms:
+                ufm.unavailable = unavailable
+
+        for delay, unavailable in ((at, True), (at + duration, False)):
+            timer = threading.Timer(delay, _set, (unavailable,))
+            timer.daemon = True
+            timer.start()
+
+    def bind(self, node, network):
+        segment = network.network_segments[0]
+        port = _port(node, network.current['id'],
+                     portbindings.VIF_TYPE_UNBOUND)
+        context = FakePortContext(port, None, network,
+                                  segments_to_bind=[segment])
+        self.driver.bind_port(context)
+        if context.bound_segment is None:
+            raise RuntimeError('Port of node %s is not bound: %s'
+                               % (node, context.vif_details))
+
+        level = {'driver': const.DRIVE_NAME,
+                 'network_type': segment[api.NETWORK_TYPE],
+                 'physical_network': segment[api.PHYSICAL_NETWORK],
+                 'segmentation_id': segment[api.SEGMENTATION_ID],
+                 'level': 0}
+        bound = _port(node, network.current['id'],
+                      portbindings.VIF_TYPE_OTHER, [level])
+        bound['id'] = port['id']
+        self.driver.update_port_postcommit(FakePortContext(
+            bound, port, network, vif_type=portbindings.VIF_TYPE_OTHER,
+            original_vif_type=portbindings.VIF_TYPE_UNBOUND))
+        return bound
+
+    def update(self, bound, network):
+        port = copy.deepcopy(bound)
+        port['status'] = n_const.PORT_STATUS_ACTIVE
+        self.driver.update_port_postcommit(FakePortContext(
+            port, bound, network, vif_type=portbindings.VIF_TYPE_OTHER,
+            original_vif_type=portbindings.VIF_TYPE_OTHER))
+
+    def attempt(self, node, network):
+        """Try binding a port of a node without infiniband port"""
+        port = _port(node, network.current['id'],
+                     portbindings.VIF_TYPE_UNBOUND)
+        context = FakePortContext(port, None, network,
+                                  segments_to_bind=network.network_segments)
+        self.driver.bind_port(context)
+        if context.bound_segment is not None:
+            raise RuntimeError('Port of node %s is bound' % node)
+
+    def unbind(self, bound, network):
+        port = copy.deepcopy(bound)
+        port[portbindings.HOST_ID] = ''
+        port[portbindings.VIF_TYPE] = portbindings.VIF_TYPE_UNBOUND
+        self.driver.update_port_postcommit(FakePortContext(
+            port, bound, network, vif_type=portbindings.VIF_TYPE_UNBOUND,
+            original_vif_type=portbindings.VIF_TYPE_OTHER))
+
+
+def _timed(func, samples, lock, *args):
+    started = time.time()
+    failed = False
+    try:
+        return func(*args)
+    except Exception:
+        failed = True
+        return None
+    finally:
+        elapsed = time.time() - started
+        with lock:
+            samples.append(elapsed)
+            samples.failed += int(failed)
+
+
+class _Samples(list):
+    """Latency samples and the count of failed operations"""
+
+    failed = 0
+
+
+def _ignored(executor, fleet, name, func, jobs):
+    """Run jobs the driver should ignore, return a result row of them"""
+    lock = threading.Lock()
+    samples = _Samples()
+    calls = sum(fleet.ironic.calls.values())
+    started = time.time()
+    futures = [executor.submit(_timed, func, samples, lock, *job)
+               for job in jobs]
+    for future in futures:
+        future.result()
+    elapsed = time.time() - started
+    return (name, samples, elapsed,
+            sum(fleet.ironic.calls.values()) - calls, None)
+
+
+def run(fleet, concurrency, updates=0, attempts=0, switchover=None):
+    lock = threading.Lock()
+    fabric_samples = [_Samples() for _ in fleet.ufms]
+    unbind_samples = _Samples()
+    rows = []
+    executor = futurist.ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        started = time.time()
+        if switchover is not None:
+            fleet.switchover(*switchover)
+        nodes = fleet.ironic.nodes
+        networks = [fleet.networks[i % len(fleet.networks)]
+                    for i in range(len(nodes))]
+        futures = [executor.submit(_timed, fleet.bind,
+                                   fabric_samples[network.fabric], lock,
+                                   node, network)
+                   for node, network in zip(nodes, networks)]
+        bound = [future.result() for future in futures]
+        bind_elapsed = time.time() - started
+        bind_samples = _Samples(sample for samples in fabric_samples
+                                for sample in samples)
+        bind_samples.failed = sum(samples.failed
+                                  for samples in fabric_samples)
+        if len(fabric_samples) > 1:
+            for index, samples in enumerate(fabric_samples):
+                rows.append(('fabric%d' % index, samples, bind_elapsed,
+                             None, fleet.ufms[index].requests))
+
+        if updates:
+            rows.append(_ignored(
+                executor, fleet, 'update', fleet.update,
+                [(port, network) for _ in range(updates)
+                 for port, network in zip(bound, networks)
+                 if port is not None]))
+        if attempts:
+            no_ib_nodes = fleet.ironic.no_ib_nodes
+            rows.append(_ignored(
+                executor, fleet, 'no-ib', fleet.attempt,
+                [(node, fleet.networks[i % len(fleet.networks)])
+                 for _ in range(attempts)
+                 for i, node in enumerate(no_ib_nodes)]))
+
+        started = time.time()
+        futures = [executor.submit(_timed, fleet.unbind, unbind_samples,
+                                   lock, port, network)
+                   for port, network in zip(bound, networks)
+                   if port is not None]
+        for future in futures:
+            future.result()
+        unbind_elapsed = time.time() - started
+    finally:
+        executor.shutdown()
+    return (bind_samples, bind_elapsed, unbind_samples, unbind_elapsed,
+            rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--nodes', default='10,100,1000,10000',
+                        help='comma separated fleet sizes')
+    parser.add_argument('--networks', type=int, default=1,
+                        help='count of networks nodes are spread over')
+    parser.add_argument('--ib-ports', type=int, default=2,
+                        help='infiniband ports per node')
+    parser.add_argument('--ironic-latency', type=float, default=0.005)
+    parser.add_argument('--ufm-latency', type=float, default=0.01)
+    parser.add_argument('--ufm-error-rate', type=float, default=0.0,
+                        help='share of UFM requests answered with HTTP 503')
+    parser.add_argument('--fabrics', type=int, default=1,
+                        help='infiniband fabrics, each one has its own UFM')
+    parser.add_argument('--slow-fabric-latency', type=float, default=None,
+                        help='latency of the UFM of the first fabric')
+    parser.add_argument('--standby', action='store_true',
+                        help='every fabric has a standby UFM')
+    parser.add_argument('--switchover-at', type=float, default=None,
+                        help='seconds of the bind phase after which UFMs '
+                             'are unavailable')
+    parser.add_argument('--switchover-duration', type=float, default=5.0,
+                        help='seconds UFMs are unavailable')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--updates', type=int, default=0,
+                        help='rounds of status updates of bound ports')
+    parser.add_argument('--no-ib-nodes', type=int, default=0,
+                        help='nodes without infiniband port')
+    parser.add_argument('--attempts', type=int, default=0,
+                        help='rounds of binding ports of nodes without '
+                             'infiniband port')
+    parser.add_argument('--set', action='append', default=[],
+                        metavar='OPTION=VALUE',
+                        help='override a [mlnx:baremetal] option')
+    args = parser.parse_args()
+
+    CONF([], project='neutron')
+    for override in args.set:
+        name, value = override.split('=', 1)
+        CONF.set_override(name, value,
+                          group=const.MLNX_BAREMETAL_DRIVER_GROUP_NAME)
+
+    print('%8s %10s %10s %10s %10s %10s %10s %8s %8s %8s'
+          % ('nodes', 'bind p50', 'bind p99', 'bind/s', 'unbind p50',
+             'unbind p99', 'unbind/s', 'ironic', 'ufm', 'failed'))
+    for nodes in [int(n) for n in args.nodes.split(',')]:
+        fleet = Fleet(nodes, args.networks, args.ib_ports,
+                      args.ironic_latency, args.ufm_latency,
+                      ufm_error_rate=args.ufm_error_rate,
+                      no_ib_nodes=args.no_ib_nodes, fabrics=args.fabrics,
+                      slow_fabric_latency=args.slow_fabric_latency,
+                      standby=args.standby)
+        switchover = None
+        if args.switchover_at is not None:
+            switchover = (args.switchover_at, args.switchover_duration)
+        try:
+            bind, bind_elapsed, unbind, unbind_elapsed, rows = run(
+                fleet, args.concurrency, updates=args.updates,
+                attempts=args.attempts, switchover=switchover)
+        finally:
+            fleet.close()
+        print('%8d %9.1fms %9.1fms %10.1f %9.1fms %9.1fms %10.1f %8d %8d '
+              '%8d'
+              % (nodes,
+                 _percentile(bind, 50) * 1000, _percentile(bind, 99) * 1000,
+                 nodes / bind_elapsed,
+                 _percentile(unbind, 50) * 1000,
+                 _percentile(unbind, 99) * 1000,
+                 nodes / unbind_elapsed,
+                 sum(fleet.ironic.calls.values()),
+                 sum(sum(ufm.requests.values())
+                     for ufm in fleet.ufms + fleet.standbys),
+                 bind.failed + unbind.failed))
+        # NOTE: extra rows are bind of a fabric or ignored operations.
+        for name, samples, elapsed, calls, requests in rows:
+            print('%8s %8.3fms %8.3fms %10.1f %32s %8s %8s %8d'
+                  % (name, _percentile(samples, 50) * 1000,
+                     _percentile(samples, 99) * 1000,
+                     len(samples) / elapsed, '',
+                     '' if calls is None else calls,
+                     '' if requests is None else sum(requests.values()),
+                     samples.failed))
+
+
+if __name__ == '__main__':
+    main()
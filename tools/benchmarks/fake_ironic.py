@@ -0,0 +1,88 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""In-process fake Ironic client used by benchmarks.
+
+It answers ``port.list`` calls the way the driver uses them, every call
+sleeps a fixed latency to simulate a remote Ironic API.
+"""
+import threading
+import time
+import uuid
+
+MLNX_CLIENT_ID_PREFIX = 'ff:00:00:00:00:00:02:00:00:02:c9:00:'
+
+
+def client_id(guid):
+    """Format an integer guid as a Mellanox infiniband client-id"""
+    raw = '%016x' % guid
+    octets = [raw[i:i + 2] for i in range(0, len(raw), 2)]
+    return MLNX_CLIENT_ID_PREFIX + ':'.join(octets)
+
+
+class FakePort(object):
+
+    def __init__(self, node_uuid, extra):
+        self.uuid = str(uuid.uuid4())
+        self.node_uuid = node_uuid
+        self.extra = extra
+
+
+class _PortManager(object):
+
+    def __init__(self, fake):
+        self._fake = fake
+
+    def list(self, node=None, detail=False, fields=None, limit=None,
+             **kwargs):
+        self._fake.count('port.list')
+        time.sleep(self._fake.latency)
+        if node is None:
+            return [port for ports in self._fake.ports.values()
+                    for port in ports]
+        return list(self._fake.ports.get(node, []))
+
+
+class FakeIronicClient(object):
+    """Fake Ironic client with a fleet of nodes
+
+    Every node has one ethernet PXE port and ``ib_ports`` infiniband ports
+    whose ``extra['client-id']`` is set, like Ironic inspector does.
+    Another ``no_ib_nodes`` nodes only have the ethernet PXE port.
+    """
+
+    def __init__(self, nodes, ib_ports=2, latency=0.0, no_ib_nodes=0):
+        self.latency = latency
+        self.calls = {}
+        self._lock = threading.Lock()
+        self.ports = {}
+        self.nodes = []
+        guid = 0x0002c90300000000
+        for _ in range(nodes):
+            node = str(uuid.uuid4())
+            self.nodes.append(node)
+            ports = [FakePort(node, {})]
+            for _ in range(ib_ports):
+                guid += 1
+                ports.append(FakePort(node, {'client-id': client_id(guid)}))
+            self.ports[node] = ports
+        self.no_ib_nodes = []
+        for _ in range(no_ib_nodes):
+            node = str(uuid.uuid4())
+            self.no_ib_nodes.append(node)
+            self.ports[node] = [FakePort(node, {})]
+        self.port = _PortManager(self)
+
+    def count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
@@ -0,0 +1,185 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""In-process fake UFM REST API server used by benchmarks.
+
+Only the PKey resource is implemented, every request sleeps a fixed
+latency before it is answered to simulate a remote UFM. A share of
+requests can be answered with HTTP 503 to simulate transient UFM errors,
+all of them while the server is ``unavailable``, like during an UFM master
+switchover.
+GET responses carry an ETag, and conditional GETs are answered with 304,
+if the server is created with etag.
+"""
+import json
+import random
+import threading
+import time
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves.urllib import parse
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    prefix = '/ufmRest/resources/pkeys'
+    version_path = '/ufmRest/app/ufm_version'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, code, body=None, etag=None):
+        content = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _handle(self):
+        server = self.server.fake_ufm
+        time.sleep(server.latency)
+        if server.unavailable:
+            self._read_json()
+            return self._reply(503, {'error': 'service unavailable'})
+        url = parse.urlparse(self.path)
+        if url.path == self.version_path:
+            return self._reply(200, {'ufm_release_version': 'fake'})
+        if not url.path.startswith(self.prefix):
+            return self._reply(404, {'error': 'not found'})
+
+        parts = [p for p in url.path[len(self.prefix):].split('/') if p]
+        query = parse.parse_qs(url.query)
+        with_guid = query.get('guids_data', ['False'])[0] == 'True'
+        server.count(self.command)
+        if server.error_rate and random.random() < server.error_rate:
+            server.errors += 1
+            # NOTE: drain the request body, the connection is kept alive.
+            self._read_json()
+            return self._reply(503, {'error': 'service unavailable'})
+
+        if self.command == 'GET' and server.etag:
+            etag = '"%d"' % server.version
+            if self.headers.get('If-None-Match') == etag:
+                return self._reply(304, etag=etag)
+        else:
+            etag = None
+        if self.command == 'GET' and not parts:
+            return self._reply(200, server.render(with_guid), etag=etag)
+        if self.command == 'GET' and len(parts) == 1:
+            if parts[0] not in server.pkeys:
+                return self._reply(404, {'error': 'not found'})
+            return self._reply(200, server.render(with_guid)[parts[0]],
+                               etag=etag)
+        if self.command in ('POST', 'PUT') and not parts:
+            payload = self._read_json()
+            server.set_guids(payload['pkey'], payload['guids'],
+                             payload.get('membership', 'full'),
+                             overwrite=self.command == 'PUT')
+            return self._reply(200)
+        if self.command == 'DELETE' and len(parts) == 1:
+            if server.drop(parts[0]) is None:
+                return self._reply(404, {'error': 'not found'})
+            return self._reply(200)
+        if self.command == 'DELETE' and len(parts) == 3:
+            server.remove_guids(parts[0], parts[2].split(','))
+            return self._reply(200)
+        return self._reply(400, {'error': 'bad request'})
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+class FakeUfmServer(object):
+    """Fake UFM server which keeps PKey membership in memory"""
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0,
+                 error_rate=0.0, etag=False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.unavailable = False
+        self.etag = etag
+        # NOTE: bumped on every change, used as ETag.
+        self.version = 0
+        self.errors = 0
+        self.pkeys = {}
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._httpd = _ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.fake_ufm = self
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        host, port = self._httpd.server_address[:2]
+        return 'http://%s:%s' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def count(self, method):
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+    def set_guids(self, pkey, guids, membership, overwrite=False):
+        with self._lock:
+            self.version += 1
+            members = self.pkeys.setdefault(pkey, {})
+            if overwrite:
+                members.clear()
+            for guid in guids:
+                members[guid] = membership
+
+    def remove_guids(self, pkey, guids):
+        with self._lock:
+            self.version += 1
+            members = self.pkeys.get(pkey, {})
+            for guid in guids:
+                members.pop(guid, None)
+
+    def drop(self, pkey):
+        with self._lock:
+            self.version += 1
+            return self.pkeys.pop(pkey, None)
+
+    def render(self, with_guid):
+        with self._lock:
+            result = {}
+            for pkey, members in self.pkeys.items():
+                item = {'partition': pkey, 'ip_over_ib': True}
+                if with_guid:
+                    item['guids'] = [{'guid': g, 'membership': m,
+                                      'index0': True}
+                                     for g, m in members.items()]
+                result[pkey] = item
+            return result
@@ -0,0 +1,93 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Benchmark GUID parsing and fleet-wide GUID set operations.
+
+Compares sets of GUID strings (as produced by
+``utils.mlnx_ib_client_id_to_guid``), sets of integers and
+:class:`~networking_mlnx_baremetal.ufmclient.guid.GuidSet` on the
+operations a reconcile does: parse client-ids, difference and
+intersection of two overlapping sets.
+
+Usage::
+
+    $ python tools/benchmarks/guid_bench.py --guids 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+from networking_mlnx_baremetal.ufmclient import constants
+from networking_mlnx_baremetal.ufmclient import guid as ib_guid
+from networking_mlnx_baremetal.ufmclient import utils
+
+
+def _client_ids(count, offset=0):
+    result = []
+    for index in range(offset, offset + count):
+        text = '%016x' % (0x0002c90300000000 + index)
+        result.append(constants.MLNX_INFINIBAND_CLIENT_ID_PREFIX + ':'.join(
+            text[i:i + 2] for i in range(0, 16, 2)))
+    return result
+
+
+def _measure(func):
+    # NOTE: tracemalloc slows allocations down, time a separate run.
+    started = time.time()
+    result = func()
+    elapsed = time.time() - started
+    tracemalloc.start()
+    kept = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return result, elapsed, size
+
+
+def _strings(client_ids):
+    return set(utils.mlnx_ib_client_id_to_guid(c) for c in client_ids)
+
+
+def _ints(client_ids):
+    return set(ib_guid.parse_all(client_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--guids', type=int, default=100000)
+    args = parser.parse_args()
+
+    first = _client_ids(args.guids)
+    # NOTE: the second set overlaps 90% of the first one.
+    second = _client_ids(args.guids, offset=args.guids // 10)
+
+    print('%-10s %12s %12s %12s %12s' % ('kind', 'parse', 'memory',
+                                         'difference', 'intersection'))
+    for name, build in (('str set', _strings), ('int set', _ints),
+                        ('GuidSet', ib_guid.GuidSet)):
+        a, parse_elapsed, size = _measure(lambda: build(first))
+        b = build(second)
+        started = time.time()
+        a - b
+        difference = time.time() - started
+        started = time.time()
+        a & b
+        intersection = time.time() - started
+        print('%-10s %10.1fms %10.1fMB %10.1fms %10.1fms'
+              % (name, parse_elapsed * 1000, size / 1024.0 / 1024.0,
+                 difference * 1000, intersection * 1000))
+
+
+if __name__ == '__main__':
+    main()
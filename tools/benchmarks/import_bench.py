@@ -0,0 +1,101 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Benchmark what the mlnx_ib_bm mechanism driver adds to neutron-server
+startup.
+
+Every round runs a fresh interpreter which first imports the modules
+neutron-server has loaded anyway before it loads mechanism drivers, then
+measures importing the driver module and calling ``initialize()`` on a
+new driver. Ironic and UFM are not reachable, nothing should connect to
+them during startup.
+
+Usage::
+
+    $ python tools/benchmarks/import_bench.py --rounds 10
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+_PROBE = '''
+import json
+import sys
+import time
+
+# modules neutron-server has loaded before ml2 loads mechanism drivers
+import neutron.db.provisioning_blocks  # noqa
+import neutron.db.models.segment  # noqa
+import neutron.plugins.ml2.models  # noqa
+from neutron_lib.plugins.ml2 import api  # noqa
+from neutron_lib import worker  # noqa
+from oslo_config import cfg
+
+before = set(sys.modules)
+started = time.time()
+from networking_mlnx_baremetal.plugins.ml2 import mech_ib_baremetal
+elapsed = time.time() - started
+
+cfg.CONF([], project='neutron')
+cfg.CONF.set_override('auth_strategy', 'noauth', group='ironic')
+cfg.CONF.set_override('endpoint', 'http://127.0.0.1:9/', group='ironic')
+imported = time.time()
+error = None
+try:
+    driver = mech_ib_baremetal.InfiniBandBaremetalMechanismDriver()
+    driver.initialize()
+except Exception as e:
+    error = '%s: %s' % (type(e).__name__, e)
+initialized = time.time()
+
+heavy = [name for name in ('ironicclient', 'keystoneauth1.loading',
+                          'pbr.packaging')
+         if name in sys.modules and name not in before]
+print(json.dumps({'import': elapsed,
+                  'initialize': initialized - imported,
+                  'modules': len(set(sys.modules) - before),
+                  'heavy': heavy,
+                  'error': error}))
+'''
+
+
+def _median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.rounds):
+        output = subprocess.check_output([sys.executable, '-c', _PROBE])
+        results.append(json.loads(output.decode('utf-8').splitlines()[-1]))
+
+    print('%12s %12s %10s  %s' % ('import', 'initialize', 'modules',
+                                  'heavy modules loaded'))
+    print('%10.1fms %10.1fms %10d  %s'
+          % (_median([r['import'] for r in results]) * 1000,
+             _median([r['initialize'] for r in results]) * 1000,
+             results[-1]['modules'],
+             ', '.join(results[-1]['heavy']) or '-'))
+    if results[-1]['error']:
+        print('initialize failed: %s' % results[-1]['error'])
+
+
+if __name__ == '__main__':
+    main()
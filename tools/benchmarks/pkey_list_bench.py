@@ -0,0 +1,102 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Compare loading, streaming and cached loading of the UFM pkey listing
+with guids.
+
+The listing does not change between rounds, like on a steady fabric. The
+cached load decodes it once, then it is found unchanged by its content
+digest, or answered 304 by the fake UFM with --etag. The fake UFM runs in
+a child process, so only the memory allocated by the client is traced.
+
+Usage::
+
+    $ python tools/benchmarks/pkey_list_bench.py --pkeys 200 --guids 1000
+    $ python tools/benchmarks/pkey_list_bench.py --rounds 10 --etag
+"""
+import argparse
+import multiprocessing
+import time
+import tracemalloc
+
+import fake_ufm
+
+from networking_mlnx_baremetal.ufmclient import client
+
+
+def _serve(queue, pkeys, guids, etag):
+    server = fake_ufm.FakeUfmServer(etag=etag)
+    for pkey in range(pkeys):
+        base = 0x0002c90300000000 + pkey * guids
+        server.set_guids(hex(pkey + 1),
+                         ['%016x' % (base + i) for i in range(guids)],
+                         'full')
+    server.start()
+    queue.put(server.endpoint)
+    while True:
+        time.sleep(60)
+
+
+def _load(ufm):
+    listing = ufm.pkey.list(with_guid=True)
+    return sum(len(data['guids']) for data in listing.values())
+
+
+def _stream(ufm):
+    return sum(1 for _record in ufm.pkey.iter_guids())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--pkeys', type=int, default=200)
+    parser.add_argument('--guids', type=int, default=1000,
+                        help='guids per pkey')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--etag', action='store_true',
+                        help='the fake UFM sends ETag and answers 304')
+    args = parser.parse_args()
+
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=_serve, args=(queue, args.pkeys, args.guids, args.etag))
+    server.daemon = True
+    server.start()
+    try:
+        endpoint = queue.get()
+        plain = client.UfmClient(endpoint, 'admin', 'admin', False)
+        cached = client.UfmClient(endpoint, 'admin', 'admin', False,
+                                  response_cache_size=4)
+        print('%-8s %10s %12s %12s' % ('mode', 'guids', 'per round',
+                                       'peak memory'))
+        for name, func, ufm in (('load', _load, plain),
+                                ('stream', _stream, plain),
+                                ('cached', _load, cached)):
+            started = time.time()
+            for _ in range(args.rounds):
+                count = func(ufm)
+            elapsed = (time.time() - started) / args.rounds
+            # NOTE: tracemalloc slows allocations down, trace another run.
+            tracemalloc.start()
+            func(ufm)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print('%-8s %10d %10.3fs %10.1fMB'
+                  % (name, count, elapsed, peak / 1024.0 / 1024.0))
+        print('cache: %s' % cached.session.cache_stats())
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Copyright 2020 HuaWei Technologies. All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Compare throughput of the sync and async UFM PKey clients.
+
+Usage::
+
+    $ python tools/benchmarks/ufm_client_bench.py --operations 500 \\
+        --latency 0.01 --concurrency 16
+"""
+import argparse
+import time
+
+import fake_ufm
+
+from networking_mlnx_baremetal.ufmclient import client
+
+
+def _guid(index):
+    return '%016x' % (0x0002c90300000000 + index)
+
+
+def run_sync(endpoint, operations):
+    ufm = client.UfmClient(endpoint, 'admin', 'admin', False)
+    started = time.time()
+    for index in range(operations):
+        ufm.pkey.add_guids(hex(index % 64 + 1), [_guid(index)])
+    return time.time() - started
+
+
+def run_async(endpoint, operations, concurrency):
+    ufm = client.AsyncUfmClient(endpoint, 'admin', 'admin', False,
+                                concurrency=concurrency)
+    started = time.time()
+    futures = [ufm.pkey.add_guids(hex(index % 64 + 1), [_guid(index)])
+               for index in range(operations)]
+    for future in futures:
+        future.result()
+    elapsed = time.time() - started
+    ufm.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--operations', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='seconds the fake UFM waits per request')
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    server = fake_ufm.FakeUfmServer(latency=args.latency).start()
+    try:
+        for name, elapsed in (
+                ('sync', run_sync(server.endpoint, args.operations)),
+                ('async', run_async(server.endpoint, args.operations,
+                                    args.concurrency))):
+            print('%-6s %6d ops in %8.3fs -> %10.1f ops/s'
+                  % (name, args.operations, elapsed,
+                     args.operations / elapsed))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()